@@ -1,3 +1,6 @@
+from datetime import datetime
+from typing import Optional
+
 from sqlalchemy.orm import Session
 
 from . import models, schemas
@@ -9,9 +12,10 @@ def get_user_by_email(db: Session, email: str):
     """Fetches a single user by their email address."""
     return db.query(models.User).filter(models.User.email == email).first()
 
-def create_user(db: Session, user: schemas.UserCreate):
-    """Creates a new user in the database."""
-    hashed_password = get_password_hash(user.password)
+def create_user(db: Session, user: schemas.UserCreate, hashed_password: Optional[str] = None):
+    """Creates a new user in the database, hashing the password unless a hash is given."""
+    if hashed_password is None:
+        hashed_password = get_password_hash(user.password)
     db_user = models.User(email=user.email, hashed_password=hashed_password)
     db.add(db_user)
     db.commit()
@@ -22,14 +26,44 @@ def create_user(db: Session, user: schemas.UserCreate):
 
 def create_db_chatbot(db: Session, chatbot: schemas.ChatbotCreateDB):
     """Creates a new chatbot record in the database."""
-    db_chatbot = models.Chatbot(**chatbot.model_dump()) # Use model_dump for Pydantic v2
+    db_chatbot = models.Chatbot(**chatbot.model_dump(exclude_none=True)) # Use model_dump for Pydantic v2
     db.add(db_chatbot)
     db.commit()
     db.refresh(db_chatbot)
     return db_chatbot
 
+def upsert_db_chatbot(db: Session, chatbot: schemas.ChatbotCreateDB):
+    """Creates or overwrites a chatbot record (used to backfill from metadata files)."""
+    db_chatbot = db.merge(models.Chatbot(**chatbot.model_dump(exclude_none=True)))
+    db.commit()
+    return db_chatbot
+
 def get_user_chatbots(db: Session, user_id: int):
-    """Fetches all chatbots owned by a specific user."""
-    return db.query(models.Chatbot).filter(models.Chatbot.user_id == user_id).all()
+    """Fetches all chatbots owned by a specific user, newest first."""
+    return db.query(models.Chatbot).filter(
+        models.Chatbot.user_id == user_id,
+        models.Chatbot.deleted_at.is_(None)
+    ).order_by(models.Chatbot.created_at.desc()).all()
 
-# --- Other CRUD operations can be added later (e.g., for chatbots) ---
+def get_user_chatbot(db: Session, user_id: int, chatbot_id: str):
+    """Fetches a chatbot if it is owned by the user, else None."""
+    return db.query(models.Chatbot).filter(
+        models.Chatbot.id == chatbot_id,
+        models.Chatbot.user_id == user_id,
+        models.Chatbot.deleted_at.is_(None)
+    ).first()
+
+def is_chatbot_deleted(db: Session, chatbot_id: str) -> bool:
+    """Whether the chatbot has been deleted and waits for the garbage collector."""
+    return db.query(models.Chatbot.id).filter(
+        models.Chatbot.id == chatbot_id,
+        models.Chatbot.deleted_at.isnot(None)
+    ).first() is not None
+
+def mark_chatbot_deleted(db: Session, chatbot_id: str):
+    """Hides a chatbot from its owner; the garbage collector removes its data."""
+    db.query(models.Chatbot).filter(
+        models.Chatbot.id == chatbot_id,
+        models.Chatbot.deleted_at.is_(None)
+    ).update({models.Chatbot.deleted_at: datetime.utcnow()}, synchronize_session=False)
+    db.commit()
@@ -1,9 +1,12 @@
 from sqlalchemy.orm import Session
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 import uuid
-from datetime import datetime, timedelta
-from typing import List, Optional
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
 
 from . import models, schemas
+from .services.transcript_archive import load_archived_messages
 
 # Session management functions
 def create_chat_session(db: Session, session_data: schemas.ChatSessionCreate) -> models.ChatSession:
@@ -12,7 +15,9 @@ def create_chat_session(db: Session, session_data: schemas.ChatSessionCreate) ->
     db_session = models.ChatSession(
         id=session_id,
         chatbot_id=session_data.chatbot_id,
-        user_identifier=session_data.user_identifier
+        user_identifier=session_data.user_identifier,
+        # UTC like the server default, but with the microseconds keyset exports compare on
+        started_at=datetime.now(timezone.utc).replace(tzinfo=None)
     )
     db.add(db_session)
     db.commit()
@@ -40,6 +45,15 @@ def update_session_activity(db: Session, session_id: str) -> models.ChatSession:
         db.refresh(db_session)
     return db_session
 
+def touch_active_session(db: Session, session_id: str) -> bool:
+    """Update the last activity timestamp if the session is still active, in one statement"""
+    updated = db.query(models.ChatSession).filter(
+        models.ChatSession.id == session_id,
+        models.ChatSession.is_active == True
+    ).update({models.ChatSession.last_activity: datetime.now()}, synchronize_session=False)
+    db.commit()
+    return updated > 0
+
 def close_session(db: Session, session_id: str) -> models.ChatSession:
     """Mark a session as inactive"""
     db_session = get_chat_session(db, session_id)
@@ -57,6 +71,44 @@ def get_inactive_sessions(db: Session, timeout_minutes: int = 1) -> List[models.
         models.ChatSession.last_activity < timeout_threshold
     ).all()
 
+def get_most_active_chatbots(db: Session, since_hours: int = 24, limit: int = 10) -> List[str]:
+    """Get chatbot IDs ordered by recent session traffic, busiest first"""
+    since = datetime.now() - timedelta(hours=since_hours)
+    rows = db.query(
+        models.ChatSession.chatbot_id,
+        func.count(models.ChatSession.id).label("session_count")
+    ).filter(
+        models.ChatSession.last_activity >= since
+    ).group_by(
+        models.ChatSession.chatbot_id
+    ).order_by(
+        func.count(models.ChatSession.id).desc()
+    ).limit(limit).all()
+    return [row.chatbot_id for row in rows]
+
+def get_user_questions(db: Session, chatbot_id: str, since_days: int = 90) -> List[str]:
+    """Get the text of every user message sent to a chatbot in the window"""
+    since = datetime.now() - timedelta(days=since_days)
+    rows = db.query(models.ChatMessage.content).join(
+        models.ChatSession, models.ChatSession.id == models.ChatMessage.session_id
+    ).filter(
+        models.ChatSession.chatbot_id == chatbot_id,
+        models.ChatMessage.role == "user",
+        models.ChatMessage.timestamp >= since
+    ).all()
+    return [row.content for row in rows]
+
+def get_chatbots_with_messages(db: Session, since_days: int = 90) -> List[str]:
+    """Get IDs of chatbots that received user messages in the window"""
+    since = datetime.now() - timedelta(days=since_days)
+    rows = db.query(models.ChatSession.chatbot_id).join(
+        models.ChatMessage, models.ChatMessage.session_id == models.ChatSession.id
+    ).filter(
+        models.ChatMessage.role == "user",
+        models.ChatMessage.timestamp >= since
+    ).distinct().all()
+    return [row.chatbot_id for row in rows]
+
 # Message management functions
 def add_message_to_session(db: Session, session_id: str, message_data: schemas.ChatMessageCreate) -> models.ChatMessage:
     """Add a new message to a chat session"""
@@ -70,33 +122,286 @@ def add_message_to_session(db: Session, session_id: str, message_data: schemas.C
     db.refresh(db_message)
     return db_message
 
+def _archived_message(session_id: str, message: dict) -> models.ChatMessage:
+    # Transient: never added to the session, so it can't be written back to chat_messages
+    return models.ChatMessage(
+        id=message["id"],
+        session_id=session_id,
+        role=message["role"],
+        content=message["content"],
+        timestamp=datetime.fromisoformat(message["timestamp"]) if message["timestamp"] else None
+    )
+
 def get_session_messages(db: Session, session_id: str) -> List[models.ChatMessage]:
-    """Get all messages for a specific session"""
-    return db.query(models.ChatMessage).filter(
+    """Get all messages for a specific session, including any moved to the transcript archive"""
+    archived = load_archived_messages(db, [session_id]).get(session_id, [])
+    hot = db.query(models.ChatMessage).filter(
         models.ChatMessage.session_id == session_id
     ).order_by(models.ChatMessage.timestamp).all()
+    return [_archived_message(session_id, message) for message in archived] + hot
 
 # Insight management functions
 def create_insight(db: Session, insight_data: schemas.InsightCreate) -> models.Insight:
-    """Create a new insight entry from session analysis"""
+    """Create a new insight and count it in its chatbot's daily rollup, in one transaction"""
+    chatbot_id = db.query(models.ChatSession.chatbot_id).filter(
+        models.ChatSession.id == insight_data.session_id
+    ).scalar()
+    owner_id = db.query(models.Chatbot.user_id).filter(models.Chatbot.id == chatbot_id).scalar() if chatbot_id else None
+    # UTC, like the column's server default
+    created_at = datetime.now(timezone.utc).replace(tzinfo=None)
     db_insight = models.Insight(
         session_id=insight_data.session_id,
+        chatbot_id=chatbot_id,
+        user_id=owner_id,
         name=insight_data.name,
         email=insight_data.email,
         problem_summary=insight_data.problem_summary,
         bot_solved=insight_data.bot_solved,
         human_needed=insight_data.human_needed,
-        emotion=insight_data.emotion
+        emotion=insight_data.emotion,
+        created_at=created_at
     )
     db.add(db_insight)
+    if chatbot_id:
+        _count_in_daily_rollup(db, chatbot_id, owner_id, created_at.date().isoformat(), insight_data)
     db.commit()
     db.refresh(db_insight)
     return db_insight
 
-def get_all_insights(db: Session, skip: int = 0, limit: int = 100) -> List[models.Insight]:
-    """Get all insights with pagination"""
-    return db.query(models.Insight).offset(skip).limit(limit).all()
+def _emotion_key(emotion: Optional[str]) -> str:
+    return (emotion or "unknown").strip().lower().replace('"', "") or "unknown"
+
+def _count_in_daily_rollup(db: Session, chatbot_id: str, owner_id: Optional[int], day: str,
+                           insight_data: schemas.InsightCreate) -> None:
+    """Add one insight to a rollup row with a single upsert, so concurrent writers can't lose counts"""
+    table = models.InsightDailyRollup.__table__
+    solved = 1 if insight_data.bot_solved is True else 0
+    unsolved = 1 if insight_data.bot_solved is False else 0
+    human_needed = 1 if insight_data.human_needed else 0
+    emotion = _emotion_key(insight_data.emotion)
+    emotion_path = f'$."{emotion}"'
+    statement = sqlite_insert(table).values(
+        chatbot_id=chatbot_id,
+        day=day,
+        user_id=owner_id,
+        total=1,
+        solved=solved,
+        unsolved=unsolved,
+        human_needed=human_needed,
+        emotions={emotion: 1}
+    ).on_conflict_do_update(
+        index_elements=[table.c.chatbot_id, table.c.day],
+        set_={
+            "user_id": func.coalesce(table.c.user_id, owner_id),
+            "total": table.c.total + 1,
+            "solved": table.c.solved + solved,
+            "unsolved": table.c.unsolved + unsolved,
+            "human_needed": table.c.human_needed + human_needed,
+            "emotions": func.json_set(
+                table.c.emotions,
+                emotion_path,
+                func.coalesce(func.json_extract(table.c.emotions, emotion_path), 0) + 1
+            ),
+        }
+    )
+    db.execute(statement)
+
+def _insight_filters(
+    user_id: int,
+    chatbot_id: Optional[str] = None,
+    emotion: Optional[str] = None,
+    bot_solved: Optional[bool] = None,
+    human_needed: Optional[bool] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None
+) -> list:
+    # Lead with the column of the index the query should use
+    conditions = [models.Insight.chatbot_id == chatbot_id] if chatbot_id else [models.Insight.user_id == user_id]
+    if since is not None:
+        conditions.append(models.Insight.created_at >= since)
+    if until is not None:
+        conditions.append(models.Insight.created_at < until)
+    if emotion is not None:
+        conditions.append(func.lower(models.Insight.emotion) == emotion.lower())
+    if bot_solved is not None:
+        conditions.append(models.Insight.bot_solved == bot_solved)
+    if human_needed is not None:
+        conditions.append(models.Insight.human_needed == human_needed)
+    return conditions
+
+def get_insights_page(
+    db: Session,
+    user_id: int,
+    limit: int = 50,
+    after: Optional[Tuple[datetime, int]] = None,
+    **filters
+) -> List[models.Insight]:
+    """A page of a user's insights, newest first, continuing after the (created_at, id) key.
+
+    Filters are those of _insight_filters. The caller must check that
+    `chatbot_id`, if given, belongs to the user.
+    """
+    query = db.query(models.Insight).filter(*_insight_filters(user_id, **filters))
+    if after is not None:
+        query = query.filter(tuple_(models.Insight.created_at, models.Insight.id) < tuple_(*after))
+    return query.order_by(models.Insight.created_at.desc(), models.Insight.id.desc()).limit(limit).all()
+
+INSIGHT_EXPORT_COLUMNS = [
+    models.Insight.id, models.Insight.created_at, models.Insight.chatbot_id, models.Insight.session_id,
+    models.Insight.name, models.Insight.email, models.Insight.problem_summary, models.Insight.bot_solved,
+    models.Insight.human_needed, models.Insight.emotion,
+]
+
+def get_insight_export_rows(
+    db: Session,
+    user_id: int,
+    limit: int,
+    after: Optional[Tuple[datetime, int]] = None,
+    **filters
+) -> list:
+    """Like get_insights_page, but plain rows of INSIGHT_EXPORT_COLUMNS instead of ORM objects"""
+    statement = select(*INSIGHT_EXPORT_COLUMNS).where(*_insight_filters(user_id, **filters))
+    if after is not None:
+        statement = statement.where(tuple_(models.Insight.created_at, models.Insight.id) < tuple_(*after))
+    statement = statement.order_by(models.Insight.created_at.desc(), models.Insight.id.desc()).limit(limit)
+    return db.execute(statement).all()
+
+TRANSCRIPT_EXPORT_COLUMNS = [
+    models.ChatSession.chatbot_id, models.ChatSession.id.label("session_id"),
+    models.ChatSession.user_identifier, models.ChatSession.started_at,
+    models.ChatMessage.id.label("message_id"), models.ChatMessage.timestamp, models.ChatMessage.role,
+    models.ChatMessage.content, models.Insight.bot_solved, models.Insight.human_needed,
+    models.Insight.emotion, models.Insight.problem_summary,
+]
+
+TRANSCRIPT_EXPORT_KEYS = [column.key for column in TRANSCRIPT_EXPORT_COLUMNS]
+# The per-session part of a transcript row, for messages read from the archive
+TRANSCRIPT_SESSION_COLUMNS = [
+    models.ChatSession.chatbot_id, models.ChatSession.id.label("session_id"),
+    models.ChatSession.user_identifier, models.ChatSession.started_at, models.Insight.bot_solved,
+    models.Insight.human_needed, models.Insight.emotion, models.Insight.problem_summary,
+]
+
+def get_transcript_session_keys(
+    db: Session,
+    chatbot_id: str,
+    limit: int,
+    after: Optional[Tuple[datetime, str]] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None
+) -> List[Tuple[datetime, str]]:
+    """(started_at, id) of the next `limit` sessions of a chatbot, oldest first"""
+    statement = select(models.ChatSession.started_at, models.ChatSession.id).where(
+        models.ChatSession.chatbot_id == chatbot_id
+    )
+    if after is not None:
+        statement = statement.where(tuple_(models.ChatSession.started_at, models.ChatSession.id) > tuple_(*after))
+    if since is not None:
+        statement = statement.where(models.ChatSession.started_at >= since)
+    if until is not None:
+        statement = statement.where(models.ChatSession.started_at < until)
+    statement = statement.order_by(models.ChatSession.started_at, models.ChatSession.id).limit(limit)
+    return [tuple(row) for row in db.execute(statement)]
+
+def get_transcript_rows(db: Session, session_ids: List[str]) -> list:
+    """Every message of the sessions with its session and insight fields, one row per message"""
+    statement = select(*TRANSCRIPT_EXPORT_COLUMNS).join(
+        models.ChatMessage, models.ChatMessage.session_id == models.ChatSession.id
+    ).outerjoin(
+        models.Insight, models.Insight.session_id == models.ChatSession.id
+    ).where(
+        models.ChatSession.id.in_(session_ids)
+    ).order_by(
+        models.ChatSession.started_at, models.ChatSession.id, models.ChatMessage.timestamp, models.ChatMessage.id
+    )
+    rows = db.execute(statement).all()
+    archived = load_archived_messages(db, session_ids)
+    if not archived:
+        return rows
+
+    # Same columns for the archived messages: session and insight fields from the database
+    sessions = {
+        row.session_id: row for row in db.execute(
+            select(*TRANSCRIPT_SESSION_COLUMNS).outerjoin(
+                models.Insight, models.Insight.session_id == models.ChatSession.id
+            ).where(models.ChatSession.id.in_(list(archived)))
+        )
+    }
+    rows = [tuple(row) for row in rows]
+    for session_id, messages in archived.items():
+        session = sessions[session_id]
+        for message in messages:
+            values = {**session._mapping, "message_id": message["id"], "role": message["role"],
+                      "content": message["content"],
+                      "timestamp": datetime.fromisoformat(message["timestamp"]) if message["timestamp"] else None}
+            rows.append(tuple(values[name] for name in TRANSCRIPT_EXPORT_KEYS))
+    # started_at, session_id, timestamp, message_id
+    rows.sort(key=lambda row: (row[3], row[1], row[5] or datetime.min, row[4]))
+    return rows
+
+def get_insight_rollups(
+    db: Session,
+    user_id: int,
+    since_day: str,
+    until_day: str,
+    chatbot_id: Optional[str] = None
+) -> List[models.InsightDailyRollup]:
+    """Daily rollups of a user's chatbots (or one chatbot) for days in [since_day, until_day]"""
+    query = db.query(models.InsightDailyRollup)
+    if chatbot_id:
+        query = query.filter(models.InsightDailyRollup.chatbot_id == chatbot_id)
+    else:
+        query = query.filter(models.InsightDailyRollup.user_id == user_id)
+    return query.filter(
+        models.InsightDailyRollup.day >= since_day,
+        models.InsightDailyRollup.day <= until_day
+    ).order_by(models.InsightDailyRollup.day, models.InsightDailyRollup.chatbot_id).all()
+
+def fill_insight_owners(db: Session) -> int:
+    """Set the owner on insights and rollups of chatbots registered after the insight was saved"""
+    owner = select(models.Chatbot.user_id).where(models.Chatbot.id == models.Insight.chatbot_id).scalar_subquery()
+    updated = db.query(models.Insight).filter(
+        models.Insight.user_id.is_(None), models.Insight.chatbot_id.isnot(None)
+    ).update({models.Insight.user_id: owner}, synchronize_session=False)
+    rollup_owner = select(models.Chatbot.user_id).where(
+        models.Chatbot.id == models.InsightDailyRollup.chatbot_id
+    ).scalar_subquery()
+    db.query(models.InsightDailyRollup).filter(
+        models.InsightDailyRollup.user_id.is_(None)
+    ).update({models.InsightDailyRollup.user_id: rollup_owner}, synchronize_session=False)
+    db.commit()
+    return updated
 
 def get_insight_by_session(db: Session, session_id: str) -> Optional[models.Insight]:
     """Get insight for a specific session"""
     return db.query(models.Insight).filter(models.Insight.session_id == session_id).first()
+
+# FAQ management functions
+def get_faq_entries(db: Session, chatbot_id: str) -> List[models.FAQEntry]:
+    """Get a chatbot's precomputed answers, largest clusters first"""
+    return db.query(models.FAQEntry).filter(
+        models.FAQEntry.chatbot_id == chatbot_id
+    ).order_by(models.FAQEntry.cluster_size.desc()).all()
+
+def replace_faq_entries(db: Session, chatbot_id: str, entries: List[dict]) -> List[models.FAQEntry]:
+    """Replace all of a chatbot's FAQ entries in one transaction"""
+    db.query(models.FAQEntry).filter(models.FAQEntry.chatbot_id == chatbot_id).delete()
+    db_entries = [models.FAQEntry(chatbot_id=chatbot_id, **entry) for entry in entries]
+    db.add_all(db_entries)
+    db.commit()
+    return db_entries
+
+def update_faq_answer(db: Session, entry_id: int, answer: str, kb_version: int) -> None:
+    """Store a regenerated answer for an FAQ entry"""
+    db.query(models.FAQEntry).filter(models.FAQEntry.id == entry_id).update(
+        {"answer": answer, "kb_version": kb_version}
+    )
+    db.commit()
+
+def add_faq_hits(db: Session, hits: Dict[int, int]) -> None:
+    """Add buffered lookup hits to the entries' counters"""
+    for entry_id, count in hits.items():
+        db.query(models.FAQEntry).filter(models.FAQEntry.id == entry_id).update(
+            {"hit_count": models.FAQEntry.hit_count + count}
+        )
+    db.commit()
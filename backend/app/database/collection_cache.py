@@ -0,0 +1,88 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Tuple
+
+
+class CollectionCache:
+    """LRU of loaded Chroma collections kept within an estimated memory budget"""
+
+    def __init__(self, memory_limit_bytes: int, bytes_per_record: int):
+        self.memory_limit_bytes = memory_limit_bytes
+        self.bytes_per_record = bytes_per_record
+
+        # name -> (collection, estimated resident bytes), least recently used first
+        self._entries: "OrderedDict[str, Tuple[Any, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.resident_bytes = 0
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+
+    def get(self, name: str, loader: Callable[[str], Any]) -> Any:
+        """Return a resident collection, loading it with `loader` on a miss"""
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None:
+                self._entries.move_to_end(name)
+                self.hits += 1
+                return entry[0]
+
+        # Load outside the lock so a slow load doesn't block hits on other collections
+        collection = loader(name)
+        estimated_bytes = self._estimate_bytes(collection)
+
+        with self._lock:
+            if name in self._entries:
+                # Another thread loaded it while we were loading
+                self._entries.move_to_end(name)
+                self.hits += 1
+                return self._entries[name][0]
+
+            self._entries[name] = (collection, estimated_bytes)
+            self.resident_bytes += estimated_bytes
+            self.loads += 1
+            self._evict_over_budget(keep=name)
+
+        return collection
+
+    def discard(self, name: str) -> None:
+        """Drop a collection from the resident set (e.g. after it changes or is deleted)"""
+        with self._lock:
+            entry = self._entries.pop(name, None)
+            if entry is not None:
+                self.resident_bytes -= entry[1]
+
+    def is_resident(self, name: str) -> bool:
+        with self._lock:
+            return name in self._entries
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of residency counters"""
+        with self._lock:
+            return {
+                "resident_collections": len(self._entries),
+                "resident_bytes": self.resident_bytes,
+                "memory_limit_bytes": self.memory_limit_bytes,
+                "hits": self.hits,
+                "loads": self.loads,
+                "evictions": self.evictions,
+                "resident": list(reversed(self._entries.keys())),  # most recently used first
+            }
+
+    def _estimate_bytes(self, collection: Any) -> int:
+        try:
+            return collection.count() * self.bytes_per_record
+        except Exception:
+            return 0
+
+    def _evict_over_budget(self, keep: str) -> None:
+        # Caller holds the lock. The just-loaded collection is never evicted,
+        # even if on its own it exceeds the budget.
+        while self.resident_bytes > self.memory_limit_bytes and len(self._entries) > 1:
+            name, (_, estimated_bytes) = next(iter(self._entries.items()))
+            if name == keep:
+                break
+            del self._entries[name]
+            self.resident_bytes -= estimated_bytes
+            self.evictions += 1
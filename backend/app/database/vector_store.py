@@ -1,176 +1,426 @@
 import os
-import traceback
-import chromadb
-from chromadb.config import Settings
-from typing import List, Dict, Any
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.document_loaders import PyPDFLoader
+import json
+import logging
+import threading
+from typing import List, Dict, Any, Optional
 from pathlib import Path
 
+from .collection_cache import CollectionCache
+from ..utils.metrics import span
+
+logger = logging.getLogger(__name__)
+
+# Memory budget for collections held in RAM. Chroma's own segment cache is
+# bounded by the same budget so evicted collections actually release memory.
+MEMORY_LIMIT_MB = int(os.getenv("VECTOR_STORE_MEMORY_LIMIT_MB", "1024"))
+# Rough resident cost of one chunk: 384-dim float32 embedding plus HNSW links
+BYTES_PER_RECORD = int(os.getenv("VECTOR_STORE_BYTES_PER_RECORD", "2048"))
+# Ingestion: splitter settings and how many chunks are embedded per model call
+CHUNK_SIZE = int(os.getenv("INGEST_CHUNK_SIZE", "1000"))
+CHUNK_OVERLAP = int(os.getenv("INGEST_CHUNK_OVERLAP", "200"))
+EMBEDDING_BATCH_SIZE = int(os.getenv("INGEST_EMBEDDING_BATCH_SIZE", "64"))
+
+# Tuned index parameters (see tools/tune_hnsw.py) -> Chroma collection metadata keys
+HNSW_METADATA_KEYS = {
+    "M": "hnsw:M",
+    "construction_ef": "hnsw:construction_ef",
+    "search_ef": "hnsw:search_ef",
+}
+
 class VectorStore:
     def __init__(self):
-        # Create the chroma_db directory if it doesn't exist
-        db_path = Path("data/chroma_db")
-        db_path.mkdir(parents=True, exist_ok=True)
-        
-        # Initialize ChromaDB client with current configuration
-        self.client = chromadb.PersistentClient(
-            path=str(db_path),
-            settings=Settings(
-                anonymized_telemetry=False,
-                allow_reset=True
-            )
-        )
-        print(f"Initialized ChromaDB at {db_path}")
-        
+        # chromadb and the embedding model are heavy to import and load, so the
+        # client is created on first use (or by warm_up) rather than here
+        self.db_path = Path("data/chroma_db")
+        # Per-collection HNSW parameters recorded by tools/tune_hnsw.py
+        self.hnsw_params_path = Path("data/hnsw_params.json")
+        self.memory_limit_bytes = MEMORY_LIMIT_MB * 1024 * 1024
+        self.collections = CollectionCache(self.memory_limit_bytes, BYTES_PER_RECORD)
+        self._client = None
+        self._embedding_function = None
+        self._init_lock = threading.Lock()
+
+    @property
+    def client(self) -> Any:
+        if self._client is None:
+            with self._init_lock:
+                if self._client is None:
+                    import chromadb
+                    from chromadb.config import Settings
+
+                    # Create the chroma_db directory if it doesn't exist
+                    self.db_path.mkdir(parents=True, exist_ok=True)
+
+                    # Initialize ChromaDB client with current configuration
+                    self._client = chromadb.PersistentClient(
+                        path=str(self.db_path),
+                        settings=Settings(
+                            anonymized_telemetry=False,
+                            allow_reset=True,
+                            chroma_segment_cache_policy="LRU",
+                            chroma_memory_limit_bytes=self.memory_limit_bytes
+                        )
+                    )
+                    logger.info("Initialized ChromaDB at %s", self.db_path)
+        return self._client
+
+    @property
+    def embedding_function(self) -> Any:
+        # One shared instance so the model is loaded once, not per collection handle
+        if self._embedding_function is None:
+            with self._init_lock:
+                if self._embedding_function is None:
+                    from chromadb.utils import embedding_functions
+                    self._embedding_function = embedding_functions.DefaultEmbeddingFunction()
+        return self._embedding_function
+
+    def warm_up(self) -> None:
+        """Open the Chroma client and load the embedding model"""
+        self.client
+        self.embedding_function(["warmup"])
+
     def create_collection(self, collection_name: str) -> Any:
         """Create a new collection or get existing one"""
         try:
-            print(f"Creating collection: {collection_name}")
             # First try to get existing collection
             try:
-                collection = self.client.get_collection(name=collection_name)
-                print(f"Got existing collection: {collection_name}")
+                collection = self.client.get_collection(
+                    name=collection_name,
+                    embedding_function=self.embedding_function
+                )
+                logger.debug("Got existing collection: %s", collection_name)
             except:
                 # If it doesn't exist, create new one
                 collection = self.client.create_collection(
                     name=collection_name,
-                    metadata={"hnsw:space": "cosine"}
+                    metadata=self.collection_metadata(self.tuned_params(collection_name)),
+                    embedding_function=self.embedding_function
                 )
-                print(f"Created new collection: {collection_name}")
+                logger.info("Created new collection: %s", collection_name)
             return collection
         except Exception as e:
-            print(f"Error creating/getting collection: {str(e)}")
+            logger.error("Error creating/getting collection %s: %s", collection_name, e)
             raise
 
+    @staticmethod
+    def collection_metadata(hnsw_params: Dict[str, Any]) -> Dict[str, Any]:
+        """Chroma metadata for a collection; unset HNSW parameters keep Chroma's defaults"""
+        metadata = {"hnsw:space": "cosine"}
+        for name, key in HNSW_METADATA_KEYS.items():
+            if hnsw_params.get(name) is not None:
+                metadata[key] = int(hnsw_params[name])
+        return metadata
+
+    def _read_hnsw_params(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            return json.loads(self.hnsw_params_path.read_text())
+        except FileNotFoundError:
+            return {}
+
+    def _write_hnsw_params(self, params: Dict[str, Dict[str, Any]]) -> None:
+        self.hnsw_params_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.hnsw_params_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(params, indent=2))
+        os.replace(tmp_path, self.hnsw_params_path)
+
+    def tuned_params(self, collection_name: str) -> Dict[str, Any]:
+        """HNSW parameters recorded for a collection, or {} for Chroma's defaults"""
+        return self._read_hnsw_params().get(collection_name, {})
+
+    def record_tuned_params(self, collection_name: str, hnsw_params: Dict[str, Any]) -> None:
+        """Persist tuned parameters; they apply whenever the collection is (re)built"""
+        with self._init_lock:
+            params = self._read_hnsw_params()
+            params[collection_name] = hnsw_params
+            self._write_hnsw_params(params)
+
+    def _forget_tuned_params(self, collection_name: str) -> None:
+        with self._init_lock:
+            params = self._read_hnsw_params()
+            if params.pop(collection_name, None) is not None:
+                self._write_hnsw_params(params)
+
+    def rebuild_collection(self, collection_name: str, batch_size: int = 1000) -> int:
+        """Recreate a collection's index with its recorded parameters.
+
+        Construction parameters (M, construction_ef) are fixed when an HNSW
+        index is built, so the records are copied into a scratch collection
+        built with them, which replaces the original once its count matches.
+        Embeddings are reused, not recomputed. The live collection is never
+        removed before its replacement is complete.
+        """
+        scratch_name = f"{collection_name}__rebuild"
+        previous_name = f"{collection_name}__previous"
+        source = self.client.get_collection(name=collection_name, embedding_function=self.embedding_function)
+        total = source.count()
+        for leftover in (scratch_name, previous_name):
+            self._delete_if_exists(leftover)
+
+        target = self.client.create_collection(
+            name=scratch_name,
+            metadata=self.collection_metadata(self.tuned_params(collection_name)),
+            embedding_function=self.embedding_function
+        )
+        try:
+            for offset in range(0, total, batch_size):
+                page = source.get(include=["embeddings", "documents", "metadatas"], limit=batch_size, offset=offset)
+                target.add(ids=page["ids"], embeddings=page["embeddings"],
+                           documents=page["documents"], metadatas=page["metadatas"])
+            built = target.count()
+            if built != total:
+                raise RuntimeError(f"rebuilt {built} of {total} records")
+        except Exception:
+            logger.exception("Rebuild of %s failed, keeping the current index", collection_name)
+            self._delete_if_exists(scratch_name)
+            raise
+
+        # Swap by renaming, so the name always points at a complete index
+        self.collections.discard(collection_name)
+        source.modify(name=previous_name)
+        try:
+            target.modify(name=collection_name)
+        except Exception:
+            source.modify(name=collection_name)
+            self._delete_if_exists(scratch_name)
+            raise
+        finally:
+            self.collections.discard(collection_name)
+        self.client.delete_collection(previous_name)
+        logger.info("Rebuilt collection %s (%d records) with %s", collection_name, total, target.metadata)
+        return total
+
+    def _delete_if_exists(self, collection_name: str) -> None:
+        try:
+            self.client.delete_collection(collection_name)
+        except Exception:
+            pass
+
+    def load_document(self, file_path: str) -> List[Any]:
+        """Parse a document into pages"""
+        logger.debug("Processing document: %s", file_path)
+
+        from langchain.document_loaders import PyPDFLoader
+
+        # Convert to Path object for better path handling
+        file_path = Path(file_path)
+
+        # Determine file type and use appropriate loader
+        file_extension = file_path.suffix.lower()
+
+        # Make sure file exists
+        if not file_path.exists():
+            raise ValueError(f"File does not exist: {file_path}")
+
+        if file_extension != '.pdf':
+            raise ValueError(f"Only PDF files are supported. Got: {file_extension}")
+
+        # Use PyPDFLoader for PDF files
+        loader = PyPDFLoader(str(file_path))
+
+        # Load the document
+        documents = loader.load()
+        logger.debug("Loaded %d pages from %s", len(documents), file_path)
+        return documents
+
+    def split_documents(
+        self,
+        file_path: str,
+        documents: List[Any],
+        chunk_size: int = CHUNK_SIZE,
+        chunk_overlap: int = CHUNK_OVERLAP
+    ) -> List[Dict[str, Any]]:
+        """Split parsed pages into chunks in the format expected by ChromaDB"""
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+        file_path = Path(file_path)
+
+        # Split text into chunks
+        text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            length_function=len,
+        )
+
+        chunks = text_splitter.split_documents(documents)
+        logger.debug("Split %s into %d chunks", file_path, len(chunks))
+
+        # Convert chunks to format expected by ChromaDB
+        processed_chunks = []
+        for i, chunk in enumerate(chunks):
+            processed_chunks.append({
+                'id': f"{file_path.name}_{i}",
+                'text': chunk.page_content,
+                'metadata': {
+                    'source': str(file_path),
+                    'page': chunk.metadata.get('page', 0)
+                }
+            })
+
+        return processed_chunks
+
     def process_document(self, file_path: str) -> List[Dict[str, str]]:
         """Process document and split into chunks"""
-        print(f"Processing document: {file_path}")
-        
         try:
-            # Convert to Path object for better path handling
-            file_path = Path(file_path)
-            
-            # Determine file type and use appropriate loader
-            file_extension = file_path.suffix.lower()
-            print(f"File extension: {file_extension}")
-            
-            # Make sure file exists
-            if not file_path.exists():
-                raise ValueError(f"File does not exist: {file_path}")
-            
-            if file_extension != '.pdf':
-                raise ValueError(f"Only PDF files are supported. Got: {file_extension}")
-            
-            # Use PyPDFLoader for PDF files
-            print("Using PyPDFLoader")
-            loader = PyPDFLoader(str(file_path))
-
-            # Load the document
-            print(f"Loading document")
-            documents = loader.load()
-            print(f"Loaded {len(documents)} pages")
-
-            # Split text into chunks
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=1000,
-                chunk_overlap=200,
-                length_function=len,
-            )
-            
-            chunks = text_splitter.split_documents(documents)
-            print(f"Split into {len(chunks)} chunks")
-            
-            # Convert chunks to format expected by ChromaDB
-            processed_chunks = []
-            for i, chunk in enumerate(chunks):
-                processed_chunks.append({
-                    'id': f"{file_path.name}_{i}",
-                    'text': chunk.page_content,
-                    'metadata': {
-                        'source': str(file_path),
-                        'page': chunk.metadata.get('page', 0)
-                    }
-                })
-            
-            print(f"Created {len(processed_chunks)} processed chunks")
-            return processed_chunks
-            
+            return self.split_documents(file_path, self.load_document(file_path))
         except Exception as e:
-            print(f"Error processing document {file_path}: {str(e)}")
-            print(f"Traceback: {traceback.format_exc()}")
+            logger.exception("Error processing document %s: %s", file_path, e)
             raise
 
-    def add_documents(self, collection_name: str, file_paths: List[str]) -> None:
+    def add_documents(
+        self,
+        collection_name: str,
+        file_paths: List[str],
+        chunk_size: int = CHUNK_SIZE,
+        chunk_overlap: int = CHUNK_OVERLAP,
+        batch_size: int = EMBEDDING_BATCH_SIZE
+    ) -> None:
         """Add documents to the vector store"""
         try:
-            print(f"Adding documents to collection: {collection_name}")
-            print(f"File paths: {file_paths}")
+            logger.info("Adding %d documents to collection %s", len(file_paths), collection_name)
             
             collection = self.create_collection(collection_name)
             
             all_chunks = []
             for file_path in file_paths:
                 try:
-                    print(f"Processing file: {file_path}")
-                    chunks = self.process_document(file_path)
-                    print(f"Generated {len(chunks)} chunks for {file_path}")
+                    with span("ingest_parse"):
+                        documents = self.load_document(file_path)
+                    with span("ingest_split"):
+                        chunks = self.split_documents(file_path, documents, chunk_size, chunk_overlap)
+                    logger.debug("Generated %d chunks for %s", len(chunks), file_path)
                     all_chunks.extend(chunks)
                 except Exception as e:
-                    print(f"Error processing file {file_path}: {str(e)}")
+                    logger.error("Error processing file %s: %s", file_path, e)
                     raise
             
             if all_chunks:
-                # Add all chunks to collection at once
-                print(f"Adding {len(all_chunks)} total chunks to collection")
-                collection.add(
-                    ids=[chunk['id'] for chunk in all_chunks],
-                    documents=[chunk['text'] for chunk in all_chunks],
-                    metadatas=[chunk['metadata'] for chunk in all_chunks]
-                )
-                print(f"Successfully added all chunks to collection")
+                logger.debug("Adding %d total chunks to collection %s", len(all_chunks), collection_name)
+                # Embed explicitly, in bounded batches, so the model and the
+                # index write can be timed (and sized) separately
+                for start in range(0, len(all_chunks), batch_size):
+                    batch = all_chunks[start:start + batch_size]
+                    texts = [chunk['text'] for chunk in batch]
+                    with span("ingest_embed"):
+                        embeddings = self.embedding_function(texts)
+                    with span("ingest_upsert"):
+                        collection.add(
+                            ids=[chunk['id'] for chunk in batch],
+                            embeddings=embeddings,
+                            documents=texts,
+                            metadatas=[chunk['metadata'] for chunk in batch]
+                        )
+                logger.info("Added %d chunks to collection %s", len(all_chunks), collection_name)
+                # Re-estimate the collection's footprint on next load
+                self.collections.discard(collection_name)
             else:
-                print("No chunks generated from any files")
+                logger.warning("No chunks generated from any files for collection %s", collection_name)
                 
         except Exception as e:
-            print(f"Error adding documents: {str(e)}")
-            print(f"Traceback: {traceback.format_exc()}")
+            logger.exception("Error adding documents to collection %s: %s", collection_name, e)
             raise
 
-    def query_collection(self, collection_name: str, query: str, n_results: int = 5) -> List[Dict[str, Any]]:
-        """Query the vector store"""
+    def get_collection(self, collection_name: str) -> Any:
+        """Get a collection, loading it into the resident set on first use"""
+        return self.collections.get(collection_name, self._load_collection)
+
+    def _load_collection(self, collection_name: str) -> Any:
+        return self.client.get_collection(
+            name=collection_name,
+            embedding_function=self.embedding_function
+        )
+
+    def prewarm(self, collection_names: List[str]) -> int:
+        """Load collections and their HNSW indexes ahead of traffic"""
+        warmed = 0
+        for collection_name in collection_names:
+            try:
+                collection = self.get_collection(collection_name)
+                if collection.count() > 0:
+                    # A real query pulls the vector index into Chroma's segment cache
+                    collection.query(query_texts=["warmup"], n_results=1)
+                warmed += 1
+            except Exception as e:
+                logger.error("Error prewarming collection %s: %s", collection_name, e)
+        logger.info("Prewarmed %d of %d collections", warmed, len(collection_names))
+        return warmed
+
+    def residency_stats(self) -> Dict[str, Any]:
+        """Resident-set size and eviction counters"""
+        return self.collections.stats()
+
+    def embed_query(self, query: str) -> List[float]:
+        """Embedding of a single query, for callers that need it before retrieval"""
+        return [float(value) for value in self.embedding_function([query])[0]]
+
+    def query_collection(
+        self,
+        collection_name: str,
+        query: str,
+        n_results: int = 5,
+        query_embedding: Optional[List[float]] = None
+    ) -> List[Dict[str, Any]]:
+        """Query the vector store, reusing `query_embedding` if already computed"""
+        logger.debug("Querying collection %s with: %s", collection_name, query)
+        query_embeddings = [query_embedding] if query_embedding is not None else None
+        return self.query_collection_batch(collection_name, [query], n_results, query_embeddings)[0]
+
+    def query_collection_batch(
+        self,
+        collection_name: str,
+        queries: List[str],
+        n_results: int = 5,
+        query_embeddings: Optional[List[List[float]]] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """Query the vector store with several queries in one embedding and search call"""
         try:
-            print(f"Querying collection {collection_name} with: {query}")
-            collection = self.client.get_collection(collection_name)
+            collection = self.get_collection(collection_name)
+            if query_embeddings is not None:
+                query_args = {"query_embeddings": query_embeddings}
+            else:
+                query_args = {"query_texts": queries}
             
-            results = collection.query(
-                query_texts=[query],
-                n_results=n_results
-            )
+            try:
+                results = collection.query(
+                    n_results=n_results,
+                    **query_args
+                )
+            except Exception:
+                # The cached handle goes stale if the collection was rebuilt
+                # (e.g. by tools/tune_hnsw.py --apply); reload it once
+                self.collections.discard(collection_name)
+                collection = self.get_collection(collection_name)
+                results = collection.query(
+                    n_results=n_results,
+                    **query_args
+                )
             
-            # Format results
+            # Format results, one list per query
             formatted_results = []
-            for i in range(len(results['ids'][0])):
-                formatted_results.append({
-                    'id': results['ids'][0][i],
-                    'text': results['documents'][0][i],
-                    'metadata': results['metadatas'][0][i],
-                    'distance': results['distances'][0][i] if 'distances' in results else None
-                })
+            for q in range(len(results['ids'])):
+                formatted_results.append([
+                    {
+                        'id': results['ids'][q][i],
+                        'text': results['documents'][q][i],
+                        'metadata': results['metadatas'][q][i],
+                        'distance': results['distances'][q][i] if results.get('distances') else None
+                    }
+                    for i in range(len(results['ids'][q]))
+                ])
             
-            print(f"Found {len(formatted_results)} results")
+            logger.debug("Found results for %d queries in %s", len(formatted_results), collection_name)
             return formatted_results
             
         except Exception as e:
-            print(f"Error querying collection: {str(e)}")
+            logger.error("Error querying collection %s: %s", collection_name, e)
             raise
 
     def delete_collection(self, collection_name: str) -> None:
         """Delete a collection"""
         try:
-            print(f"Deleting collection: {collection_name}")
+            self.collections.discard(collection_name)
             self.client.delete_collection(collection_name)
-            print(f"Collection {collection_name} deleted")
+            self._forget_tuned_params(collection_name)
+            logger.info("Collection %s deleted", collection_name)
         except Exception as e:
-            print(f"Error deleting collection: {str(e)}")
+            logger.error("Error deleting collection %s: %s", collection_name, e)
             raise
@@ -1,11 +1,12 @@
 import os
-from sqlalchemy import create_engine, MetaData
+from sqlalchemy import create_engine, event, MetaData
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from databases import Database
 
-# Define the path for the SQLite database file
-DATABASE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+# Define the path for the SQLite database file (DATABASE_DIR overrides it, e.g. for
+# a throwaway instance; the other data/ paths follow the working directory)
+DATABASE_DIR = os.getenv("DATABASE_DIR") or os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
 if not os.path.exists(DATABASE_DIR):
     os.makedirs(DATABASE_DIR)
 
@@ -14,6 +15,24 @@ DATABASE_URL = f"sqlite+aiosqlite:///{os.path.join(DATABASE_DIR, 'chatbotmaker.d
 # SQLAlchemy setup (for model definitions and potentially synchronous operations if needed)
 engine = create_engine(DATABASE_URL.replace("+aiosqlite", ""), connect_args={"check_same_thread": False})
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Applied to every new connection. WAL lets readers proceed while a write commits;
+# with WAL, synchronous=NORMAL only risks the last transactions on power loss, not corruption.
+SQLITE_PRAGMAS = (
+    "journal_mode=WAL",
+    "synchronous=NORMAL",
+    f"busy_timeout={int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))}",
+    f"cache_size=-{int(os.getenv('SQLITE_CACHE_SIZE_KB', '20000'))}",
+    "temp_store=MEMORY",
+    f"mmap_size={int(os.getenv('SQLITE_MMAP_SIZE_MB', '128')) * 1024 * 1024}",
+)
+
+@event.listens_for(engine, "connect")
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(f"PRAGMA {pragma}")
+    cursor.close()
 Base = declarative_base()
 
 # Databases library setup (for async database access in FastAPI endpoints)
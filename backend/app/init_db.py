@@ -1,11 +1,11 @@
-from .db_session import engine, Base
-from . import models
+from .db_session import engine
+from .migrations import run_migrations
 
 def init_db():
-    """Create all tables defined in models.py"""
+    """Create all tables defined in models.py and apply pending migrations"""
     print("Creating database tables...")
-    Base.metadata.create_all(bind=engine)
-    print("Database tables created successfully!")
+    version = run_migrations(engine)
+    print(f"Database tables created successfully (schema version {version})!")
 
 if __name__ == "__main__":
     init_db()
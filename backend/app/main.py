@@ -1,46 +1,72 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks, Form, Request, Body, Depends, status
+from .startup import startup_tracker
+from dotenv import load_dotenv
+
+# Load environment variables before app modules read their settings at import
+load_dotenv()
+
+from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks, Form, Request, Body, Depends, Query, status, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, JSONResponse, PlainTextResponse, Response, FileResponse
+from starlette.background import BackgroundTask
 from fastapi.security import OAuth2PasswordRequestForm 
+import base64
 import json
+import math
+import shutil
+import tempfile
+import zipfile
 import uuid
-from datetime import datetime, timedelta 
-from typing import List, Dict, Any
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple
 from pathlib import Path
 import aiofiles
 import asyncio
+import time
 from sse_starlette.sse import EventSourceResponse
 from sqlalchemy.orm import Session 
 
 from .database.vector_store import VectorStore
 from .services.groq_chat import GroqChat
-from textblob import TextBlob
 import httpx
 import os
-from dotenv import load_dotenv
-from .security import get_current_active_user, authenticate_user, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
+from .security import get_current_active_user, authenticate_user_async, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES, principal_cache
+from .utils.password_utils import password_hasher, get_password_hash_async, PasswordHasherBusy
+from .services.login_throttle import login_throttle
 from . import models, schemas, crud 
-from .db_session import get_db, engine, Base
+from .db_session import get_db, engine, SessionLocal
+from .migrations import run_migrations
 from .crud_sessions import (
     create_chat_session, get_chat_session, get_active_session_by_user,
     update_session_activity, close_session, get_inactive_sessions,
     add_message_to_session, get_session_messages, create_insight,
-    get_all_insights, get_insight_by_session
+    get_insights_page, get_insight_rollups, get_insight_by_session, get_most_active_chatbots,
+    get_insight_export_rows, get_transcript_session_keys, get_transcript_rows,
+    INSIGHT_EXPORT_COLUMNS, TRANSCRIPT_EXPORT_COLUMNS,
+    touch_active_session
 )
 from .services.conversation_analyzer import ConversationAnalyzer
+from .services.llm_scheduler import llm_scheduler, LLMOverloadedError, INTERACTIVE, BACKGROUND
+from .services.llm_providers import get_llm_provider, LLMProviderError, CHAT
+from .services.circuit_breaker import llm_breaker, CircuitOpenError, OPEN, HALF_OPEN
+from .services.extractive_answer import build_extractive_answer
+from .services.prompts import build_conversation
+from .services.faq import faq_index, SOURCE_FAQ, SOURCE_LLM, SOURCE_FALLBACK
+from .services.chatbot_registry import (
+    chatbot_list_cache, chatbot_summary, widget_config_cache, etag_matches, WIDGET_CONFIG_CACHE_CONTROL
+)
+from .services.exports import (
+    RowFormatter, export_chunks, export_filename, column_names, MEDIA_TYPES,
+    EXPORT_BATCH_ROWS, EXPORT_BATCH_SESSIONS
+)
+from .services.garbage_collector import garbage_collector, trash_chatbot_files, GC_INTERVAL_SECONDS
+from .services.kb_snapshots import export_snapshot, restore_chatbot, SnapshotError
+from .services.chat_channel import chat_channel, ChatConnection, visitor_identifier, WS_IDLE_TIMEOUT_SECONDS
+from .utils.metrics import registry, span, MetricsMiddleware
+from .utils.logging_config import setup_logging, shutdown_logging, dropped_records, RequestIdMiddleware
+import logging
 
-# Load environment variables
-load_dotenv()
-
-# Get API key from environment
-GROQ_API_KEY = os.getenv('GROQ_API_KEY')
-if not GROQ_API_KEY:
-    raise ValueError("GROQ_API_KEY environment variable is not set")
-
-# Initialize database tables
-print("Initializing database tables...")
-Base.metadata.create_all(bind=engine)
-print("Database tables initialized successfully!")
+setup_logging()
+logger = logging.getLogger(__name__)
 
 app = FastAPI()
 
@@ -51,9 +77,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Next-Cursor"],
 )
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(RequestIdMiddleware)
 
-# Initialize services
+# Initialize services (cheap: heavy clients and models load on first use or during warm-up)
+llm_provider = get_llm_provider()  # fails fast if the provider isn't configured
 vector_store = VectorStore()
 groq_chat = GroqChat()
 conversation_analyzer = ConversationAnalyzer()
@@ -61,6 +91,171 @@ conversation_analyzer = ConversationAnalyzer()
 # Store progress updates
 chatbot_progress = {}
 
+# Batch queries: questions accepted per request, and completions run at once per request
+BATCH_QUERY_MAX_QUESTIONS = int(os.getenv("BATCH_QUERY_MAX_QUESTIONS", "100"))
+BATCH_QUERY_CONCURRENCY = int(os.getenv("BATCH_QUERY_CONCURRENCY", "8"))
+
+# Insights returned per page when the client doesn't ask for fewer, and the most it may ask for
+INSIGHTS_PAGE_SIZE = int(os.getenv("INSIGHTS_PAGE_SIZE", "100"))
+INSIGHTS_MAX_PAGE_SIZE = int(os.getenv("INSIGHTS_MAX_PAGE_SIZE", "500"))
+# Longest range served by the insight rollups endpoint
+INSIGHT_ROLLUP_MAX_DAYS = int(os.getenv("INSIGHT_ROLLUP_MAX_DAYS", "366"))
+
+# Number of busiest collections to load into memory at startup (0 disables prewarming)
+PREWARM_TOP_N = int(os.getenv("VECTOR_STORE_PREWARM_TOP_N", "0"))
+# Warm the Chroma client, embedding model and hot collections before reporting ready.
+# When disabled the worker is ready immediately and the first query pays the load cost.
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+# A failed warm-up is retried this many times, waiting twice as long before each retry
+WARMUP_RETRIES = int(os.getenv("WARMUP_RETRIES", "3"))
+WARMUP_RETRY_BACKOFF_SECONDS = float(os.getenv("WARMUP_RETRY_BACKOFF_SECONDS", "2"))
+
+registry.counter(
+    "botgenie_log_records_dropped_total",
+    "Log records dropped because the log writer queue was full",
+    dropped_records,
+)
+
+registry.gauge(
+    "botgenie_vector_store_resident_collections",
+    "Collections currently held in the resident set",
+    lambda: vector_store.residency_stats()["resident_collections"],
+)
+registry.gauge(
+    "botgenie_vector_store_resident_bytes",
+    "Estimated memory used by resident collections",
+    lambda: vector_store.residency_stats()["resident_bytes"],
+)
+registry.counter(
+    "botgenie_vector_store_evictions_total",
+    "Collections evicted from the resident set",
+    lambda: vector_store.residency_stats()["evictions"],
+)
+
+registry.gauge(
+    "botgenie_llm_queue_depth",
+    "LLM calls waiting for rate-limit quota or a concurrency slot",
+    lambda: llm_scheduler.queue_depth,
+)
+registry.gauge(
+    "botgenie_llm_in_flight",
+    "LLM calls currently in flight",
+    lambda: llm_scheduler.limiter.in_flight,
+)
+registry.gauge(
+    "botgenie_llm_concurrency_limit",
+    "Current adaptive limit on in-flight LLM calls",
+    lambda: llm_scheduler.limiter.limit,
+)
+registry.gauge(
+    "botgenie_llm_queue_depth_background",
+    "Background LLM calls (conversation analysis) waiting in the queue",
+    lambda: llm_scheduler.queue.depth("background"),
+)
+registry.gauge(
+    "botgenie_llm_interactive_p95_seconds",
+    "p95 end-to-end latency of interactive LLM calls over the last minute",
+    lambda: llm_scheduler.interactive_latency.percentile(0.95) or 0,
+)
+registry.counter(
+    "botgenie_llm_shed_total",
+    "Background LLM calls shed while interactive latency was over target",
+    lambda: llm_scheduler.shed_total,
+)
+registry.counter(
+    "botgenie_llm_retries_total",
+    "LLM calls retried after a 429, 5xx or connection failure",
+    lambda: llm_scheduler.retries_total,
+)
+registry.counter(
+    "botgenie_llm_throttled_total",
+    "LLM responses with status 429",
+    lambda: llm_scheduler.throttled_total,
+)
+
+registry.gauge(
+    "botgenie_llm_circuit_state",
+    "LLM circuit breaker state (0 closed, 1 half-open, 2 open)",
+    lambda: {HALF_OPEN: 1, OPEN: 2}.get(llm_breaker.state, 0),
+)
+registry.counter(
+    "botgenie_llm_circuit_rejected_total",
+    "Queries answered with the extractive fallback because the LLM circuit was open",
+    lambda: llm_breaker.rejected_total,
+)
+registry.counter(
+    "botgenie_llm_circuit_trips_total",
+    "Times the LLM circuit breaker opened",
+    lambda: llm_breaker.trips_total,
+)
+
+registry.counter(
+    "botgenie_chat_queries_total",
+    "Chatbot queries answered",
+    lambda: sum(faq_index.answer_totals().values()),
+)
+registry.counter(
+    "botgenie_chat_answers_faq_total",
+    "Queries answered from precomputed FAQ answers, without retrieval or an LLM call",
+    lambda: faq_index.answer_totals()[SOURCE_FAQ],
+)
+registry.counter(
+    "botgenie_chat_answers_fallback_total",
+    "Queries answered with the extractive fallback, without an LLM answer",
+    lambda: faq_index.answer_totals()[SOURCE_FALLBACK],
+)
+
+registry.gauge(
+    "botgenie_chat_connections_open",
+    "WebSocket chat connections open on this worker",
+    lambda: chat_channel.open_total,
+)
+registry.counter(
+    "botgenie_chat_connections_rejected_total",
+    "WebSocket chat connections refused at WS_MAX_CONNECTIONS",
+    lambda: chat_channel.rejected_total,
+)
+
+registry.counter(
+    "botgenie_auth_cache_hits_total",
+    "Authenticated requests served from the verified-token cache, without a user lookup",
+    lambda: principal_cache.hits,
+)
+registry.counter(
+    "botgenie_auth_cache_misses_total",
+    "Authenticated requests that decoded the token and loaded the user",
+    lambda: principal_cache.misses,
+)
+
+registry.gauge(
+    "botgenie_password_hash_pending",
+    "Password hash/verify operations queued or running on the hashing pool",
+    lambda: password_hasher.pending,
+)
+registry.counter(
+    "botgenie_password_hash_rejected_total",
+    "Logins and registrations refused because the hashing pool was saturated",
+    lambda: password_hasher.rejected_total,
+)
+registry.counter(
+    "botgenie_login_throttled_total",
+    "Login and registration attempts refused by per-account or per-IP throttling",
+    lambda: login_throttle.throttled_total,
+)
+
+registry.counter(
+    "botgenie_gc_purged_chatbots_total",
+    "Deleted chatbots whose data the garbage collector removed",
+    lambda: garbage_collector.purged_chatbots_total,
+)
+registry.counter(
+    "botgenie_gc_reclaimed_bytes_total",
+    "Disk space freed by the garbage collector (files, archive blocks, vector store)",
+    lambda: garbage_collector.reclaimed_bytes_total,
+)
+
+startup_tracker.record("import", time.perf_counter() - startup_tracker.started_at)
+
 # Create a background task for checking inactive sessions
 from fastapi import BackgroundTasks
 import asyncio
@@ -77,8 +272,7 @@ async def periodic_session_check(app_state: dict):
             from .db_session import SessionLocal
             db = SessionLocal()
             
-            print("\n----- SCHEDULED SESSION CHECK -----")
-            print(f"Running scheduled check at {datetime.now()}")
+            logger.debug("Running scheduled session check")
             
             # Check for inactive sessions
             await check_inactive_sessions(db)
@@ -87,90 +281,201 @@ async def periodic_session_check(app_state: dict):
             db.close()
             
         except Exception as e:
-            print(f"Error in periodic session check: {str(e)}")
+            logger.exception("Error in periodic session check: %s", e)
         
         # Wait for 60 seconds before the next check
         await asyncio.sleep(60)  # Check every minute
 
+# Set by a chatbot deletion so this worker's collector runs without waiting for the interval
+gc_requested = asyncio.Event()
+
+def run_garbage_collection() -> Dict[str, Any]:
+    db = SessionLocal()
+    try:
+        return garbage_collector.collect(db, vector_store)
+    finally:
+        db.close()
+
+async def periodic_garbage_collection(app_state: dict):
+    """Purge deleted chatbots and look for orphaned data in the background"""
+    while app_state["running"]:
+        try:
+            await asyncio.wait_for(gc_requested.wait(), timeout=GC_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        gc_requested.clear()
+        try:
+            await asyncio.to_thread(run_garbage_collection)
+        except Exception as e:
+            logger.exception("Error in garbage collection: %s", e)
+
 @app.on_event("startup")
 async def startup_event():
     """Start the background task when the application starts"""
     global background_task_running
     
+    # Initialize database tables and bring the schema up to date
+    logger.info("Initializing database tables")
+    with startup_tracker.phase("create_tables"):
+        schema_version = await asyncio.to_thread(run_migrations, engine)
+    logger.info("Database tables initialized (schema version %d)", schema_version)
+    
     # Create a shared state dictionary
     app_state = {"running": True}
     
     # Start the background task
     asyncio.create_task(periodic_session_check(app_state))
     background_task_running = True
-    print("Started periodic session check background task")
+    logger.info("Started periodic session check background task")
+    asyncio.create_task(periodic_garbage_collection(app_state))
+    
+    if WARMUP_ON_STARTUP:
+        asyncio.create_task(warm_up_worker())
+    else:
+        startup_tracker.mark_ready(warmed_up=False)
+
+async def warm_up_worker():
+    """Load heavy dependencies in the background, then report ready"""
+    for attempt in range(WARMUP_RETRIES + 1):
+        try:
+            with startup_tracker.phase("vector_store"):
+                await asyncio.to_thread(vector_store.warm_up)
+            
+            if PREWARM_TOP_N > 0:
+                with startup_tracker.phase("prewarm_collections"):
+                    await prewarm_collections(PREWARM_TOP_N)
+            
+            startup_tracker.mark_ready()
+            return
+        except Exception as e:
+            startup_tracker.mark_failed(e)
+            if attempt < WARMUP_RETRIES:
+                await asyncio.sleep(WARMUP_RETRY_BACKOFF_SECONDS * 2 ** attempt)
+    # Everything warm-up loads is also loaded on first use, so serve traffic
+    # rather than staying out of rotation after a persistent warm-up error
+    startup_tracker.mark_ready(warmed_up=False)
+
+async def prewarm_collections(top_n: int):
+    """Load the collections with the most recent traffic into memory"""
+    from .db_session import SessionLocal
+    db = SessionLocal()
+    try:
+        collection_names = get_most_active_chatbots(db, limit=top_n)
+    except Exception as e:
+        logger.error("Error selecting collections to prewarm: %s", e)
+        return
+    finally:
+        db.close()
+    
+    # Loading indexes is blocking Chroma work, keep it off the event loop
+    await asyncio.to_thread(vector_store.prewarm, collection_names)
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Stop the background task when the application shuts down"""
     global background_task_running
     background_task_running = False
-    print("Stopped periodic session check background task")
+    await llm_provider.aclose()
+    logger.info("Stopped periodic session check background task")
+    shutdown_logging()
 
 # Background task to check for inactive sessions and generate insights
 async def check_inactive_sessions(db: Session):
-    print("\n----- CHECKING FOR INACTIVE SESSIONS -----")
     # Get inactive sessions (timeout after 1 minute for testing)
-    inactive_sessions = get_inactive_sessions(db, timeout_minutes=1)
-    print(f"Found {len(inactive_sessions)} inactive sessions")
+    with span("session_check_query"):
+        inactive_sessions = get_inactive_sessions(db, timeout_minutes=1)
+    logger.debug("Found %d inactive sessions", len(inactive_sessions))
     
     for session in inactive_sessions:
-        print(f"\nProcessing inactive session: {session.id}")
-        print(f"Chatbot ID: {session.chatbot_id}")
-        print(f"User: {session.user_identifier}")
-        print(f"Started at: {session.started_at}")
-        print(f"Last activity: {session.last_activity}")
+        logger.info(
+            "Processing inactive session %s (chatbot=%s, started=%s, last_activity=%s)",
+            session.id, session.chatbot_id, session.started_at, session.last_activity
+        )
         
         # Get all messages for the session
-        messages = get_session_messages(db, session.id)
-        print(f"Found {len(messages)} messages in the session")
+        with span("session_messages"):
+            messages = get_session_messages(db, session.id)
+        logger.debug("Found %d messages in session %s", len(messages), session.id)
         
         if messages:
-            # Print message contents for debugging
-            print("\nSession messages:")
-            for i, msg in enumerate(messages):
-                print(f"  {i+1}. {msg.role}: {msg.content[:50]}...")
-                
             # Analyze the conversation
-            print("\nAnalyzing conversation with LLM...")
-            insight = await conversation_analyzer.analyze_conversation(session.id, messages)
+            try:
+                with span("session_analysis"):
+                    insight = await conversation_analyzer.analyze_conversation(session.id, messages, session.chatbot_id)
+            except LLMOverloadedError:
+                # Live chat is over its latency target; leave this and the remaining
+                # sessions active so the next check picks them up
+                logger.info("Deferring analysis of %d sessions while interactive traffic is overloaded", len(inactive_sessions))
+                break
             
             if insight:
-                print("\nInsight generated:")
-                print(f"  Name: {insight.name}")
-                print(f"  Email: {insight.email}")
-                print(f"  Problem Summary: {insight.problem_summary}")
-                print(f"  Bot Solved: {insight.bot_solved}")
-                print(f"  Human Needed: {insight.human_needed}")
-                print(f"  Emotion: {insight.emotion}")
-                
                 # Create insight in the database
                 try:
-                    db_insight = create_insight(db, insight)
-                    print(f"\nInsight saved to database with ID: {db_insight.id}")
+                    with span("insight_save"):
+                        db_insight = create_insight(db, insight)
+                    logger.info("Insight %s saved for session %s", db_insight.id, session.id)
                 except Exception as e:
-                    print(f"Error saving insight to database: {str(e)}")
+                    logger.error("Error saving insight for session %s: %s", session.id, e)
             else:
-                print("Failed to generate insight from conversation")
+                logger.warning("Failed to generate insight for session %s", session.id)
             
             # Close the session
-            close_session(db, session.id)
-            print(f"Session {session.id} marked as inactive")
+            with span("session_close"):
+                close_session(db, session.id)
+            logger.debug("Session %s marked as inactive", session.id)
         else:
-            print("No messages found in session, skipping analysis")
-    
-    print("----- INACTIVE SESSION CHECK COMPLETE -----\n")
+            logger.debug("No messages in session %s, skipping analysis", session.id)
+
+# --- Health Endpoints ---
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving HTTP"""
+    return {"status": "ok", **startup_tracker.report()}
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: warm-up has finished, so the load balancer may route traffic here"""
+    report = startup_tracker.report()
+    if not startup_tracker.ready:
+        return JSONResponse(status_code=503, content={"status": "warming_up", **report})
+    return {"status": "ready", **report}
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
 
 # --- Authentication / User Endpoints ---
 
+def client_address(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+def too_many_attempts(wait_seconds: float) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many attempts, please try again later",
+        headers={"Retry-After": str(math.ceil(wait_seconds))},
+    )
+
+def hashing_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Server is busy, please try again shortly",
+        headers={"Retry-After": "1"},
+    )
+
 @app.post("/api/token", response_model=schemas.Token)
-async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = authenticate_user(db, form_data.username, form_data.password)
+async def login_for_access_token(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+    client_ip = client_address(request)
+    wait_seconds = login_throttle.check(client_ip, form_data.username)
+    if wait_seconds > 0:
+        raise too_many_attempts(wait_seconds)
+    try:
+        user = await authenticate_user_async(db, form_data.username, form_data.password)
+    except PasswordHasherBusy:
+        raise hashing_busy()
+    login_throttle.record(client_ip, form_data.username, succeeded=user is not None)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -184,15 +489,27 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
     return {"access_token": access_token, "token_type": "bearer"}
 
 @app.post("/api/users/register", response_model=schemas.User)
-def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
+async def register_user(user: schemas.UserCreate, request: Request, db: Session = Depends(get_db)):
+    client_ip = client_address(request)
+    wait_seconds = login_throttle.check(client_ip)
+    if wait_seconds > 0:
+        raise too_many_attempts(wait_seconds)
     db_user = crud.get_user_by_email(db, email=user.email)
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
-    return crud.create_user(db=db, user=user)
+    # End the read so no pooled connection is held while the hash is computed
+    db.rollback()
+    try:
+        hashed_password = await get_password_hash_async(user.password)
+    except PasswordHasherBusy:
+        raise hashing_busy()
+    return crud.create_user(db=db, user=user, hashed_password=hashed_password)
 
 # --- Chatbot Endpoints ---
 
 def analyze_sentiment(text):
+    from textblob import TextBlob
+    
     analysis = TextBlob(text)
     # Get polarity (-1 to 1) and subjectivity (0 to 1)
     sentiment = analysis.sentiment
@@ -202,31 +519,6 @@ def analyze_sentiment(text):
         return "negative"
     return "neutral"
 
-def get_role_prompt(chatbot_type: str, business_name: str) -> str:
-    base_prompts = {
-        "customer_support": f"""You are a friendly and helpful customer support representative for {business_name}. 
-Your goal is to assist customers with their inquiries and concerns in a professional and empathetic manner.
-Use the provided context to answer questions accurately. If the answer isn't in the context, be honest and say so.""",
-        
-        "sales": f"""You are an experienced sales consultant for {business_name}. 
-Your role is to understand customer needs and recommend suitable products or services.
-Use the provided context to give accurate information about our offerings.""",
-        
-        "product_faq": f"""You are a product expert for {business_name}. 
-Your role is to provide clear and accurate information about our products and services.
-Base your answers on the provided context and explain concepts in simple terms.""",
-        
-        "technical_support": f"""You are a technical support specialist for {business_name}. 
-Your role is to help users solve technical problems efficiently.
-Use the provided context to give accurate technical guidance.""",
-        
-        "general": f"""You are a knowledgeable assistant for {business_name}. 
-Your role is to provide helpful and accurate information based on the provided context.
-Be friendly and professional in your responses."""
-    }
-    
-    return base_prompts.get(chatbot_type, base_prompts["general"])
-
 @app.post("/api/chatbots/create")
 async def create_chatbot(
     background_tasks: BackgroundTasks,
@@ -236,11 +528,13 @@ async def create_chatbot(
     chatbot_type: str = Form(...),
     icon_url: str = Form(None),
     files: List[UploadFile] = File(...),
-    current_user: models.User = Depends(get_current_active_user)
+    current_user: models.User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
 ):
     try:
         # Generate a unique ID for the chatbot
         chatbot_id = str(uuid.uuid4())
+        created_at = datetime.now()
         
         # Create directory for chatbot data
         chatbot_dir = Path(f"data/chatbots/{chatbot_id}")
@@ -253,7 +547,7 @@ async def create_chatbot(
             "chatbot_name": chatbot_name,
             "chatbot_type": chatbot_type,
             "icon": icon_url,
-            "created_at": datetime.now().isoformat(),
+            "created_at": created_at.isoformat(),
             "user_id": current_user.id
         }
         
@@ -282,13 +576,26 @@ async def create_chatbot(
                 })
                 
             except Exception as e:
-                print(f"Error saving file {file.filename}: {str(e)}")
+                logger.error("Error saving file %s: %s", file.filename, e)
                 raise
         
         # Save metadata
         async with aiofiles.open(metadata_path, 'w') as f:
             await f.write(json.dumps(metadata, indent=2))
         
+        # Register the chatbot for owner-indexed listing
+        crud.create_db_chatbot(db, schemas.ChatbotCreateDB(
+            id=chatbot_id,
+            name=chatbot_name,
+            user_id=current_user.id,
+            business_name=business_name,
+            business_type=business_type,
+            chatbot_type=chatbot_type,
+            icon_url=icon_url,
+            created_at=created_at
+        ))
+        chatbot_list_cache.invalidate(current_user.id)
+        
         # Initialize progress
         chatbot_progress[chatbot_id] = {
             "stage": "processing",
@@ -305,7 +612,28 @@ async def create_chatbot(
                     "progress": 50
                 })
                 
-                vector_store.add_documents(chatbot_id, saved_files)
+                with span("ingest"):
+                    vector_store.add_documents(chatbot_id, saved_files)
+
+                # Deleted from another worker meanwhile: the collector may already have
+                # purged it, so drop the collection this ingestion (re)created
+                with SessionLocal() as ingest_db:
+                    deleted = crud.is_chatbot_deleted(ingest_db, chatbot_id)
+                if deleted:
+                    vector_store.delete_collection(chatbot_id)
+                    chatbot_progress[chatbot_id].update({
+                        "stage": "error",
+                        "message": "Chatbot was deleted",
+                        "progress": 0
+                    })
+                    logger.info("Chatbot %s was deleted during ingestion, dropped its collection", chatbot_id)
+                    return
+
+                # A new knowledge base version retires FAQ answers generated from the old one
+                metadata["kb_version"] = metadata.get("kb_version", 0) + 1
+                with open(metadata_path, "w") as f:
+                    f.write(json.dumps(metadata, indent=2))
+                faq_index.invalidate(chatbot_id)
                 
                 chatbot_progress[chatbot_id].update({
                     "stage": "complete",
@@ -313,10 +641,10 @@ async def create_chatbot(
                     "progress": 100,
                     "collection_name": chatbot_id
                 })
-                print(f"Successfully created vector store for chatbot {chatbot_id}")
+                logger.info("Created vector store for chatbot %s", chatbot_id)
                 
             except Exception as e:
-                print(f"Error creating vector store: {str(e)}")
+                logger.exception("Error creating vector store for chatbot %s: %s", chatbot_id, e)
                 chatbot_progress[chatbot_id].update({
                     "stage": "error",
                     "message": str(e),
@@ -332,12 +660,96 @@ async def create_chatbot(
         }
         
     except Exception as e:
-        print(f"Error in process_chatbot_files: {str(e)}")
+        logger.exception("Error in process_chatbot_files: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"Error processing files: {str(e)}"
         )
 
+@app.get("/api/chatbots/{chatbot_id}/snapshot")
+async def export_chatbot_snapshot(
+    chatbot_id: str,
+    current_user: models.User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Download the chatbot's knowledge base, embeddings included, for import elsewhere"""
+    if crud.get_user_chatbot(db, current_user.id, chatbot_id) is None:
+        raise HTTPException(status_code=404, detail="Chatbot not found")
+    metadata_path = Path(f"data/chatbots/{chatbot_id}/metadata.json")
+    async with aiofiles.open(metadata_path, "r") as f:
+        metadata = json.loads(await f.read())
+
+    directory = Path(tempfile.mkdtemp(prefix="snapshot-"))
+    destination = directory / f"{chatbot_id}.snapshot"
+    try:
+        with span("snapshot_export"):
+            await asyncio.to_thread(export_snapshot, vector_store, chatbot_id, destination, metadata)
+    except Exception as e:
+        shutil.rmtree(directory, ignore_errors=True)
+        logger.exception("Error exporting snapshot of %s: %s", chatbot_id, e)
+        raise HTTPException(status_code=500, detail=f"Error exporting snapshot: {str(e)}")
+    return FileResponse(
+        destination,
+        media_type="application/zip",
+        filename=destination.name,
+        background=BackgroundTask(shutil.rmtree, directory, ignore_errors=True)
+    )
+
+@app.post("/api/chatbots/import")
+async def import_chatbot_snapshot(
+    snapshot: UploadFile = File(...),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """Create a chatbot owned by the current user from a snapshot, without re-embedding"""
+    chatbot_id = str(uuid.uuid4())
+    with tempfile.TemporaryDirectory(prefix="snapshot-") as directory:
+        source = Path(directory) / "upload.snapshot"
+        async with aiofiles.open(source, "wb") as f:
+            while chunk := await snapshot.read(1 << 20):
+                await f.write(chunk)
+
+        def restore():
+            with SessionLocal() as restore_db:
+                return restore_chatbot(restore_db, vector_store, source, chatbot_id, owner_id=current_user.id)
+
+        try:
+            with span("snapshot_import"):
+                metadata = await asyncio.to_thread(restore)
+        except (SnapshotError, zipfile.BadZipFile) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid snapshot: {e}")
+        except Exception as e:
+            logger.exception("Error importing snapshot: %s", e)
+            raise HTTPException(status_code=500, detail=f"Error importing snapshot: {str(e)}")
+    chatbot_list_cache.invalidate(current_user.id)
+    return {"id": chatbot_id, "name": metadata["chatbot_name"]}
+
+@app.delete("/api/chatbots/{chatbot_id}", status_code=202)
+async def delete_chatbot(
+    chatbot_id: str,
+    current_user: models.User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Delete a chatbot.
+
+    It stops being listed and served immediately; the garbage collector then
+    removes its collection, files, conversations and insights in the background.
+    """
+    if crud.get_user_chatbot(db, current_user.id, chatbot_id) is None:
+        raise HTTPException(status_code=404, detail="Chatbot not found")
+    progress = chatbot_progress.get(chatbot_id)
+    if progress and progress["stage"] not in ("complete", "error"):
+        raise HTTPException(status_code=409, detail="Chatbot is still being created, try again once it is ready")
+    crud.mark_chatbot_deleted(db, chatbot_id)
+    await asyncio.to_thread(trash_chatbot_files, chatbot_id)
+
+    chatbot_list_cache.invalidate(current_user.id)
+    widget_config_cache.invalidate(chatbot_id)
+    faq_index.invalidate(chatbot_id)
+    vector_store.collections.discard(chatbot_id)
+    chatbot_progress.pop(chatbot_id, None)
+    gc_requested.set()
+    return {"id": chatbot_id, "status": "deleting"}
+
 @app.get("/api/chatbots/progress")
 async def get_progress(id: str):
     async def event_generator():
@@ -356,7 +768,7 @@ async def get_progress(id: str):
                 await asyncio.sleep(1)
                 
         except Exception as e:
-            print(f"Error in progress stream: {str(e)}")
+            logger.error("Error in progress stream: %s", e)
             yield {
                 "data": json.dumps({
                     "stage": "error",
@@ -368,194 +780,449 @@ async def get_progress(id: str):
     return EventSourceResponse(event_generator())
 
 @app.get("/api/chatbots")
-async def list_chatbots(current_user: models.User = Depends(get_current_active_user)):
-    chatbots_list = []
-    chatbots_dir = Path("data/chatbots")
-    user_id = current_user.id
-    
-    if not chatbots_dir.is_dir():
-        return [] 
-
+async def list_chatbots(current_user: models.User = Depends(get_current_active_user), db: Session = Depends(get_db)):
+    """The current user's chatbots, from the chatbots table (see tools/backfill_chatbots.py)"""
     try:
-        # Iterate through subdirectories in data/chatbots
-        for chatbot_id_dir in chatbots_dir.iterdir():
-            if chatbot_id_dir.is_dir():
-                metadata_path = chatbot_id_dir / "metadata.json"
-                if metadata_path.is_file():
-                    try:
-                        async with aiofiles.open(metadata_path, 'r') as f:
-                            metadata = json.loads(await f.read())
-                            # Filter by the current user's ID
-                            if metadata.get("user_id") == user_id:
-                                chatbots_list.append({
-                                    "id": chatbot_id_dir.name, 
-                                    "name": metadata.get("chatbot_name", "Unnamed Chatbot"),
-                                    "created_at": metadata.get("created_at", ""),
-                                    "icon_url": metadata.get("icon") 
-                                })
-                    except Exception as e:
-                        # Log error reading specific metadata file but continue with others
-                        print(f"Error reading metadata for {chatbot_id_dir.name}: {e}")
-                        
-        return chatbots_list 
-
+        return chatbot_list_cache.get(
+            current_user.id,
+            lambda: [chatbot_summary(chatbot) for chatbot in crud.get_user_chatbots(db, current_user.id)]
+        )
     except Exception as e:
-        print(f"Error listing chatbots: {str(e)}")
+        logger.exception("Error listing chatbots: %s", e)
+        raise HTTPException(status_code=500, detail="Error listing chatbots")
 
 @app.get("/api/chatbots/details/{chatbot_id}")
-async def get_chatbot_details(chatbot_id: str):
+async def get_chatbot_details(chatbot_id: str, request: Request):
+    """Widget config, loaded on every page view of sites embedding the widget.
+
+    Responses carry a strong ETag and Cache-Control so browsers and CDNs can
+    reuse them; a matching If-None-Match gets an empty 304.
+    """
     # Note: This endpoint currently does NOT check ownership.
     # If you want only the owner to see details, add:
     # current_user: models.User = Depends(get_current_active_user)
     # And then check metadata.get("user_id") == current_user.id before returning
     try:
-        # Get chatbot details from the database
-        chatbot_dir = Path(f"data/chatbots/{chatbot_id}")
-        metadata_path = chatbot_dir / "metadata.json"
-        async with aiofiles.open(metadata_path, 'r') as f:
-            metadata = json.loads(await f.read())
-        
-        return {
-            "name": metadata["chatbot_name"],
-            "type": metadata["chatbot_type"],
-            "business_name": metadata["business_name"],
-            "business_type": metadata["business_type"],
-            "icon_url": metadata.get("icon")
-        }
+        config = widget_config_cache.get(chatbot_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    if config is None:
+        raise HTTPException(status_code=404, detail="Chatbot not found")
+
+    headers = {"ETag": config.etag, "Cache-Control": WIDGET_CONFIG_CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match"), config.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=config.body, media_type="application/json", headers=headers)
+
+async def answer_question(
+    collection_name: str,
+    metadata: dict,
+    question: str,
+    query_embedding: Optional[List[float]] = None
+) -> Tuple[str, str]:
+    """Retrieve context and generate an answer; returns (answer, source)"""
+    # Get relevant chunks from vector store
+    with span("retrieval"):
+        results = vector_store.query_collection(collection_name, question, query_embedding=query_embedding)
+
+    return await complete_answer(collection_name, metadata, question, results)
+
+async def complete_answer(
+    collection_name: str,
+    metadata: dict,
+    question: str,
+    results: List[Dict[str, Any]],
+    priority: str = INTERACTIVE
+) -> Tuple[str, str]:
+    """Generate an answer from retrieved chunks; returns (answer, source)"""
+    # Format context from results
+    context = "\n\n".join([r["text"] for r in results])
+
+    # Create conversation context with the role-specific prompt
+    conversation = build_conversation(metadata, context, question)
+
+    # Get response from the LLM provider
+    llm_started = time.monotonic()
+    breaker_generation = None
+    try:
+        breaker_generation = llm_breaker.before_call()
+        with span("llm"):
+            assistant_response = await llm_provider.complete(
+                conversation,
+                purpose=CHAT,
+                temperature=0.7,
+                max_tokens=1000,
+                priority=priority,
+                tenant=collection_name
+            )
+        llm_breaker.record_success(breaker_generation, time.monotonic() - llm_started)
+        return assistant_response, SOURCE_LLM
+    except Exception as e:
+        return settle_llm_error(e, question, results, llm_started, breaker_generation)
+
+async def stream_answer(
+    collection_name: str,
+    metadata: dict,
+    question: str,
+    results: List[Dict[str, Any]]
+) -> AsyncIterator[Tuple[str, str]]:
+    """Generate an answer from retrieved chunks as (delta, source) pairs as the LLM produces it"""
+    context = "\n\n".join([r["text"] for r in results])
+    conversation = build_conversation(metadata, context, question)
+
+    deltas = None
+    streamed = False
+    settled = False
+    llm_started = time.monotonic()
+    breaker_generation = None
+    try:
+        breaker_generation = llm_breaker.before_call()
+        with span("llm"):
+            deltas = llm_provider.stream(
+                conversation,
+                purpose=CHAT,
+                temperature=0.7,
+                max_tokens=1000,
+                tenant=collection_name
+            )
+            async for delta in deltas:
+                streamed = True
+                yield delta, SOURCE_LLM
+        settled = True
+        llm_breaker.record_success(breaker_generation, time.monotonic() - llm_started)
+    except Exception as e:
+        settled = True
+        assistant_response, source = settle_llm_error(e, question, results, llm_started, breaker_generation)
+        # Once part of the answer is out, keep it rather than appending a second one
+        if not streamed:
+            yield assistant_response, source
+    finally:
+        if deltas is not None:
+            await deltas.aclose()
+        if not settled:
+            # The client went away mid-answer; that says nothing about the LLM's health
+            llm_breaker.release(breaker_generation)
+
+def settle_llm_error(
+    e: Exception,
+    question: str,
+    results: List[Dict[str, Any]],
+    llm_started: float,
+    breaker_generation: Optional[int]
+) -> Tuple[str, str]:
+    """Record a failed LLM call on the breaker and pick the answer to give instead"""
+    if isinstance(e, CircuitOpenError):
+        # LLM is unhealthy: fail fast and answer from the retrieved chunks
+        return build_extractive_answer(question, results), SOURCE_FALLBACK
+    if isinstance(e, LLMOverloadedError):
+        # Background call shed to protect live chat; not a provider failure
+        llm_breaker.release(breaker_generation)
+        return build_extractive_answer(question, results), SOURCE_FALLBACK
+    if isinstance(e, (httpx.ConnectTimeout, httpx.ConnectError, httpx.ReadTimeout)):
+        # Handle connection timeouts and errors
+        llm_breaker.record_failure(breaker_generation)
+        logger.warning("API Connection Error: %s", e)
+        return build_extractive_answer(question, results), SOURCE_FALLBACK
+    if isinstance(e, LLMProviderError):
+        logger.error("LLM API Error: %s", e.detail)
+        if e.status_code < 500 and e.status_code != 429:
+            # The provider answered; a rejected request says nothing about its health
+            llm_breaker.record_success(breaker_generation, time.monotonic() - llm_started)
+            return "I apologize, but I encountered an unexpected error. Please try again or contact support if the issue persists.", SOURCE_LLM
+        llm_breaker.record_failure(breaker_generation)
+        return build_extractive_answer(question, results), SOURCE_FALLBACK
+    # Handle other API errors
+    llm_breaker.record_failure(breaker_generation)
+    logger.error("Unexpected API Error: %s", e, exc_info=e)
+    return build_extractive_answer(question, results), SOURCE_FALLBACK
 
 @app.post("/api/chatbots/{collection_name}/query")
 async def query_chatbot(collection_name: str, query: dict = Body(...), request: Request = None, db: Session = Depends(get_db)):
     try:
         # Get chatbot metadata
-        chatbot_dir = Path(f"data/chatbots/{collection_name}")
-        metadata_path = chatbot_dir / "metadata.json"
-        async with aiofiles.open(metadata_path, 'r') as f:
-            metadata = json.loads(await f.read())
+        with span("metadata"):
+            chatbot_dir = Path(f"data/chatbots/{collection_name}")
+            metadata_path = chatbot_dir / "metadata.json"
+            try:
+                async with aiofiles.open(metadata_path, 'r') as f:
+                    metadata = json.loads(await f.read())
+            except FileNotFoundError:
+                raise HTTPException(status_code=404, detail="Chatbot not found")
 
         # Session management - extract user identifier (could be IP, session ID, etc.)
         user_identifier = request.client.host if request else "anonymous"
         
         # Get or create active session for this user
         try:
-            session = get_active_session_by_user(db, collection_name, user_identifier)
-            if not session:
-                session_data = schemas.ChatSessionCreate(
-                    chatbot_id=collection_name,
-                    user_identifier=user_identifier
-                )
-                session = create_chat_session(db, session_data)
-            else:
-                # Update last activity timestamp
-                session = update_session_activity(db, session.id)
+            with span("session_db"):
+                session = get_active_session_by_user(db, collection_name, user_identifier)
+                if not session:
+                    session_data = schemas.ChatSessionCreate(
+                        chatbot_id=collection_name,
+                        user_identifier=user_identifier
+                    )
+                    session = create_chat_session(db, session_data)
+                else:
+                    # Update last activity timestamp
+                    session = update_session_activity(db, session.id)
             
-            # Add user message to session
-            user_message = schemas.ChatMessageCreate(
-                role="user",
-                content=query["query"]
-            )
-            add_message_to_session(db, session.id, user_message)
+                # Add user message to session
+                user_message = schemas.ChatMessageCreate(
+                    role="user",
+                    content=query["query"]
+                )
+                add_message_to_session(db, session.id, user_message)
         except Exception as session_error:
             # If there's an error with session management, log it but continue
-            print(f"Error in session management: {str(session_error)}")
+            logger.error("Error in session management: %s", session_error)
             # This allows the chatbot to still function even if session tracking fails
 
-        # Get relevant chunks from vector store
-        results = vector_store.query_collection(collection_name, query["query"])
-        
-        # Format context from results
-        context = "\n\n".join([r["text"] for r in results])
-        
-        # Get role-specific prompt
-        role_prompt = get_role_prompt(
-            metadata["chatbot_type"],
-            metadata["business_name"]
-        )
-
-        # Create conversation context
-        conversation = [
-            {"role": "system", "content": role_prompt},
-            {"role": "system", "content": f"Here is the relevant context to use in your response:\n\n{context}"},
-            {"role": "user", "content": query["query"]}
-        ]
-
-        # Get response from Groq
-        try:
-            async with httpx.AsyncClient(timeout=30.0) as client:  
-                response = await client.post(
-                    "https://api.groq.com/openai/v1/chat/completions",
-                    headers={
-                        "Authorization": f"Bearer {GROQ_API_KEY}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "model": "llama3-70b-8192",
-                        "messages": conversation,
-                        "temperature": 0.7,
-                        "max_tokens": 1000,
-                    }
-                )
-                
-                if response.status_code != 200:
-                    # Attempt to get error details from Groq's response body
-                    error_detail = f"Error from Groq API (Status: {response.status_code})"
-                    try:
-                        groq_error_body = response.json() # Try parsing as JSON
-                        error_detail += f": {json.dumps(groq_error_body)}"
-                    except json.JSONDecodeError:
-                        try:
-                            groq_error_body = response.text() # Fallback to text
-                            error_detail += f": {groq_error_body}"
-                        except Exception:
-                            error_detail += " (Could not read response body)"
-                    print(f"Groq API Error: {error_detail}") # Log the detailed error
-                    raise HTTPException(
-                        status_code=response.status_code,
-                        detail=error_detail # Include Groq's error if possible
-                    )
-                    
-                result = response.json()
-                assistant_response = result["choices"][0]["message"]["content"]
-        except (httpx.ConnectTimeout, httpx.ConnectError, httpx.ReadTimeout) as e:
-            # Handle connection timeouts and errors
-            print(f"API Connection Error: {str(e)}")
-            assistant_response = "I'm sorry, I'm having trouble connecting to my knowledge base right now. Please try again in a moment or contact support if the issue persists."
-        except Exception as e:
-            # Handle other API errors
-            print(f"Unexpected API Error: {str(e)}")
-            assistant_response = "I apologize, but I encountered an unexpected error. Please try again or contact support if the issue persists."
+        # Frequent questions are answered from the precomputed FAQ without retrieval or the LLM
+        with span("faq_lookup"):
+            faq_match, query_embedding = await asyncio.to_thread(
+                faq_index.lookup,
+                collection_name,
+                metadata.get("kb_version", 0),
+                query["query"],
+                vector_store.embed_query
+            )
+        if faq_match:
+            assistant_response, source = faq_match.answer, SOURCE_FAQ
+        else:
+            assistant_response, source = await answer_question(
+                collection_name, metadata, query["query"], query_embedding
+            )
+        faq_index.record_answer(collection_name, source)
             
         # Try to add assistant message to session
         try:
-            if 'session' in locals() and session:
-                assistant_message = schemas.ChatMessageCreate(
-                    role="assistant",
-                    content=assistant_response
-                )
-                add_message_to_session(db, session.id, assistant_message)
+            with span("session_save"):
+                if 'session' in locals() and session:
+                    assistant_message = schemas.ChatMessageCreate(
+                        role="assistant",
+                        content=assistant_response
+                    )
+                    add_message_to_session(db, session.id, assistant_message)
                 
-                # Run background task to check for inactive sessions
-                background_tasks = BackgroundTasks()
-                background_tasks.add_task(check_inactive_sessions, db)
+                    # Run background task to check for inactive sessions
+                    background_tasks = BackgroundTasks()
+                    background_tasks.add_task(check_inactive_sessions, db)
         except Exception as session_error:
             # If there's an error with session management, log it but continue
-            print(f"Error in session message tracking: {str(session_error)}")
+            logger.error("Error in session message tracking: %s", session_error)
         
         return {"response": assistant_response}
 
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"\n--- DETAILED ERROR IN QUERY_CHATBOT ---")
-        import traceback
-        traceback.print_exc()  # Print the full traceback
-        print(f"Error type: {type(e).__name__}")
-        print(f"Error details: {e!r}")
-        print(f"-------------------------------------\n")
+        logger.exception("Error in query_chatbot (%s): %r", type(e).__name__, e)
         raise HTTPException(
             status_code=500,
             detail=f"Error querying chatbot: {str(e)}"
         )
 
+@app.post("/api/chatbots/{collection_name}/query/batch")
+async def query_chatbot_batch(collection_name: str, batch: dict = Body(...)):
+    """Answer a list of questions, streaming one NDJSON line per question as it finishes.
+
+    The questions are embedded, checked against the FAQ and searched in single
+    vectorized calls; completions then run BATCH_QUERY_CONCURRENCY at a time at
+    background priority. Batch questions are not recorded as chat sessions.
+    """
+    questions = batch.get("queries")
+    if not isinstance(questions, list) or not questions or not all(isinstance(q, str) and q.strip() for q in questions):
+        raise HTTPException(status_code=400, detail="queries must be a non-empty list of strings")
+    if len(questions) > BATCH_QUERY_MAX_QUESTIONS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_QUERY_MAX_QUESTIONS} queries per batch")
+
+    metadata_path = Path(f"data/chatbots/{collection_name}/metadata.json")
+    if not metadata_path.exists():
+        raise HTTPException(status_code=404, detail="Chatbot not found")
+    with span("metadata"):
+        async with aiofiles.open(metadata_path, 'r') as f:
+            metadata = json.loads(await f.read())
+    kb_version = metadata.get("kb_version", 0)
+
+    def retrieve_all():
+        with span("embedding"):
+            embeddings = [[float(v) for v in e] for e in vector_store.embedding_function(questions)]
+        with span("faq_lookup"):
+            matches = [
+                faq_index.lookup(collection_name, kb_version, question, lambda _, e=embedding: e)[0]
+                for question, embedding in zip(questions, embeddings)
+            ]
+        pending = [i for i, match in enumerate(matches) if match is None]
+        retrieved = []
+        if pending:
+            with span("retrieval"):
+                retrieved = vector_store.query_collection_batch(
+                    collection_name,
+                    [questions[i] for i in pending],
+                    query_embeddings=[embeddings[i] for i in pending]
+                )
+        return matches, dict(zip(pending, retrieved))
+
+    try:
+        matches, retrieved = await asyncio.to_thread(retrieve_all)
+    except Exception as e:
+        logger.exception("Error in batch retrieval for %s: %s", collection_name, e)
+        raise HTTPException(status_code=500, detail=f"Error querying chatbot: {str(e)}")
+
+    semaphore = asyncio.Semaphore(BATCH_QUERY_CONCURRENCY)
+
+    async def answer(index: int) -> Tuple[int, str, str]:
+        if matches[index]:
+            return index, matches[index].answer, SOURCE_FAQ
+        async with semaphore:
+            response, source = await complete_answer(
+                collection_name, metadata, questions[index], retrieved[index], priority=BACKGROUND
+            )
+        return index, response, source
+
+    async def stream_results():
+        tasks = [asyncio.create_task(answer(index)) for index in range(len(questions))]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                index, response, source = await finished
+                faq_index.record_answer(collection_name, source)
+                yield json.dumps({"index": index, "query": questions[index], "response": response, "source": source}) + "\n"
+        finally:
+            # Client went away: stop the completions that are still queued
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+def find_visitor_session(connection: ChatConnection) -> Optional[str]:
+    """Id of the visitor's active session with this chatbot, if any (e.g. on reconnect)"""
+    db = SessionLocal()
+    try:
+        session = get_active_session_by_user(db, connection.chatbot_id, connection.visitor_id)
+        return session.id if session else None
+    finally:
+        db.close()
+
+def save_connection_message(connection: ChatConnection, role: str, content: str) -> None:
+    """Add a message to the connection's session, starting a new session if there is
+    none yet or the last one was closed for inactivity"""
+    db = SessionLocal()
+    try:
+        if not connection.session_id or not touch_active_session(db, connection.session_id):
+            session_data = schemas.ChatSessionCreate(
+                chatbot_id=connection.chatbot_id,
+                user_identifier=connection.visitor_id
+            )
+            connection.session_id = create_chat_session(db, session_data).id
+        add_message_to_session(db, connection.session_id, schemas.ChatMessageCreate(role=role, content=content))
+    finally:
+        db.close()
+
+async def answer_over_websocket(websocket: WebSocket, connection: ChatConnection, question: str) -> None:
+    """Answer one question on a chat connection, streaming the answer as it is generated"""
+    try:
+        with span("session_db"):
+            await asyncio.to_thread(save_connection_message, connection, "user", question)
+    except Exception as session_error:
+        # Session tracking is best effort; still answer the question
+        logger.error("Error in session management: %s", session_error)
+
+    with span("faq_lookup"):
+        faq_match, query_embedding = await asyncio.to_thread(
+            faq_index.lookup,
+            connection.chatbot_id,
+            connection.metadata.get("kb_version", 0),
+            question,
+            vector_store.embed_query
+        )
+
+    parts = []
+    if faq_match:
+        source = SOURCE_FAQ
+        parts.append(faq_match.answer)
+        await websocket.send_json({"type": "delta", "content": faq_match.answer})
+    else:
+        with span("retrieval"):
+            results = await asyncio.to_thread(
+                vector_store.query_collection, connection.chatbot_id, question, query_embedding=query_embedding
+            )
+        source = SOURCE_LLM
+        deltas = stream_answer(connection.chatbot_id, connection.metadata, question, results)
+        try:
+            async for delta, source in deltas:
+                parts.append(delta)
+                await websocket.send_json({"type": "delta", "content": delta})
+        finally:
+            await deltas.aclose()
+    assistant_response = "".join(parts)
+    faq_index.record_answer(connection.chatbot_id, source)
+
+    try:
+        with span("session_save"):
+            await asyncio.to_thread(save_connection_message, connection, "assistant", assistant_response)
+    except Exception as session_error:
+        logger.error("Error in session message tracking: %s", session_error)
+
+    await websocket.send_json({
+        "type": "done",
+        "response": assistant_response,
+        "source": source,
+        "session_id": connection.session_id
+    })
+
+@app.websocket("/api/chatbots/{collection_name}/ws")
+async def chat_websocket(websocket: WebSocket, collection_name: str, visitor_id: Optional[str] = None):
+    """Chat over one long-lived connection.
+
+    The chatbot metadata and the visitor's session are resolved once at connect
+    instead of per message. Sessions are keyed on `visitor_id`, an id the widget
+    generates and keeps (one is issued if it sends none), rather than the client
+    IP. Client frames are {"query": "..."}; each answer is streamed back as
+    {"type": "delta"} frames followed by a {"type": "done"} frame.
+    """
+    metadata = await asyncio.to_thread(chat_channel.load_metadata, collection_name)
+    if metadata is None:
+        await websocket.close(code=4404)
+        return
+    connection = ChatConnection(collection_name, visitor_identifier(visitor_id), metadata)
+    if not chat_channel.register(connection):
+        # Worker is at WS_MAX_CONNECTIONS; the client should retry (possibly on another worker)
+        await websocket.close(code=1013)
+        return
+
+    try:
+        await websocket.accept()
+        connection.session_id = await asyncio.to_thread(find_visitor_session, connection)
+        await websocket.send_json({
+            "type": "session",
+            "visitor_id": connection.visitor_id,
+            "session_id": connection.session_id
+        })
+        while True:
+            try:
+                message = await asyncio.wait_for(websocket.receive_text(), WS_IDLE_TIMEOUT_SECONDS or None)
+            except asyncio.TimeoutError:
+                await websocket.close(code=1001)
+                break
+            try:
+                question = json.loads(message).get("query", "")
+            except (ValueError, AttributeError):
+                question = message
+            if not isinstance(question, str) or not question.strip():
+                await websocket.send_json({"type": "error", "detail": "Send {\"query\": \"...\"}"})
+                continue
+            try:
+                await answer_over_websocket(websocket, connection, question)
+            except WebSocketDisconnect:
+                raise
+            except Exception as e:
+                logger.exception("Error answering over WebSocket (%s): %r", collection_name, e)
+                await websocket.send_json({"type": "error", "detail": "Error querying chatbot"})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        chat_channel.unregister(connection)
+
 @app.get("/api/chatbots/{collection_name}/stream")
 async def stream_chat(collection_name: str, request: Request):
     async def event_generator():
@@ -569,17 +1236,198 @@ async def stream_chat(collection_name: str, request: Request):
                 await asyncio.sleep(0.1)
                 
         except Exception as e:
-            print(f"Error in stream: {str(e)}")
+            logger.error("Error in stream: %s", e)
             
     return EventSourceResponse(event_generator())
 
+@app.get("/api/system/vector-store")
+async def get_vector_store_stats():
+    """Resident collections, memory estimate and eviction counters"""
+    return vector_store.residency_stats()
+
+@app.get("/api/system/llm")
+async def get_llm_scheduler_stats():
+    """Outbound LLM queue depth, concurrency limit and retry counters"""
+    return {**llm_scheduler.stats(), "circuit": llm_breaker.stats()}
+
+@app.get("/api/system/chat-connections")
+async def get_chat_connection_stats():
+    """Open WebSocket chat connections on this worker"""
+    return chat_channel.stats()
+
+@app.get("/api/system/gc")
+async def get_garbage_collection_stats():
+    """Deleted chatbots purged, space reclaimed and orphans found by this worker's collector"""
+    return garbage_collector.stats()
+
+@app.get("/api/system/faq")
+async def get_faq_stats():
+    return faq_index.stats()
+
+def utc_naive(value: Optional[datetime]) -> Optional[datetime]:
+    """Timestamps are stored as naive UTC"""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+def encode_insight_cursor(insight: models.Insight) -> str:
+    key = json.dumps([insight.created_at.isoformat(), insight.id])
+    return base64.urlsafe_b64encode(key.encode()).decode().rstrip("=")
+
+def decode_insight_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        created_at, insight_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(created_at), int(insight_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def require_owned_chatbot(db: Session, current_user: models.User, chatbot_id: Optional[str]) -> None:
+    if chatbot_id is not None and crud.get_user_chatbot(db, current_user.id, chatbot_id) is None:
+        raise HTTPException(status_code=404, detail="Chatbot not found")
+
 @app.get("/api/insights")
-async def get_insights(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_active_user)):
-    """Get all insights with pagination"""
+async def get_insights(
+    response: Response,
+    limit: int = Query(INSIGHTS_PAGE_SIZE, ge=1),
+    cursor: Optional[str] = None,
+    chatbot_id: Optional[str] = None,
+    emotion: Optional[str] = None,
+    bot_solved: Optional[bool] = None,
+    human_needed: Optional[bool] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """Insights on the user's chatbots, newest first.
+
+    Pages by keyset: when more remain, the X-Next-Cursor header holds the
+    cursor for the next page.
+    """
+    limit = min(limit, INSIGHTS_MAX_PAGE_SIZE)
+    after = decode_insight_cursor(cursor) if cursor else None
+    require_owned_chatbot(db, current_user, chatbot_id)
+    insights = get_insights_page(
+        db, current_user.id, limit=limit + 1, after=after, chatbot_id=chatbot_id, emotion=emotion,
+        bot_solved=bot_solved, human_needed=human_needed, since=utc_naive(since), until=utc_naive(until)
+    )
+    if len(insights) > limit:
+        insights = insights[:limit]
+        response.headers["X-Next-Cursor"] = encode_insight_cursor(insights[-1])
+    return insights
+
+def export_response(kind: str, export_format: str, compress: bool, columns: List[Any], fetch_batch) -> StreamingResponse:
+    if export_format not in MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(MEDIA_TYPES)}")
+    chunks = export_chunks(RowFormatter(export_format, column_names(columns)), fetch_batch, compress)
+    filename = export_filename(kind, export_format, compress)
+    return StreamingResponse(
+        chunks,
+        media_type="application/gzip" if compress else MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@app.get("/api/exports/insights")
+async def export_insights(
+    format: str = "csv",
+    gzip: bool = True,
+    chatbot_id: Optional[str] = None,
+    emotion: Optional[str] = None,
+    bot_solved: Optional[bool] = None,
+    human_needed: Optional[bool] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """Download every insight matching the /api/insights filters as CSV or NDJSON, newest first"""
+    require_owned_chatbot(db, current_user, chatbot_id)
+    user_id = current_user.id
+    filters = dict(chatbot_id=chatbot_id, emotion=emotion, bot_solved=bot_solved, human_needed=human_needed,
+                   since=utc_naive(since), until=utc_naive(until))
+
+    def fetch_batch(after):
+        with SessionLocal() as batch_db:
+            rows = get_insight_export_rows(batch_db, user_id, EXPORT_BATCH_ROWS, after=after, **filters)
+        next_key = (rows[-1].created_at, rows[-1].id) if len(rows) == EXPORT_BATCH_ROWS else None
+        return rows, next_key
+
+    # Release the request's read transaction; batches use their own short ones
+    db.rollback()
+    return export_response("insights", format, gzip, INSIGHT_EXPORT_COLUMNS, fetch_batch)
+
+@app.get("/api/exports/transcripts")
+async def export_transcripts(
+    format: str = "csv",
+    gzip: bool = True,
+    chatbot_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """Download conversations on the user's chatbots as CSV or NDJSON.
+
+    One row per message, with its session's visitor and insight fields;
+    sessions started in [since, until) in start order, chatbot by chatbot.
+    """
+    require_owned_chatbot(db, current_user, chatbot_id)
+    chatbot_ids = [chatbot_id] if chatbot_id else [chatbot.id for chatbot in crud.get_user_chatbots(db, current_user.id)]
+    since, until = utc_naive(since), utc_naive(until)
+
+    def fetch_batch(key):
+        index, after = key or (0, None)
+        if index >= len(chatbot_ids):
+            return [], None
+        with SessionLocal() as batch_db:
+            sessions = get_transcript_session_keys(
+                batch_db, chatbot_ids[index], EXPORT_BATCH_SESSIONS, after=after, since=since, until=until
+            )
+            rows = get_transcript_rows(batch_db, [session_id for _, session_id in sessions]) if sessions else []
+        if len(sessions) == EXPORT_BATCH_SESSIONS:
+            next_key = (index, sessions[-1])
+        else:
+            next_key = (index + 1, None) if index + 1 < len(chatbot_ids) else None
+        return rows, next_key
+
+    # Release the request's read transaction; batches use their own short ones
+    db.rollback()
+    return export_response("transcripts", format, gzip, TRANSCRIPT_EXPORT_COLUMNS, fetch_batch)
+
+@app.get("/api/insights/rollups")
+async def get_insights_rollups(
+    chatbot_id: Optional[str] = None,
+    days: int = Query(30, ge=1),
+    until: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_active_user)
+):
+    """Daily insight counts for the user's chatbots (or one of them) over the last `days` UTC days"""
     try:
-        insights = get_all_insights(db, skip=skip, limit=limit)
-        return insights
-    except Exception as e:
-        print(f"Error fetching insights: {str(e)}")
-        # Return empty list instead of error if table doesn't exist yet
-        return []
+        until_day = datetime.strptime(until, "%Y-%m-%d").date() if until else datetime.now(timezone.utc).date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="until must be a YYYY-MM-DD date")
+    since_day = until_day - timedelta(days=min(days, INSIGHT_ROLLUP_MAX_DAYS) - 1)
+    require_owned_chatbot(db, current_user, chatbot_id)
+    rollups = get_insight_rollups(db, current_user.id, since_day.isoformat(), until_day.isoformat(), chatbot_id=chatbot_id)
+
+    totals = {"total": 0, "solved": 0, "unsolved": 0, "human_needed": 0, "emotions": {}}
+    rows = []
+    for rollup in rollups:
+        rows.append({
+            "chatbot_id": rollup.chatbot_id,
+            "day": rollup.day,
+            "total": rollup.total,
+            "solved": rollup.solved,
+            "unsolved": rollup.unsolved,
+            "human_needed": rollup.human_needed,
+            "solve_rate": rollup.solved / (rollup.solved + rollup.unsolved) if rollup.solved + rollup.unsolved else None,
+            "emotions": rollup.emotions,
+        })
+        for key in ("total", "solved", "unsolved", "human_needed"):
+            totals[key] += getattr(rollup, key)
+        for emotion, count in (rollup.emotions or {}).items():
+            totals["emotions"][emotion] = totals["emotions"].get(emotion, 0) + count
+    rated = totals["solved"] + totals["unsolved"]
+    totals["solve_rate"] = totals["solved"] / rated if rated else None
+    return {"since": since_day.isoformat(), "until": until_day.isoformat(), "days": rows, "totals": totals}
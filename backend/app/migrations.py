@@ -0,0 +1,198 @@
+"""Schema migrations for the SQLite database.
+
+create_all only creates missing tables, so columns and indexes added to
+models.py later never reach existing databases. Each migration below brings
+an older database up to the models; the number of migrations applied is kept
+in SQLite's PRAGMA user_version. Migrations must be idempotent because a fresh
+database already has everything create_all builds from models.py.
+
+Applied at startup, or by hand from the backend directory:
+
+    python -m app.migrations
+"""
+import json
+import logging
+import sqlite3
+from typing import Callable, Dict, List, Tuple
+
+from sqlalchemy.engine import Engine
+
+from .db_session import engine as default_engine, Base
+from . import models  # noqa: F401  (registers the tables on Base.metadata)
+
+logger = logging.getLogger(__name__)
+
+
+def _columns(connection: sqlite3.Connection, table: str) -> List[str]:
+    return [row[1] for row in connection.execute(f"PRAGMA table_info({table})")]
+
+
+def _add_missing_columns(connection: sqlite3.Connection, table: str, columns: List[Tuple[str, str]]) -> None:
+    existing = _columns(connection, table)
+    for name, column_type in columns:
+        if name not in existing:
+            connection.execute(f"ALTER TABLE {table} ADD COLUMN {name} {column_type}")
+
+
+def _0001_chatbot_listing_columns(connection: sqlite3.Connection) -> None:
+    """Listing fields and owner index on chatbots (GET /api/chatbots)"""
+    _add_missing_columns(connection, "chatbots", [
+        ("business_name", "VARCHAR"),
+        ("business_type", "VARCHAR"),
+        ("chatbot_type", "VARCHAR"),
+        ("icon_url", "VARCHAR"),
+    ])
+    connection.execute("CREATE INDEX IF NOT EXISTS ix_chatbots_user_id ON chatbots (user_id)")
+
+
+def _0002_session_access_indexes(connection: sqlite3.Connection) -> None:
+    """Composite indexes for the crud_sessions lookups"""
+    # get_active_session_by_user
+    connection.execute(
+        "CREATE INDEX IF NOT EXISTS ix_chat_sessions_chatbot_user_active "
+        "ON chat_sessions (chatbot_id, user_identifier, is_active)"
+    )
+    # get_inactive_sessions
+    connection.execute(
+        "CREATE INDEX IF NOT EXISTS ix_chat_sessions_active_last_activity "
+        "ON chat_sessions (is_active, last_activity)"
+    )
+    # get_session_messages
+    connection.execute(
+        "CREATE INDEX IF NOT EXISTS ix_chat_messages_session_timestamp "
+        "ON chat_messages (session_id, timestamp)"
+    )
+
+
+def _0003_insight_listing(connection: sqlite3.Connection) -> None:
+    """Owner columns and keyset indexes on insights, and daily insight rollups"""
+    _add_missing_columns(connection, "insights", [
+        ("chatbot_id", "VARCHAR REFERENCES chatbots (id)"),
+        ("user_id", "INTEGER REFERENCES users (id)"),
+    ])
+    connection.execute(
+        "UPDATE insights SET chatbot_id = "
+        "(SELECT chatbot_id FROM chat_sessions WHERE chat_sessions.id = insights.session_id) "
+        "WHERE chatbot_id IS NULL"
+    )
+    connection.execute(
+        "UPDATE insights SET user_id = (SELECT user_id FROM chatbots WHERE chatbots.id = insights.chatbot_id) "
+        "WHERE user_id IS NULL"
+    )
+    # The old server default wrote "YYYY-MM-DD HH:MM:SS"; pad to the ".ffffff" form
+    # SQLAlchemy binds so keyset comparisons on created_at order consistently
+    connection.execute(
+        "UPDATE insights SET created_at = created_at || '.000000' WHERE length(created_at) = 19"
+    )
+    connection.execute(
+        "CREATE INDEX IF NOT EXISTS ix_insights_user_created ON insights (user_id, created_at, id)"
+    )
+    connection.execute(
+        "CREATE INDEX IF NOT EXISTS ix_insights_chatbot_created ON insights (chatbot_id, created_at, id)"
+    )
+    connection.execute(
+        "CREATE INDEX IF NOT EXISTS ix_insight_daily_rollups_user_day ON insight_daily_rollups (user_id, day)"
+    )
+
+    # Rebuild the rollups from the insights saved before they existed
+    rollups: Dict[Tuple[str, str], dict] = {}
+    rows = connection.execute(
+        "SELECT chatbot_id, user_id, substr(created_at, 1, 10), bot_solved, human_needed, emotion "
+        "FROM insights WHERE chatbot_id IS NOT NULL AND created_at IS NOT NULL"
+    )
+    for chatbot_id, user_id, day, bot_solved, human_needed, emotion in rows:
+        rollup = rollups.setdefault((chatbot_id, day), {
+            "user_id": user_id, "total": 0, "solved": 0, "unsolved": 0, "human_needed": 0, "emotions": {}
+        })
+        rollup["total"] += 1
+        rollup["solved"] += bot_solved == 1
+        rollup["unsolved"] += bot_solved == 0
+        rollup["human_needed"] += bool(human_needed)
+        emotion = (emotion or "unknown").strip().lower().replace('"', "") or "unknown"
+        rollup["emotions"][emotion] = rollup["emotions"].get(emotion, 0) + 1
+    connection.execute("DELETE FROM insight_daily_rollups")
+    connection.executemany(
+        "INSERT INTO insight_daily_rollups "
+        "(chatbot_id, day, user_id, total, solved, unsolved, human_needed, emotions) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        [
+            (chatbot_id, day, r["user_id"], r["total"], r["solved"], r["unsolved"], r["human_needed"],
+             json.dumps(r["emotions"]))
+            for (chatbot_id, day), r in rollups.items()
+        ]
+    )
+
+
+def _0004_transcript_export_index(connection: sqlite3.Connection) -> None:
+    """Keyset index over a chatbot's sessions for transcript exports"""
+    # Same padding as insights.created_at in migration 3, for the (started_at, id) keyset
+    connection.execute(
+        "UPDATE chat_sessions SET started_at = started_at || '.000000' WHERE length(started_at) = 19"
+    )
+    # started_at never changes, so this costs one index write per session, not per message
+    connection.execute(
+        "CREATE INDEX IF NOT EXISTS ix_chat_sessions_chatbot_started "
+        "ON chat_sessions (chatbot_id, started_at, id)"
+    )
+
+
+def _0005_chatbot_deletion(connection: sqlite3.Connection) -> None:
+    """Deletion tombstone on chatbots"""
+    _add_missing_columns(connection, "chatbots", [("deleted_at", "DATETIME")])
+
+
+# Append only: a migration's position is its version number
+MIGRATIONS: List[Callable[[sqlite3.Connection], None]] = [
+    _0001_chatbot_listing_columns,
+    _0002_session_access_indexes,
+    _0003_insight_listing,
+    _0004_transcript_export_index,
+    _0005_chatbot_deletion,
+]
+
+
+def schema_version(engine: Engine = default_engine) -> int:
+    with engine.connect() as connection:
+        return connection.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def pending_migrations(engine: Engine = default_engine) -> List[str]:
+    """Descriptions of the migrations run_migrations would apply, without applying them"""
+    return [migration.__doc__ for migration in MIGRATIONS[schema_version(engine):]]
+
+
+def run_migrations(engine: Engine = default_engine) -> int:
+    """Create missing tables and apply pending migrations; returns the schema version"""
+    Base.metadata.create_all(bind=engine)
+
+    raw = engine.raw_connection()
+    try:
+        connection = raw.driver_connection
+        previous_isolation = connection.isolation_level
+        # Manage the transaction ourselves so DDL and the version bump commit together
+        connection.isolation_level = None
+        try:
+            # Takes the write lock, so concurrently starting workers apply each migration once
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                version = connection.execute("PRAGMA user_version").fetchone()[0]
+                for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+                    logger.info("Applying migration %d: %s", number, migration.__doc__)
+                    migration(connection)
+                    connection.execute(f"PRAGMA user_version = {number}")
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+        finally:
+            connection.isolation_level = previous_isolation
+    finally:
+        raw.close()
+    return len(MIGRATIONS)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    before = schema_version()
+    after = run_migrations()
+    print(f"Schema version {before} -> {after}")
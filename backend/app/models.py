@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Text, JSON
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Text, JSON, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func # For default timestamp
 
@@ -21,7 +21,14 @@ class Chatbot(Base):
     id = Column(String, primary_key=True, index=True) # Using the generated chatbot_id as primary key
     name = Column(String, index=True, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=False)
+    # Copied from metadata.json so the dashboard list is served without reading it
+    business_name = Column(String)
+    business_type = Column(String)
+    chatbot_type = Column(String)
+    icon_url = Column(String)
+    # Set by DELETE /api/chatbots/{id}; the garbage collector removes the row and its data later
+    deleted_at = Column(DateTime(timezone=True), nullable=True)
 
     owner = relationship("User", back_populates="chatbots")
     sessions = relationship("ChatSession", back_populates="chatbot")
@@ -36,6 +43,13 @@ class ChatSession(Base):
     last_activity = Column(DateTime(timezone=True), server_default=func.now())
     is_active = Column(Boolean, default=True)
     
+    # Match the crud_sessions access patterns (see app/migrations.py)
+    __table_args__ = (
+        Index("ix_chat_sessions_chatbot_user_active", "chatbot_id", "user_identifier", "is_active"),
+        Index("ix_chat_sessions_active_last_activity", "is_active", "last_activity"),
+        Index("ix_chat_sessions_chatbot_started", "chatbot_id", "started_at", "id"),
+    )
+    
     # Relationships
     chatbot = relationship("Chatbot", back_populates="sessions")
     messages = relationship("ChatMessage", back_populates="session")
@@ -50,14 +64,43 @@ class ChatMessage(Base):
     content = Column(Text, nullable=False)
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
     
+    __table_args__ = (
+        Index("ix_chat_messages_session_timestamp", "session_id", "timestamp"),
+    )
+    
     # Relationship
     session = relationship("ChatSession", back_populates="messages")
 
+class TranscriptArchiveBlock(Base):
+    """A compressed file of archived sessions of one chatbot, started in one month"""
+    __tablename__ = "transcript_archive_blocks"
+
+    id = Column(Integer, primary_key=True, index=True)
+    chatbot_id = Column(String, ForeignKey("chatbots.id"), index=True, nullable=False)
+    month = Column(String, nullable=False)  # YYYY-MM the sessions started in
+    path = Column(String, unique=True, nullable=False)  # relative to TRANSCRIPT_ARCHIVE_DIR
+    session_count = Column(Integer, nullable=False, default=0)
+    message_count = Column(Integer, nullable=False, default=0)
+    raw_bytes = Column(Integer, nullable=False, default=0)
+    stored_bytes = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class ArchivedSession(Base):
+    """Where a session's messages went when they left chat_messages"""
+    __tablename__ = "archived_sessions"
+
+    session_id = Column(String, ForeignKey("chat_sessions.id"), primary_key=True)
+    block_id = Column(Integer, ForeignKey("transcript_archive_blocks.id"), index=True, nullable=False)
+    message_count = Column(Integer, nullable=False, default=0)
+
 class Insight(Base):
     __tablename__ = "insights"
     
     id = Column(Integer, primary_key=True, index=True)
     session_id = Column(String, ForeignKey("chat_sessions.id"), unique=True, nullable=False)
+    # Copied from the session and its chatbot so listing needs no joins
+    chatbot_id = Column(String, ForeignKey("chatbots.id"), nullable=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)  # chatbot owner
     name = Column(String, nullable=True)
     email = Column(String, nullable=True)
     problem_summary = Column(Text, nullable=True)
@@ -66,5 +109,43 @@ class Insight(Base):
     emotion = Column(String, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
+    # Keyset pagination, newest first, per owner or per chatbot
+    __table_args__ = (
+        Index("ix_insights_user_created", "user_id", "created_at", "id"),
+        Index("ix_insights_chatbot_created", "chatbot_id", "created_at", "id"),
+    )
+    
     # Relationship
     session = relationship("ChatSession", back_populates="insight")
+
+class InsightDailyRollup(Base):
+    """Per-chatbot daily insight counts, updated in the same transaction as each insight"""
+    __tablename__ = "insight_daily_rollups"
+
+    chatbot_id = Column(String, ForeignKey("chatbots.id"), primary_key=True)
+    day = Column(String, primary_key=True)  # UTC date, YYYY-MM-DD
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)  # chatbot owner
+    total = Column(Integer, nullable=False, default=0)
+    solved = Column(Integer, nullable=False, default=0)
+    unsolved = Column(Integer, nullable=False, default=0)
+    human_needed = Column(Integer, nullable=False, default=0)
+    emotions = Column(JSON, nullable=False, default=dict)  # emotion -> count
+
+    __table_args__ = (
+        Index("ix_insight_daily_rollups_user_day", "user_id", "day"),
+    )
+
+class FAQEntry(Base):
+    __tablename__ = "faq_entries"
+
+    id = Column(Integer, primary_key=True, index=True)
+    chatbot_id = Column(String, ForeignKey("chatbots.id"), index=True, nullable=False)
+    question = Column(Text, nullable=False)  # most frequent phrasing in the cluster
+    variants = Column(JSON, nullable=False, default=list)  # normalized phrasings matched exactly
+    embedding = Column(JSON, nullable=False)  # normalized cluster centroid
+    answer = Column(Text, nullable=False)
+    cluster_size = Column(Integer, nullable=False, default=0)
+    hit_count = Column(Integer, nullable=False, default=0)
+    kb_version = Column(Integer, nullable=False, default=0)  # knowledge base the answer was generated from
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -52,6 +52,11 @@ class ChatbotBase(BaseModel):
 class ChatbotCreateDB(ChatbotBase):
     id: str # The generated UUID string
     user_id: int # Foreign key
+    business_name: Optional[str] = None
+    business_type: Optional[str] = None
+    chatbot_type: Optional[str] = None
+    icon_url: Optional[str] = None
+    created_at: Optional[datetime] = None # Defaults to now in the database
 
 # Now properly define Chatbot schema inheriting from Base
 class Chatbot(ChatbotBase): # Inherit name from ChatbotBase
@@ -111,6 +116,7 @@ class InsightBase(BaseModel):
 class Insight(InsightBase):
     id: int
     session_id: str
+    chatbot_id: Optional[str] = None
     created_at: datetime
 
     class Config:
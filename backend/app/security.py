@@ -1,15 +1,20 @@
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Dict, Optional, Set, Tuple
+import hashlib
 import os
+import threading
+import time
 from jose import JWTError, jwt
 from fastapi.security import OAuth2PasswordBearer
 from fastapi import Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import event
+from sqlalchemy.orm import Session, make_transient_to_detached
 
 # Import necessary components from other modules
 from . import crud, models, schemas
 from .db_session import get_db
-from .utils.password_utils import verify_password
+from .utils.password_utils import verify_password, verify_password_async
 
 # Password hashing context and functions moved to utils/password_utils.py
 
@@ -22,6 +27,12 @@ if not SECRET_KEY:
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30 # Token valid for 30 minutes
 
+# Verified tokens are trusted without re-decoding or a user lookup for this long
+# (never past the token's exp). Changes to a user made by another worker are
+# seen once its entries here expire.
+AUTH_CACHE_SECONDS = float(os.getenv("AUTH_CACHE_SECONDS", "60"))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+
 # --- OAuth2 Scheme Definition ---
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/token")
 
@@ -48,6 +59,93 @@ def authenticate_user(db: Session, email: str, password: str) -> Optional[models
         return None
     return user
 
+async def authenticate_user_async(db: Session, email: str, password: str) -> Optional[models.User]:
+    """authenticate_user with the bcrypt check on the password hashing pool."""
+    user = crud.get_user_by_email(db, email=email)
+    if not user:
+        db.rollback()
+        return None
+    # Hand the pooled connection back before waiting on bcrypt; the user stays loaded
+    db.expunge(user)
+    db.rollback()
+    if not await verify_password_async(password, user.hashed_password):
+        return None
+    return user
+
+# --- Verified principal cache ---
+
+class PrincipalCache:
+    """Users behind recently verified tokens, keyed by a digest of the token so raw
+    tokens aren't kept in memory. Entries hold detached copies of the user row."""
+
+    def __init__(self, ttl_seconds: float = AUTH_CACHE_SECONDS, max_entries: int = AUTH_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, models.User]]" = OrderedDict()
+        self._by_user: Dict[int, Set[str]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _digest(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str) -> Optional[models.User]:
+        digest = self._digest(token)
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None or entry[0] <= time.time():
+                if entry is not None:
+                    self._remove(digest)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, token: str, user: models.User, exp: Optional[float]) -> None:
+        expires_at = time.time() + self.ttl_seconds
+        if exp is not None:
+            expires_at = min(expires_at, float(exp))
+        snapshot = models.User(
+            id=user.id,
+            email=user.email,
+            hashed_password=user.hashed_password,
+            is_active=user.is_active
+        )
+        make_transient_to_detached(snapshot)
+        digest = self._digest(token)
+        with self._lock:
+            self._remove(digest)
+            self._entries[digest] = (expires_at, snapshot)
+            self._by_user.setdefault(user.id, set()).add(digest)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id: int) -> None:
+        with self._lock:
+            for digest in list(self._by_user.get(user_id, ())):
+                self._remove(digest)
+
+    def _remove(self, digest: str) -> None:
+        entry = self._entries.pop(digest, None)
+        if entry is not None:
+            digests = self._by_user.get(entry[1].id)
+            if digests is not None:
+                digests.discard(digest)
+                if not digests:
+                    del self._by_user[entry[1].id]
+
+
+principal_cache = PrincipalCache()
+
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _drop_cached_principals(mapper, connection, target):
+    """Any change to a user row (deactivation, new password, ...) drops its cached tokens"""
+    principal_cache.invalidate_user(target.id)
+
 # --- Function to get current user ---
 
 async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> models.User:
@@ -56,6 +154,11 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    cached_user = principal_cache.get(token)
+    if cached_user is not None:
+        # Attach a copy to this request's session without querying the database
+        return db.merge(cached_user, load=False)
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub") # Assuming email is stored in 'sub'
@@ -68,6 +171,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     user = crud.get_user_by_email(db, email=token_data.email)
     if user is None:
         raise credentials_exception
+    principal_cache.put(token, user, payload.get("exp"))
     return user
 
 async def get_current_active_user(current_user: models.User = Depends(get_current_user)) -> models.User:
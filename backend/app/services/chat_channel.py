@@ -0,0 +1,99 @@
+import json
+import os
+import re
+import threading
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+# Open WebSocket chat connections allowed per worker; further connects are refused
+WS_MAX_CONNECTIONS = int(os.getenv("WS_MAX_CONNECTIONS", "10000"))
+# Close connections that send nothing for this long (0 keeps them open indefinitely)
+WS_IDLE_TIMEOUT_SECONDS = float(os.getenv("WS_IDLE_TIMEOUT_SECONDS", "900"))
+
+_VISITOR_ID_RE = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+
+
+def visitor_identifier(visitor_id: Optional[str]) -> str:
+    """The client's persistent visitor id if well formed, else a fresh one"""
+    if visitor_id and _VISITOR_ID_RE.match(visitor_id):
+        return visitor_id
+    return uuid.uuid4().hex
+
+
+class ChatConnection:
+    """State kept for one WebSocket chat connection. Slotted and holding only ids
+    plus a metadata dict shared with other connections to the same chatbot, so
+    idle connections stay cheap."""
+
+    __slots__ = ("chatbot_id", "visitor_id", "session_id", "metadata")
+
+    def __init__(self, chatbot_id: str, visitor_id: str, metadata: Dict[str, Any], session_id: Optional[str] = None):
+        self.chatbot_id = chatbot_id
+        self.visitor_id = visitor_id
+        self.metadata = metadata
+        self.session_id = session_id
+
+
+class ChatChannel:
+    """Bookkeeping for this worker's WebSocket chat connections"""
+
+    def __init__(self, max_connections: int = WS_MAX_CONNECTIONS):
+        self.max_connections = max_connections
+        self.open: Counter = Counter()
+        self.open_total = 0
+        self.opened_total = 0
+        self.rejected_total = 0
+        # chatbot_id -> (metadata.json mtime, parsed metadata)
+        self._metadata: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def load_metadata(self, chatbot_id: str) -> Optional[Dict[str, Any]]:
+        """Chatbot metadata, shared between connections until the file changes"""
+        path = Path(f"data/chatbots/{chatbot_id}/metadata.json")
+        try:
+            mtime = path.stat().st_mtime
+        except FileNotFoundError:
+            return None
+        cached = self._metadata.get(chatbot_id)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        try:
+            metadata = json.loads(path.read_text())
+        except FileNotFoundError:  # deleted since the stat
+            return None
+        with self._lock:
+            self._metadata[chatbot_id] = (mtime, metadata)
+        return metadata
+
+    def register(self, connection: ChatConnection) -> bool:
+        with self._lock:
+            if self.open_total >= self.max_connections:
+                self.rejected_total += 1
+                return False
+            self.open[connection.chatbot_id] += 1
+            self.open_total += 1
+            self.opened_total += 1
+            return True
+
+    def unregister(self, connection: ChatConnection) -> None:
+        with self._lock:
+            self.open[connection.chatbot_id] -= 1
+            if self.open[connection.chatbot_id] <= 0:
+                del self.open[connection.chatbot_id]
+                self._metadata.pop(connection.chatbot_id, None)
+            self.open_total -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "open": self.open_total,
+                "max": self.max_connections,
+                "opened_total": self.opened_total,
+                "rejected_total": self.rejected_total,
+                "chatbots": dict(self.open),
+            }
+
+
+chat_channel = ChatChannel()
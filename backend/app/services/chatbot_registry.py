@@ -0,0 +1,124 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# How long a user's chatbot list is served from memory. Creating a chatbot clears the
+# owner's entry on the worker that handled it; other workers catch up within this.
+CHATBOT_LIST_CACHE_SECONDS = float(os.getenv("CHATBOT_LIST_CACHE_SECONDS", "60"))
+CHATBOT_LIST_CACHE_USERS = int(os.getenv("CHATBOT_LIST_CACHE_USERS", "10000"))
+# How long browsers and CDNs may reuse a widget config before revalidating with its ETag
+WIDGET_CONFIG_MAX_AGE_SECONDS = int(os.getenv("WIDGET_CONFIG_MAX_AGE_SECONDS", "300"))
+WIDGET_CONFIG_CACHE_CONTROL = (
+    f"public, max-age={WIDGET_CONFIG_MAX_AGE_SECONDS}, stale-while-revalidate={WIDGET_CONFIG_MAX_AGE_SECONDS * 12}"
+)
+
+
+class ChatbotListCache:
+    """Per-user cache of the dashboard chatbot list"""
+
+    def __init__(self, ttl_seconds: float = CHATBOT_LIST_CACHE_SECONDS, max_users: int = CHATBOT_LIST_CACHE_USERS):
+        self.ttl_seconds = ttl_seconds
+        self.max_users = max_users
+        self._entries: Dict[int, Tuple[float, List[Dict[str, Any]]]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: int, load: Callable[[], List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        entry = self._entries.get(user_id)
+        if entry and now - entry[0] < self.ttl_seconds:
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        chatbots = load()
+        with self._lock:
+            if len(self._entries) >= self.max_users and user_id not in self._entries:
+                # Drop the oldest entry; dict order is insertion order
+                self._entries.pop(next(iter(self._entries)))
+            self._entries[user_id] = (now, chatbots)
+        return chatbots
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+
+def chatbot_summary(chatbot: Any) -> Dict[str, Any]:
+    """Dashboard list entry for a models.Chatbot row"""
+    return {
+        "id": chatbot.id,
+        "name": chatbot.name,
+        "created_at": chatbot.created_at.isoformat() if chatbot.created_at else "",
+        "icon_url": chatbot.icon_url,
+    }
+
+
+class WidgetConfig:
+    """Serialized widget config response and its strong ETag"""
+
+    __slots__ = ("body", "etag", "version")
+
+    def __init__(self, body: bytes, version: Tuple[int, int]):
+        self.body = body
+        self.etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        self.version = version
+
+
+def widget_config_body(metadata: Dict[str, Any]) -> bytes:
+    return json.dumps({
+        "name": metadata["chatbot_name"],
+        "type": metadata["chatbot_type"],
+        "business_name": metadata["business_name"],
+        "business_type": metadata["business_type"],
+        "icon_url": metadata.get("icon")
+    }, separators=(",", ":")).encode()
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match comparison (weak, as RFC 9110 specifies for this header)"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class WidgetConfigCache:
+    """Widget config responses, serialized once per metadata.json version. Each
+    lookup costs a stat of the file, so changes written by any worker are seen
+    on the next request."""
+
+    def __init__(self):
+        self._entries: Dict[str, WidgetConfig] = {}
+        self._lock = threading.Lock()
+
+    def get(self, chatbot_id: str) -> Optional[WidgetConfig]:
+        path = Path(f"data/chatbots/{chatbot_id}/metadata.json")
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            self.invalidate(chatbot_id)
+            return None
+        version = (stat.st_mtime_ns, stat.st_size)
+        config = self._entries.get(chatbot_id)
+        if config is not None and config.version == version:
+            return config
+        config = WidgetConfig(widget_config_body(json.loads(path.read_text())), version)
+        with self._lock:
+            self._entries[chatbot_id] = config
+        return config
+
+    def invalidate(self, chatbot_id: str) -> None:
+        with self._lock:
+            self._entries.pop(chatbot_id, None)
+
+
+chatbot_list_cache = ChatbotListCache()
+widget_config_cache = WidgetConfigCache()
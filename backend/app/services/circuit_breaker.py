@@ -0,0 +1,132 @@
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict
+
+logger = logging.getLogger(__name__)
+
+LLM_BREAKER_WINDOW = int(os.getenv("LLM_BREAKER_WINDOW", "20"))
+LLM_BREAKER_MIN_CALLS = int(os.getenv("LLM_BREAKER_MIN_CALLS", "5"))
+LLM_BREAKER_FAILURE_RATE = float(os.getenv("LLM_BREAKER_FAILURE_RATE", "0.5"))
+LLM_BREAKER_SLOW_CALL_SECONDS = float(os.getenv("LLM_BREAKER_SLOW_CALL_SECONDS", "10"))
+LLM_BREAKER_OPEN_SECONDS = float(os.getenv("LLM_BREAKER_OPEN_SECONDS", "30"))
+LLM_BREAKER_HALF_OPEN_PROBES = int(os.getenv("LLM_BREAKER_HALF_OPEN_PROBES", "1"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of making a call while the breaker is open"""
+
+
+class CircuitBreaker:
+    """Trips when too many recent calls failed or were slow, fails fast while open,
+    and lets a few probe calls through after a cool-down to decide whether to close.
+
+    Every call admitted by before_call() must be followed by exactly one
+    record_success(), record_failure() or release(), given the generation
+    before_call() returned. Each state change starts a new generation, and
+    outcomes of calls admitted in an earlier one are ignored: a slow call let
+    through while closed says nothing about a probe, and must not re-trip an
+    already open circuit.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window: int = LLM_BREAKER_WINDOW,
+        min_calls: int = LLM_BREAKER_MIN_CALLS,
+        failure_rate: float = LLM_BREAKER_FAILURE_RATE,
+        slow_call_seconds: float = LLM_BREAKER_SLOW_CALL_SECONDS,
+        open_seconds: float = LLM_BREAKER_OPEN_SECONDS,
+        half_open_probes: int = LLM_BREAKER_HALF_OPEN_PROBES,
+    ):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+
+        self.state = CLOSED
+        self.generation = 0
+        self.opened_at = 0.0
+        self.probes_in_flight = 0
+        # True for each failed or slow call in the window
+        self.outcomes: Deque[bool] = deque(maxlen=window)
+
+        self.rejected_total = 0
+        self.trips_total = 0
+
+    def before_call(self) -> int:
+        """Admit a call and return its generation, or raise CircuitOpenError"""
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.open_seconds:
+                self.rejected_total += 1
+                raise CircuitOpenError(f"{self.name} circuit is open")
+            self._transition(HALF_OPEN)
+
+        if self.state == HALF_OPEN:
+            if self.probes_in_flight >= self.half_open_probes:
+                self.rejected_total += 1
+                raise CircuitOpenError(f"{self.name} circuit is half-open, probe in progress")
+            self.probes_in_flight += 1
+        return self.generation
+
+    def record_success(self, generation: int, latency: float) -> None:
+        if latency > self.slow_call_seconds:
+            self.record_failure(generation)
+            return
+        if generation != self.generation:
+            return
+        if self.state == HALF_OPEN:
+            self.probes_in_flight -= 1
+            self.outcomes.clear()
+            self._transition(CLOSED)
+            return
+        self.outcomes.append(False)
+
+    def record_failure(self, generation: int) -> None:
+        if generation != self.generation:
+            return
+        if self.state == HALF_OPEN:
+            self.probes_in_flight -= 1
+            self._trip()
+            return
+        self.outcomes.append(True)
+        if len(self.outcomes) >= self.min_calls and sum(self.outcomes) / len(self.outcomes) >= self.failure_rate:
+            self._trip()
+
+    def release(self, generation: int) -> None:
+        """The admitted call never reached the provider; record no outcome"""
+        if generation == self.generation and self.state == HALF_OPEN and self.probes_in_flight > 0:
+            self.probes_in_flight -= 1
+
+    def _trip(self) -> None:
+        self.opened_at = time.monotonic()
+        self.trips_total += 1
+        self._transition(OPEN)
+
+    def _transition(self, state: str) -> None:
+        if state != self.state:
+            logger.warning("%s circuit %s -> %s", self.name, self.state, state)
+            self.state = state
+            self.generation += 1
+            if state != HALF_OPEN:
+                self.probes_in_flight = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "window_failures": sum(self.outcomes),
+            "window_calls": len(self.outcomes),
+            "trips_total": self.trips_total,
+            "rejected_total": self.rejected_total,
+        }
+
+
+# Guards the chat completion call in query_chatbot
+llm_breaker = CircuitBreaker("llm")
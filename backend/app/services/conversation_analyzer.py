@@ -2,17 +2,18 @@ import httpx
 import os
 from typing import List, Dict, Any, Optional
 from ..schemas import ChatMessage, InsightCreate
+from .llm_scheduler import LLMOverloadedError, BACKGROUND
+from .llm_providers import get_llm_provider, LLMProviderError, ANALYSIS
 import json
+import logging
 import re
 
+logger = logging.getLogger(__name__)
+
 class ConversationAnalyzer:
     """Service to analyze chat conversations and extract insights using LLM"""
     
     def __init__(self):
-        self.api_key = os.getenv('GROQ_API_KEY')
-        if not self.api_key:
-            raise ValueError("GROQ_API_KEY environment variable is not set")
-        
         self.emotions = [
             "admiration", "amusement", "anger", "annoyance", "approval", "caring", 
             "confusion", "curiosity", "desire", "disappointment", "disapproval", 
@@ -21,20 +22,23 @@ class ConversationAnalyzer:
             "relief", "remorse", "sadness", "surprise", "neutral"
         ]
     
-    async def analyze_conversation(self, session_id: str, messages: List[ChatMessage]) -> Optional[InsightCreate]:
+    async def analyze_conversation(self, session_id: str, messages: List[ChatMessage], chatbot_id: str = "default") -> Optional[InsightCreate]:
         """
         Analyze a conversation and extract insights
         
         Args:
             session_id: The ID of the chat session
             messages: List of messages in the conversation
+            chatbot_id: Chatbot the session belongs to, used for fair sharing of LLM quota
             
         Returns:
             InsightCreate object with extracted insights
+            
+        Raises:
+            LLMOverloadedError: background analysis is being shed; retry later
         """
-        print(f"\n===== ANALYZING CONVERSATION FOR SESSION {session_id} =====")
+        logger.debug("Analyzing conversation for session %s", session_id)
         if not messages:
-            print("No messages to analyze")
             return None
             
         # Format messages for the LLM
@@ -54,13 +58,11 @@ class ConversationAnalyzer:
                 email_match = re.search(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}', msg.content)
                 if email_match:
                     user_email = email_match.group(0)
-                    print(f"Extracted email: {user_email}")
                 
                 # Try to find a name (this is very basic - could be improved)
                 name_match = re.search(r'(?:my name is|I am|I\'m) ([A-Z][a-z]+(?: [A-Z][a-z]+)?)', msg.content)
                 if name_match:
                     user_name = name_match.group(1)
-                    print(f"Extracted name: {user_name}")
         
         # Create the system prompt for analysis
         system_prompt = """
@@ -74,7 +76,7 @@ class ConversationAnalyzer:
         Format your response as a JSON object with these fields.
         """
         
-        print(f"Formatted {len(formatted_messages)} messages for analysis")
+        logger.debug("Formatted %d messages for analysis", len(formatted_messages))
         
         # Create the conversation for the LLM
         conversation = [
@@ -84,87 +86,69 @@ class ConversationAnalyzer:
         ]
         
         try:
-            print("Sending request to Groq API...")
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    "https://api.groq.com/openai/v1/chat/completions",
-                    headers={
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "model": "llama3-70b-8192",
-                        "messages": conversation,
-                        "temperature": 0.2,
-                        "max_tokens": 500,
-                    },
-                    timeout=30.0
-                )
-                
-                if response.status_code != 200:
-                    print(f"Error from LLM API: {response.status_code} - {response.text}")
-                    return self._create_default_insight(session_id, user_name, user_email)
-                
-                result = response.json()
-                analysis_text = result["choices"][0]["message"]["content"]
-                print(f"Received analysis from LLM: {analysis_text[:200]}...")
-                
-                # Extract JSON from the response
-                analysis = self._extract_json_from_text(analysis_text)
-                if not analysis:
-                    return self._create_default_insight(session_id, user_name, user_email)
-                
-                # Print the extracted analysis
-                print("\nExtracted analysis:")
-                for key, value in analysis.items():
-                    print(f"  {key}: {value}")
-                
-                # Create the insight
-                problem_summary = analysis.get("Problem Summary") or analysis.get("problem_summary")
-                bot_solved = analysis.get("Bot Solved") or analysis.get("bot_solved")
-                human_needed = analysis.get("Human Needed") or analysis.get("human_needed")
-                emotion = analysis.get("Emotion") or analysis.get("emotion")
-                
-                # Enforce logical consistency between bot_solved and human_needed
-                # If bot solved is True, human needed must be False
-                # If human needed is True, bot solved must be False
-                if bot_solved is True:
-                    human_needed = False
-                elif human_needed is True:
-                    bot_solved = False
-                
-                # Use default values for name and email if not detected
-                if not user_name:
-                    user_name = "testuser"
-                if not user_email:
-                    user_email = "testuser@gmail.com"
-                
-                insight = InsightCreate(
-                    session_id=session_id,
-                    name=user_name,
-                    email=user_email,
-                    problem_summary=problem_summary,
-                    bot_solved=bot_solved,
-                    human_needed=human_needed,
-                    emotion=emotion
-                )
-                
-                print("\nCreated insight object:")
-                print(f"  Session ID: {insight.session_id}")
-                print(f"  Name: {insight.name}")
-                print(f"  Email: {insight.email}")
-                print(f"  Problem Summary: {insight.problem_summary}")
-                print(f"  Bot Solved: {insight.bot_solved}")
-                print(f"  Human Needed: {insight.human_needed}")
-                print(f"  Emotion: {insight.emotion}")
-                
-                return insight
-                
+            analysis_text = await get_llm_provider().complete(
+                conversation,
+                purpose=ANALYSIS,
+                temperature=0.2,
+                max_tokens=500,
+                priority=BACKGROUND,
+                tenant=chatbot_id
+            )
+            logger.debug("Received analysis from LLM: %.200s", analysis_text)
+            
+            # Extract JSON from the response
+            analysis = self._extract_json_from_text(analysis_text)
+            if not analysis:
+                return self._create_default_insight(session_id, user_name, user_email)
+            
+            # Create the insight
+            problem_summary = analysis.get("Problem Summary") or analysis.get("problem_summary")
+            bot_solved = analysis.get("Bot Solved") or analysis.get("bot_solved")
+            human_needed = analysis.get("Human Needed") or analysis.get("human_needed")
+            emotion = analysis.get("Emotion") or analysis.get("emotion")
+            
+            # Enforce logical consistency between bot_solved and human_needed
+            # If bot solved is True, human needed must be False
+            # If human needed is True, bot solved must be False
+            if bot_solved is True:
+                human_needed = False
+            elif human_needed is True:
+                bot_solved = False
+            
+            # Use default values for name and email if not detected
+            if not user_name:
+                user_name = "testuser"
+            if not user_email:
+                user_email = "testuser@gmail.com"
+            
+            insight = InsightCreate(
+                session_id=session_id,
+                name=user_name,
+                email=user_email,
+                problem_summary=problem_summary,
+                bot_solved=bot_solved,
+                human_needed=human_needed,
+                emotion=emotion
+            )
+            
+            logger.info(
+                "Created insight for session %s (bot_solved=%s, human_needed=%s, emotion=%s)",
+                insight.session_id, insight.bot_solved, insight.human_needed, insight.emotion
+            )
+            
+            return insight
+            
+        except LLMOverloadedError:
+            # Not a failed analysis: let the caller defer the session instead of storing a default insight
+            raise
+        except LLMProviderError as e:
+            logger.error("Error from LLM API: %s", e.detail)
+            return self._create_default_insight(session_id, user_name, user_email)
         except (httpx.ConnectTimeout, httpx.ConnectError, httpx.ReadTimeout) as e:
-            print(f"API Connection Error: {str(e)}")
+            logger.warning("API Connection Error: %s", e)
             return self._create_default_insight(session_id, user_name, user_email)
         except Exception as e:
-            print(f"Error analyzing conversation: {str(e)}")
+            logger.exception("Error analyzing conversation %s: %s", session_id, e)
             return self._create_default_insight(session_id, user_name, user_email)
     
     def _extract_json_from_text(self, text: str) -> Dict[str, Any]:
@@ -172,25 +156,22 @@ class ConversationAnalyzer:
         try:
             # Try to parse the entire response as JSON
             analysis = json.loads(text)
-            print("Successfully parsed JSON response")
             return analysis
         except json.JSONDecodeError:
             # If that fails, try to extract JSON from the text
-            print("Failed to parse response as JSON, trying to extract JSON from text")
+            logger.debug("Failed to parse response as JSON, trying to extract JSON from text")
             
             # Try to match JSON within triple backticks (```json ... ```)
             json_match = re.search(r'```(?:json)?\s*(.*?)\s*```', text, re.DOTALL)
             if json_match:
                 try:
                     json_content = json_match.group(1)
-                    print(f"Extracted JSON content from backticks")
                     analysis = json.loads(json_content)
-                    print("Successfully extracted and parsed JSON from text")
                     return analysis
                 except json.JSONDecodeError:
-                    print(f"Failed to parse JSON from LLM response")
+                    logger.warning("Failed to parse JSON from LLM response")
             else:
-                print(f"No JSON found in LLM response")
+                logger.warning("No JSON found in LLM response")
             
             # Create a default analysis as fallback
             return {
@@ -202,7 +183,7 @@ class ConversationAnalyzer:
     
     def _create_default_insight(self, session_id: str, user_name: str, user_email: str) -> InsightCreate:
         """Create a default insight when analysis fails"""
-        print("Creating default insight")
+        logger.info("Creating default insight for session %s", session_id)
         return InsightCreate(
             session_id=session_id,
             name=user_name,
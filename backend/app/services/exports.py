@@ -0,0 +1,93 @@
+import asyncio
+import csv
+import io
+import json
+import os
+import zlib
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, List, Optional, Sequence
+
+# Rows read per database round trip. Each batch is a short read on its own
+# connection, so a slow download never keeps a transaction (or a WAL snapshot) open.
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "1000"))
+# Sessions per transcript batch; all of their messages are read together
+EXPORT_BATCH_SESSIONS = int(os.getenv("EXPORT_BATCH_SESSIONS", "100"))
+# zlib level for gzip exports: a fast level keeps CPU per byte low on large dumps
+EXPORT_GZIP_LEVEL = int(os.getenv("EXPORT_GZIP_LEVEL", "1"))
+
+CSV = "csv"
+NDJSON = "ndjson"
+MEDIA_TYPES = {CSV: "text/csv; charset=utf-8", NDJSON: "application/x-ndjson"}
+
+
+def _value(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+class RowFormatter:
+    """Turns batches of result rows into CSV or NDJSON text"""
+
+    def __init__(self, export_format: str, columns: Sequence[str]):
+        self.export_format = export_format
+        self.columns = list(columns)
+
+    def header(self) -> str:
+        if self.export_format != CSV:
+            return ""
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(self.columns)
+        return buffer.getvalue()
+
+    def rows(self, rows: Sequence[Sequence[Any]]) -> str:
+        if self.export_format == NDJSON:
+            return "".join(
+                json.dumps(dict(zip(self.columns, map(_value, row))), ensure_ascii=False) + "\n" for row in rows
+            )
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows([[_value(v) for v in row] for row in rows])
+        return buffer.getvalue()
+
+
+async def export_chunks(
+    formatter: RowFormatter,
+    fetch_batch: Callable[[Optional[Any]], tuple],
+    compress: bool
+) -> AsyncIterator[bytes]:
+    """Stream an export batch by batch.
+
+    `fetch_batch(key)` returns (rows, next_key); next_key None ends the
+    export. Fetching, formatting and compressing a batch all run in a worker
+    thread, off the event loop. Only one batch is held at a time, so memory
+    is bounded by the batch size whatever the export size.
+    """
+    compressor = zlib.compressobj(EXPORT_GZIP_LEVEL, zlib.DEFLATED, 31) if compress else None  # 31: gzip framing
+
+    def encode(text: str) -> bytes:
+        data = text.encode("utf-8")
+        return compressor.compress(data) if compressor else data
+
+    chunk = encode(formatter.header())
+    if chunk:
+        yield chunk
+    def next_chunk(key: Optional[Any]) -> tuple:
+        rows, key = fetch_batch(key)
+        return encode(formatter.rows(rows)), key
+
+    key = None
+    while True:
+        chunk, key = await asyncio.to_thread(next_chunk, key)
+        if chunk:
+            yield chunk
+        if key is None:
+            break
+    if compressor:
+        yield compressor.flush()
+
+
+def export_filename(kind: str, export_format: str, compress: bool) -> str:
+    stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+    return f"{kind}-{stamp}.{export_format}" + (".gz" if compress else "")
+
+
+def column_names(columns: List[Any]) -> List[str]:
+    return [column.key for column in columns]
@@ -0,0 +1,47 @@
+import math
+import re
+from typing import Any, Dict, List
+
+FALLBACK_PREFIX = "I can't generate a full answer right now, but here is what I found in our documentation:"
+NO_CONTEXT_RESPONSE = "I'm sorry, I'm having trouble connecting to my knowledge base right now. Please try again in a moment or contact support if the issue persists."
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n{2,}")
+_STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "to", "in", "on", "for", "with", "is", "are", "was",
+    "were", "be", "do", "does", "did", "i", "you", "we", "it", "my", "your", "our", "what",
+    "how", "can", "could", "would", "should", "when", "where", "which", "who", "this", "that",
+    "at", "by", "from", "as", "me", "about", "there", "any", "have", "has",
+}
+
+
+def content_terms(text: str) -> List[str]:
+    return [word for word in _WORD_RE.findall(text.lower()) if word not in _STOPWORDS]
+
+
+def build_extractive_answer(query: str, results: List[Dict[str, Any]], max_sentences: int = 3) -> str:
+    """Answer from retrieved chunks without an LLM: pick the sentences that share the
+    most terms with the question, favouring higher-ranked chunks, in document order."""
+    if not results:
+        return NO_CONTEXT_RESPONSE
+
+    query_terms = set(content_terms(query))
+    candidates = []
+    for rank, result in enumerate(results):
+        for position, sentence in enumerate(_SENTENCE_RE.split(result.get("text") or "")):
+            sentence = " ".join(sentence.split())
+            if len(sentence) < 20:
+                continue
+            sentence_terms = content_terms(sentence)
+            if not sentence_terms:
+                continue
+            overlap = len(query_terms.intersection(sentence_terms))
+            score = overlap / math.sqrt(len(sentence_terms)) + 1.0 / (rank + 2)
+            candidates.append((score, rank, position, sentence))
+
+    if not candidates:
+        return NO_CONTEXT_RESPONSE
+
+    best = sorted(candidates, key=lambda candidate: candidate[0], reverse=True)[:max_sentences]
+    best.sort(key=lambda candidate: (candidate[1], candidate[2]))
+    return FALLBACK_PREFIX + "\n\n" + " ".join(candidate[3] for candidate in best)
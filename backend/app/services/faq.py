@@ -0,0 +1,325 @@
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..db_session import SessionLocal
+from ..crud_sessions import get_faq_entries, replace_faq_entries, update_faq_answer, add_faq_hits, get_user_questions
+from .extractive_answer import content_terms
+
+logger = logging.getLogger(__name__)
+
+# Cosine similarity above which a question is served the stored answer
+FAQ_MATCH_THRESHOLD = float(os.getenv("FAQ_MATCH_THRESHOLD", "0.9"))
+# Share of content words a paraphrase must have in common with a stored phrasing.
+# Embeddings alone rate "how do refunds work" and "how do returns work" as near
+# duplicates; the overlap check keeps such questions from getting each other's answers.
+FAQ_MIN_TERM_OVERLAP = float(os.getenv("FAQ_MIN_TERM_OVERLAP", "0.5"))
+# How often a worker reloads entries written by the mining job
+FAQ_REFRESH_SECONDS = float(os.getenv("FAQ_REFRESH_SECONDS", "300"))
+
+# Where an answer came from, for the without-LLM traffic share
+SOURCE_FAQ = "faq"
+SOURCE_LLM = "llm"
+SOURCE_FALLBACK = "fallback"
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def normalize_question(text: str) -> str:
+    return " ".join(_WORD_RE.findall(text.lower()))
+
+
+def term_overlap(a: str, b: str) -> float:
+    """Jaccard similarity of the content words of two questions"""
+    terms_a, terms_b = set(content_terms(a)), set(content_terms(b))
+    if not terms_a and not terms_b:
+        return 1.0
+    return len(terms_a & terms_b) / len(terms_a | terms_b)
+
+
+def _unit(vector) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+
+class FAQMatch:
+    def __init__(self, entry_id: int, question: str, answer: str, score: float):
+        self.entry_id = entry_id
+        self.question = question
+        self.answer = answer
+        self.score = score
+
+
+class _ChatbotFAQs:
+    """One chatbot's entries in lookup form"""
+
+    def __init__(self, entries: List[Any], loaded_at: float):
+        self.loaded_at = loaded_at
+        self.entries = [(entry.id, entry.question, entry.answer, entry.kb_version) for entry in entries]
+        self.variants = [list(entry.variants or []) or [normalize_question(entry.question)] for entry in entries]
+        self.exact: Dict[str, int] = {}
+        for index, entry in enumerate(entries):
+            for variant in entry.variants or []:
+                self.exact.setdefault(variant, index)
+        self.matrix = np.stack([_unit(entry.embedding) for entry in entries]) if entries else None
+
+
+class FAQIndex:
+    """Precomputed answers to each chatbot's most frequent questions, checked before
+    retrieval and the LLM. Entries are written by tools/mine_faqs.py and reloaded
+    from the database every FAQ_REFRESH_SECONDS; answers generated from an older
+    knowledge base version are never served."""
+
+    def __init__(self, session_factory: Callable[[], Any], threshold: float = FAQ_MATCH_THRESHOLD,
+                 refresh_seconds: float = FAQ_REFRESH_SECONDS):
+        self.session_factory = session_factory
+        self.threshold = threshold
+        self.refresh_seconds = refresh_seconds
+        self._chatbots: Dict[str, _ChatbotFAQs] = {}
+        self._pending_hits: Counter = Counter()
+        self._lock = threading.Lock()
+        # chatbot_id -> Counter of answer sources
+        self.answers: Dict[str, Counter] = {}
+
+    def _get(self, chatbot_id: str) -> _ChatbotFAQs:
+        faqs = self._chatbots.get(chatbot_id)
+        if faqs is None or time.monotonic() - faqs.loaded_at > self.refresh_seconds:
+            faqs = self._load(chatbot_id)
+        return faqs
+
+    def _load(self, chatbot_id: str) -> _ChatbotFAQs:
+        db = self.session_factory()
+        try:
+            self._flush_hits(db)
+            faqs = _ChatbotFAQs(get_faq_entries(db, chatbot_id), time.monotonic())
+        except Exception as e:
+            logger.error("Error loading FAQ entries for %s: %s", chatbot_id, e)
+            faqs = _ChatbotFAQs([], time.monotonic())
+        finally:
+            db.close()
+        with self._lock:
+            self._chatbots[chatbot_id] = faqs
+        return faqs
+
+    def _flush_hits(self, db) -> None:
+        with self._lock:
+            hits, self._pending_hits = dict(self._pending_hits), Counter()
+        if hits:
+            add_faq_hits(db, hits)
+
+    def lookup(
+        self,
+        chatbot_id: str,
+        kb_version: int,
+        question: str,
+        embed: Callable[[str], List[float]],
+    ) -> Tuple[Optional[FAQMatch], Optional[List[float]]]:
+        """Best stored answer for `question`, plus the question embedding if one was
+        computed so retrieval can reuse it on a miss"""
+        faqs = self._get(chatbot_id)
+        if not faqs.entries:
+            return None, None
+
+        index = faqs.exact.get(normalize_question(question))
+        score = 1.0
+        embedding = None
+        if index is None:
+            embedding = embed(question)
+            scores = faqs.matrix @ _unit(embedding)
+            index = int(np.argmax(scores))
+            score = float(scores[index])
+            if score < self.threshold:
+                return None, embedding
+            normalized = normalize_question(question)
+            if max(term_overlap(normalized, variant) for variant in faqs.variants[index]) < FAQ_MIN_TERM_OVERLAP:
+                return None, embedding
+
+        entry_id, canonical, answer, entry_kb_version = faqs.entries[index]
+        if entry_kb_version != kb_version:
+            # Generated from an older knowledge base; wait for the job to refresh it
+            return None, embedding
+        with self._lock:
+            self._pending_hits[entry_id] += 1
+        return FAQMatch(entry_id, canonical, answer, score), embedding
+
+    def invalidate(self, chatbot_id: str) -> None:
+        with self._lock:
+            self._chatbots.pop(chatbot_id, None)
+
+    def record_answer(self, chatbot_id: str, source: str) -> None:
+        with self._lock:
+            self.answers.setdefault(chatbot_id, Counter())[source] += 1
+
+    def answer_totals(self) -> Counter:
+        with self._lock:
+            return sum(self.answers.values(), Counter())
+
+    def stats(self) -> Dict[str, Any]:
+        def summarize(counts: Counter) -> Dict[str, Any]:
+            total = sum(counts.values())
+            without_llm = counts[SOURCE_FAQ] + counts[SOURCE_FALLBACK]
+            return {
+                "queries": total,
+                "faq": counts[SOURCE_FAQ],
+                "llm": counts[SOURCE_LLM],
+                "fallback": counts[SOURCE_FALLBACK],
+                "without_llm_fraction": round(without_llm / total, 4) if total else 0.0,
+            }
+
+        with self._lock:
+            per_chatbot = {chatbot_id: summarize(counts) for chatbot_id, counts in self.answers.items()}
+            loaded = {chatbot_id: len(faqs.entries) for chatbot_id, faqs in self._chatbots.items()}
+        return {
+            "total": summarize(self.answer_totals()),
+            "chatbots": per_chatbot,
+            "loaded_entries": loaded,
+        }
+
+
+def cluster_questions(
+    questions: List[str],
+    embed: Callable[[List[str]], List[List[float]]],
+    similarity: float = 0.85,
+    min_term_overlap: float = FAQ_MIN_TERM_OVERLAP,
+) -> List[Dict[str, Any]]:
+    """Group paraphrases: distinct phrasings are visited most frequent first and join
+    the closest cluster if its centroid is within `similarity` and they share enough
+    content words with its most frequent phrasing, else start a new one."""
+    counts = Counter()
+    phrasing: Dict[str, str] = {}
+    for question in questions:
+        key = normalize_question(question)
+        if not key:
+            continue
+        counts[key] += 1
+        phrasing.setdefault(key, question.strip())
+
+    keys = [key for key, _ in counts.most_common()]
+    if not keys:
+        return []
+    vectors = []
+    for start in range(0, len(keys), 256):
+        vectors.extend(embed([phrasing[key] for key in keys[start:start + 256]]))
+
+    clusters: List[Dict[str, Any]] = []
+    centroids: List[np.ndarray] = []
+    for key, vector in zip(keys, vectors):
+        vector = _unit(vector)
+        if centroids:
+            scores = np.stack(centroids) @ vector
+            best = int(np.argmax(scores))
+            if scores[best] >= similarity and term_overlap(key, clusters[best]["variants"][0]) >= min_term_overlap:
+                cluster = clusters[best]
+                cluster["variants"].append(key)
+                cluster["size"] += counts[key]
+                cluster["sum"] += vector * counts[key]
+                centroids[best] = _unit(cluster["sum"])
+                continue
+        clusters.append({"question": phrasing[key], "variants": [key], "size": counts[key], "sum": vector * counts[key]})
+        centroids.append(vector)
+
+    for cluster, centroid in zip(clusters, centroids):
+        cluster["embedding"] = centroid.tolist()
+        del cluster["sum"]
+    return sorted(clusters, key=lambda cluster: cluster["size"], reverse=True)
+
+
+async def mine_faqs(
+    db,
+    chatbot_id: str,
+    kb_version: int,
+    answer: Callable[[str], Awaitable[str]],
+    embed: Callable[[List[str]], List[List[float]]],
+    top_n: int = 30,
+    min_cluster_size: int = 5,
+    similarity: float = 0.85,
+    since_days: int = 90,
+    max_variants: int = 50,
+) -> Dict[str, Any]:
+    """Cluster a chatbot's recorded questions and store answers for the top clusters"""
+    questions = get_user_questions(db, chatbot_id, since_days)
+    clusters = [c for c in cluster_questions(questions, embed, similarity) if c["size"] >= min_cluster_size][:top_n]
+
+    # An answer that can't be generated now (provider down, breaker open) keeps the
+    # stored entry for that cluster rather than dropping it
+    stored = get_faq_entries(db, chatbot_id)
+    previous = {}
+    for entry in stored:
+        for variant in entry.variants or []:
+            previous.setdefault(variant, entry)
+
+    entries = []
+    kept = set()
+    failed = 0
+    for cluster in clusters:
+        try:
+            text = await answer(cluster["question"])
+        except Exception as e:
+            logger.error("Error generating FAQ answer for %s: %s", chatbot_id, e)
+            failed += 1
+            entry = next((previous[v] for v in cluster["variants"] if v in previous), None)
+            if entry is not None and entry.id not in kept:
+                kept.add(entry.id)
+                entries.append({
+                    "question": entry.question,
+                    "variants": entry.variants,
+                    "embedding": entry.embedding,
+                    "answer": entry.answer,
+                    "cluster_size": cluster["size"],
+                    "hit_count": entry.hit_count,
+                    "kb_version": entry.kb_version,
+                })
+            continue
+        entries.append({
+            "question": cluster["question"],
+            "variants": cluster["variants"][:max_variants],
+            "embedding": cluster["embedding"],
+            "answer": text,
+            "cluster_size": cluster["size"],
+            "kb_version": kb_version,
+        })
+
+    answered = len(clusters) - failed
+    # With no answer generated at all, leave the stored entries untouched
+    replaced = answered > 0 or not clusters
+    if replaced:
+        replace_faq_entries(db, chatbot_id, entries)
+    else:
+        db.rollback()
+
+    covered = sum(entry["cluster_size"] for entry in entries)
+    return {
+        "chatbot_id": chatbot_id,
+        "questions": len(questions),
+        "clusters": len(clusters),
+        "answered": answered,
+        "failed": failed,
+        "kept_previous": len(kept),
+        "replaced": replaced,
+        "entries": len(entries) if replaced else len(stored),
+        "covered_questions": covered,
+        "coverage": round(covered / len(questions), 4) if questions else 0.0,
+    }
+
+
+async def refresh_stale_answers(db, chatbot_id: str, kb_version: int, answer: Callable[[str], Awaitable[str]]) -> int:
+    """Regenerate answers produced from an older knowledge base version"""
+    refreshed = 0
+    for entry in get_faq_entries(db, chatbot_id):
+        if entry.kb_version == kb_version:
+            continue
+        try:
+            update_faq_answer(db, entry.id, await answer(entry.question), kb_version)
+            refreshed += 1
+        except Exception as e:
+            logger.error("Error refreshing FAQ entry %s: %s", entry.id, e)
+    return refreshed
+
+
+faq_index = FAQIndex(SessionLocal)
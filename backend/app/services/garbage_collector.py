@@ -0,0 +1,242 @@
+import logging
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from .. import models
+from .transcript_archive import TranscriptArchive, transcript_archive
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, so run a single worker there
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# How often workers look for deleted chatbots and orphans (a delete also wakes the worker that took it)
+GC_INTERVAL_SECONDS = float(os.getenv("GC_INTERVAL_SECONDS", "600"))
+# Sessions whose rows are deleted per transaction, and the pause between transactions,
+# so a large purge never holds the write lock long enough to stall live chat
+GC_BATCH_SESSIONS = int(os.getenv("GC_BATCH_SESSIONS", "200"))
+GC_BATCH_PAUSE_SECONDS = float(os.getenv("GC_BATCH_PAUSE_SECONDS", "0.05"))
+# Orphans are only removed after being seen for this long (creation writes files,
+# collection and registry row one after another) and only if enabled
+GC_ORPHAN_GRACE_SECONDS = float(os.getenv("GC_ORPHAN_GRACE_SECONDS", "3600"))
+GC_DELETE_ORPHANS = os.getenv("GC_DELETE_ORPHANS", "false").lower() in ("1", "true", "yes")
+
+CHATBOTS_DIR = Path("data/chatbots")
+# Deleted chatbots' directories wait here for the collector
+TRASH_DIR = Path("data/trash")
+LOCK_PATH = Path("data/gc.lock")
+
+
+def directory_size(path: Path) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def _remove_directory(path: Path) -> int:
+    if not path.exists():
+        return 0
+    size = directory_size(path)
+    shutil.rmtree(path, ignore_errors=True)
+    return size
+
+
+def trash_chatbot_files(chatbot_id: str) -> bool:
+    """Move a chatbot's directory out of data/chatbots so nothing serves it any more"""
+    source = CHATBOTS_DIR / chatbot_id
+    if not source.exists():
+        return False
+    TRASH_DIR.mkdir(parents=True, exist_ok=True)
+    target = TRASH_DIR / chatbot_id
+    if target.exists():
+        shutil.rmtree(target, ignore_errors=True)
+    os.replace(source, target)
+    return True
+
+
+def _collection_names(vector_store: Any) -> List[str]:
+    # Chroma returns names from 0.6 on and Collection objects before
+    return [getattr(collection, "name", collection) for collection in vector_store.client.list_collections()]
+
+
+class GarbageCollector:
+    """Removes deleted chatbots' data and finds data no chatbot owns"""
+
+    def __init__(self, archive: TranscriptArchive = transcript_archive):
+        self.archive = archive
+        self.runs = 0
+        self.purged_chatbots_total = 0
+        self.reclaimed_bytes_total = 0
+        self.last_report: Optional[Dict[str, Any]] = None
+        # "kind:name" -> when the orphan was first seen
+        self._orphans_seen: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def purge_chatbot(self, db: Session, vector_store: Any, chatbot_id: str) -> Dict[str, int]:
+        """Delete a chatbot's collection, files, archive blocks and rows"""
+        report = {"rows": 0, "file_bytes": 0, "archive_bytes": 0}
+        try:
+            vector_store.delete_collection(chatbot_id)
+        except Exception as e:
+            logger.debug("No collection to delete for %s: %s", chatbot_id, e)
+        report["file_bytes"] += _remove_directory(TRASH_DIR / chatbot_id)
+        report["file_bytes"] += _remove_directory(CHATBOTS_DIR / chatbot_id)
+
+        # Conversations go in small transactions, children first
+        while True:
+            session_ids = db.scalars(
+                select(models.ChatSession.id).where(models.ChatSession.chatbot_id == chatbot_id).limit(GC_BATCH_SESSIONS)
+            ).all()
+            if not session_ids:
+                break
+            for column in (models.ChatMessage.session_id, models.ArchivedSession.session_id,
+                           models.Insight.session_id, models.ChatSession.id):
+                report["rows"] += db.execute(delete(column.class_).where(column.in_(session_ids))).rowcount
+            db.commit()
+            time.sleep(GC_BATCH_PAUSE_SECONDS)
+
+        blocks = db.execute(
+            select(models.TranscriptArchiveBlock.path).where(models.TranscriptArchiveBlock.chatbot_id == chatbot_id)
+        ).scalars().all()
+        for path in blocks:
+            report["archive_bytes"] += self.archive.delete_block(path)
+        # Also block files written by an archive run that failed before committing
+        report["archive_bytes"] += _remove_directory(self.archive.root / chatbot_id)
+        for column in (models.TranscriptArchiveBlock.chatbot_id, models.InsightDailyRollup.chatbot_id,
+                       models.FAQEntry.chatbot_id, models.Insight.chatbot_id, models.Chatbot.id):
+            report["rows"] += db.execute(delete(column.class_).where(column == chatbot_id)).rowcount
+        db.commit()
+        logger.info("Purged chatbot %s: %s", chatbot_id, report)
+        return report
+
+    def find_orphans(self, db: Session, vector_store: Any) -> Dict[str, List[str]]:
+        """Data with no chatbot behind it.
+
+        A directory with metadata.json but no registry row is a chatbot from
+        before the registry; it is reported as unregistered (see
+        tools/backfill_chatbots.py) and never removed.
+        """
+        registered = set(db.scalars(select(models.Chatbot.id)))
+        directories = {path.name for path in CHATBOTS_DIR.iterdir() if path.is_dir()} if CHATBOTS_DIR.exists() else set()
+        described = {name for name in directories if (CHATBOTS_DIR / name / "metadata.json").exists()}
+        trashed = {path.name for path in TRASH_DIR.iterdir()} if TRASH_DIR.exists() else set()
+        archived = {path.name for path in self.archive.root.iterdir()} if self.archive.root.exists() else set()
+        collections = set(_collection_names(vector_store))
+        referenced = set(db.scalars(select(models.ChatSession.chatbot_id).distinct())) | set(
+            db.scalars(select(models.TranscriptArchiveBlock.chatbot_id).distinct())
+        )
+        known = registered | described
+        return {
+            "directories": sorted(
+                (directories - described - registered) | (trashed - registered) | (archived - known - referenced)
+            ),
+            "collections": sorted(collections - known),
+            "conversations": sorted(referenced - known - directories - collections),
+            "unregistered": sorted(described - registered),
+        }
+
+    def _aged(self, orphans: Dict[str, List[str]], grace_seconds: float) -> Dict[str, List[str]]:
+        """The orphans seen for at least `grace_seconds`"""
+        now = time.monotonic()
+        current = {f"{kind}:{name}" for kind, names in orphans.items() for name in names}
+        with self._lock:
+            self._orphans_seen = {key: self._orphans_seen.get(key, now) for key in current}
+            return {
+                kind: [name for name in names if now - self._orphans_seen[f"{kind}:{name}"] >= grace_seconds]
+                for kind, names in orphans.items()
+            }
+
+    def collect(
+        self,
+        db: Session,
+        vector_store: Any,
+        delete_orphans: bool = GC_DELETE_ORPHANS,
+        grace_seconds: float = GC_ORPHAN_GRACE_SECONDS
+    ) -> Dict[str, Any]:
+        """Purge deleted chatbots and (if enabled) aged orphans; returns what was reclaimed"""
+        LOCK_PATH.parent.mkdir(parents=True, exist_ok=True)
+        with open(LOCK_PATH, "w") as lock_file:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    logger.debug("Garbage collection already running in another worker")
+                    return {"skipped": True}
+            return self._collect(db, vector_store, delete_orphans, grace_seconds)
+
+    def _collect(self, db: Session, vector_store: Any, delete_orphans: bool, grace_seconds: float) -> Dict[str, Any]:
+        started = time.perf_counter()
+        vector_store_before = directory_size(vector_store.db_path)
+        report: Dict[str, Any] = {"purged_chatbots": 0, "rows": 0, "file_bytes": 0, "archive_bytes": 0}
+
+        deleted = db.scalars(select(models.Chatbot.id).where(models.Chatbot.deleted_at.isnot(None))).all()
+        db.rollback()
+        for chatbot_id in deleted:
+            for key, value in self.purge_chatbot(db, vector_store, chatbot_id).items():
+                report[key] += value
+            report["purged_chatbots"] += 1
+
+        orphans = self.find_orphans(db, vector_store)
+        db.rollback()
+        unregistered = orphans.pop("unregistered")
+        report["orphans"] = orphans
+        report["unregistered"] = unregistered
+        report["orphans_removed"] = 0
+        if delete_orphans:
+            aged = self._aged(orphans, grace_seconds)
+            for name in aged["directories"]:
+                for root in (CHATBOTS_DIR, TRASH_DIR, self.archive.root):
+                    report["file_bytes"] += _remove_directory(root / name)
+            for name in aged["collections"]:
+                vector_store.delete_collection(name)
+            for name in aged["conversations"]:
+                purged = self.purge_chatbot(db, vector_store, name)
+                report["rows"] += purged["rows"]
+                report["archive_bytes"] += purged["archive_bytes"]
+            report["orphans_removed"] = sum(len(names) for names in aged.values())
+
+        report["vector_store_bytes"] = max(0, vector_store_before - directory_size(vector_store.db_path))
+        report["reclaimed_bytes"] = report["file_bytes"] + report["archive_bytes"] + report["vector_store_bytes"]
+        # Freed SQLite pages are reused by new rows; VACUUM returns them to the filesystem
+        connection = db.connection()
+        report["database_free_bytes"] = (
+            connection.exec_driver_sql("PRAGMA freelist_count").scalar() * connection.exec_driver_sql("PRAGMA page_size").scalar()
+        )
+        db.rollback()
+        report["duration_seconds"] = round(time.perf_counter() - started, 3)
+
+        with self._lock:
+            self.runs += 1
+            self.purged_chatbots_total += report["purged_chatbots"]
+            self.reclaimed_bytes_total += report["reclaimed_bytes"]
+            self.last_report = report
+        if report["purged_chatbots"] or report["orphans_removed"] or any(orphans.values()):
+            logger.info("Garbage collection: %s", report)
+        return report
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "runs": self.runs,
+                "purged_chatbots_total": self.purged_chatbots_total,
+                "reclaimed_bytes_total": self.reclaimed_bytes_total,
+                "delete_orphans": GC_DELETE_ORPHANS,
+                "last_report": self.last_report,
+            }
+
+
+garbage_collector = GarbageCollector()
@@ -1,18 +1,10 @@
-import os
-import httpx
 from typing import List, Dict, Any
-from dotenv import load_dotenv
 
-load_dotenv()
+from .llm_providers import get_llm_provider, ASSISTANT
 
 class GroqChat:
     def __init__(self):
-        self.api_key = os.getenv('GROQ_API_KEY', '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')
-        self.api_url = "https://api.groq.com/openai/v1/chat/completions"
-        self.headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.api_key}"
-        }
+        self.provider = get_llm_provider()
 
     def generate_system_prompt(self, context: str) -> str:
         return f"""You are a helpful AI assistant with access to specific knowledge. 
@@ -29,27 +21,13 @@ class GroqChat:
                 {"role": "user", "content": query}
             ]
 
-            payload = {
-                "model": "mistral-saba-24b",
-                "messages": messages,
-                "max_tokens": 500,
-                "temperature": 0.7,
-                "top_p": 1.0
-            }
+            return await self.provider.complete(
+                messages,
+                purpose=ASSISTANT,
+                temperature=0.7,
+                max_tokens=500,
+                top_p=1.0
+            )
 
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    self.api_url,
-                    headers=self.headers,
-                    json=payload
-                )
-                response.raise_for_status()
-                data = response.json()
-                return data["choices"][0]["message"]["content"]
-
-        except httpx.RequestError as e:
-            raise Exception(f"Error calling Groq API: {str(e)}")
-        except KeyError as e:
-            raise Exception(f"Unexpected response format from Groq API: {str(e)}")
         except Exception as e:
-            raise Exception(f"Error getting response from Groq: {str(e)}")
+            raise Exception(f"Error getting response from LLM provider: {str(e)}")
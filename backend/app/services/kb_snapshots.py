@@ -0,0 +1,254 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import zipfile
+from datetime import datetime
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, List, Optional
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from .. import crud, schemas
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = "botgenie-kb-snapshot"
+SNAPSHOT_VERSION = 1
+# Stored embedding precision: float16 halves the size and is well within
+# retrieval tolerance for normalized embeddings; float32 round-trips exactly
+SNAPSHOT_DTYPE = os.getenv("SNAPSHOT_DTYPE", "float16")
+# Records read from or written to Chroma per call
+SNAPSHOT_BATCH_SIZE = int(os.getenv("SNAPSHOT_BATCH_SIZE", "5000"))
+
+# Snapshot members. The embedding matrix is stored uncompressed (float noise doesn't
+# deflate), so import reads it at disk speed; texts are blobs plus uint64 offsets.
+MANIFEST = "manifest.json"
+EMBEDDINGS = "embeddings.bin"
+IDS = "ids.bin"
+IDS_OFFSETS = "ids.offsets"
+DOCUMENTS = "documents.bin"
+DOCUMENTS_OFFSETS = "documents.offsets"
+METADATAS = "metadatas.ndjson"
+
+
+class SnapshotError(Exception):
+    """The file is not a snapshot this version can restore"""
+
+
+class _BlobWriter:
+    """Concatenated UTF-8 strings with an offsets array"""
+
+    def __init__(self, path: Path):
+        self.file = open(path, "wb")
+        self.offsets: List[int] = [0]
+
+    def write(self, values: List[Optional[str]]) -> None:
+        for value in values:
+            data = (value or "").encode("utf-8")
+            self.file.write(data)
+            self.offsets.append(self.offsets[-1] + len(data))
+
+    def close(self, offsets_path: Path) -> None:
+        self.file.close()
+        np.asarray(self.offsets, dtype="<u8").tofile(offsets_path)
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def export_snapshot(
+    vector_store: Any,
+    collection_name: str,
+    destination: Path,
+    chatbot_metadata: Optional[Dict[str, Any]] = None,
+    dtype: str = SNAPSHOT_DTYPE,
+    batch_size: int = SNAPSHOT_BATCH_SIZE
+) -> Dict[str, Any]:
+    """Write a collection's records, embeddings included, to a snapshot file; returns its manifest"""
+    collection = vector_store.client.get_collection(name=collection_name, embedding_function=vector_store.embedding_function)
+    count = collection.count()
+    dimension = None
+
+    with tempfile.TemporaryDirectory(dir=destination.parent) as directory:
+        work = Path(directory)
+        ids = _BlobWriter(work / IDS)
+        documents = _BlobWriter(work / DOCUMENTS)
+        with open(work / EMBEDDINGS, "wb") as embeddings, open(work / METADATAS, "w", encoding="utf-8") as metadatas:
+            for offset in range(0, count, batch_size):
+                page = collection.get(include=["embeddings", "documents", "metadatas"], limit=batch_size, offset=offset)
+                matrix = np.asarray(page["embeddings"], dtype=dtype)
+                if dimension is None and len(matrix):
+                    dimension = matrix.shape[1]
+                embeddings.write(matrix.astype(np.dtype(dtype).newbyteorder("<"), copy=False).tobytes())
+                ids.write(page["ids"])
+                documents.write(page["documents"])
+                for metadata in page["metadatas"]:
+                    metadatas.write(json.dumps(metadata or {}, ensure_ascii=False) + "\n")
+        ids.close(work / IDS_OFFSETS)
+        documents.close(work / DOCUMENTS_OFFSETS)
+
+        members = [EMBEDDINGS, IDS, IDS_OFFSETS, DOCUMENTS, DOCUMENTS_OFFSETS, METADATAS]
+        manifest = {
+            "format": SNAPSHOT_FORMAT,
+            "version": SNAPSHOT_VERSION,
+            "collection": collection_name,
+            "count": len(ids.offsets) - 1,
+            "dimension": dimension or 0,
+            "dtype": dtype,
+            "embedding_function": type(vector_store.embedding_function).__name__,
+            "collection_metadata": dict(collection.metadata or {}),
+            "hnsw_params": vector_store.tuned_params(collection_name),
+            "chatbot": chatbot_metadata or {},
+            "created_at": datetime.utcnow().isoformat(),
+            "sha256": {name: _sha256(work / name) for name in members},
+        }
+
+        partial = destination.with_name(destination.name + ".tmp")
+        with zipfile.ZipFile(partial, "w", allowZip64=True) as archive:
+            archive.writestr(MANIFEST, json.dumps(manifest, indent=2), compress_type=zipfile.ZIP_DEFLATED)
+            archive.write(work / EMBEDDINGS, EMBEDDINGS, compress_type=zipfile.ZIP_STORED)
+            for name in members[1:]:
+                archive.write(work / name, name, compress_type=zipfile.ZIP_DEFLATED)
+        os.replace(partial, destination)
+
+    logger.info("Exported %d records of %s to %s", manifest["count"], collection_name, destination)
+    return manifest
+
+
+def read_manifest(archive: zipfile.ZipFile) -> Dict[str, Any]:
+    try:
+        manifest = json.loads(archive.read(MANIFEST))
+    except (KeyError, ValueError) as e:
+        raise SnapshotError(f"missing or unreadable manifest: {e}")
+    if manifest.get("format") != SNAPSHOT_FORMAT:
+        raise SnapshotError("not a knowledge base snapshot")
+    if manifest.get("version") != SNAPSHOT_VERSION:
+        raise SnapshotError(f"unsupported snapshot version {manifest.get('version')}")
+    return manifest
+
+
+def _read_strings(blob: BinaryIO, offsets: np.ndarray, start: int, end: int) -> List[str]:
+    data = blob.read(int(offsets[end] - offsets[start]))
+    base = offsets[start]
+    return [data[offsets[i] - base:offsets[i + 1] - base].decode("utf-8") for i in range(start, end)]
+
+
+def _verify(archive: zipfile.ZipFile, manifest: Dict[str, Any]) -> None:
+    for name, expected in manifest["sha256"].items():
+        digest = hashlib.sha256()
+        with archive.open(name) as member:
+            for block in iter(lambda: member.read(1 << 20), b""):
+                digest.update(block)
+        if digest.hexdigest() != expected:
+            raise SnapshotError(f"{name} is corrupt")
+
+
+def import_snapshot(
+    vector_store: Any,
+    source: Path,
+    collection_name: str,
+    batch_size: int = SNAPSHOT_BATCH_SIZE
+) -> Dict[str, Any]:
+    """Bulk-load a snapshot into a new collection without re-embedding; returns its manifest"""
+    with zipfile.ZipFile(source) as archive:
+        manifest = read_manifest(archive)
+        expected_function = type(vector_store.embedding_function).__name__
+        if manifest["embedding_function"] != expected_function:
+            # Queries would be embedded by a different model than the stored chunks
+            raise SnapshotError(f"snapshot was embedded with {manifest['embedding_function']}, "
+                                f"this node uses {expected_function}")
+        _verify(archive, manifest)
+
+        count, dimension = manifest["count"], manifest["dimension"]
+        dtype = np.dtype(manifest["dtype"]).newbyteorder("<")
+        id_offsets = np.frombuffer(archive.read(IDS_OFFSETS), dtype="<u8")
+        document_offsets = np.frombuffer(archive.read(DOCUMENTS_OFFSETS), dtype="<u8")
+        if len(id_offsets) != count + 1 or len(document_offsets) != count + 1:
+            raise SnapshotError("record counts don't match the manifest")
+
+        if manifest.get("hnsw_params"):
+            vector_store.record_tuned_params(collection_name, manifest["hnsw_params"])
+        collection = vector_store.client.create_collection(
+            name=collection_name,
+            metadata=vector_store.collection_metadata(vector_store.tuned_params(collection_name)),
+            embedding_function=vector_store.embedding_function
+        )
+        batch_size = min(batch_size, vector_store.client.get_max_batch_size())
+        try:
+            with archive.open(EMBEDDINGS) as embeddings, archive.open(IDS) as ids, \
+                    archive.open(DOCUMENTS) as documents, archive.open(METADATAS) as metadatas:
+                for start in range(0, count, batch_size):
+                    end = min(start + batch_size, count)
+                    rows = end - start
+                    matrix = np.frombuffer(embeddings.read(rows * dimension * dtype.itemsize), dtype=dtype)
+                    collection.add(
+                        ids=_read_strings(ids, id_offsets, start, end),
+                        embeddings=matrix.reshape(rows, dimension).astype(np.float32),
+                        documents=_read_strings(documents, document_offsets, start, end),
+                        metadatas=[json.loads(metadatas.readline()) or None for _ in range(rows)]
+                    )
+        except Exception:
+            vector_store.delete_collection(collection_name)
+            raise
+        vector_store.collections.discard(collection_name)
+
+    logger.info("Imported %d records into %s from %s", count, collection_name, source)
+    return manifest
+
+
+def restore_chatbot(
+    db: Session,
+    vector_store: Any,
+    source: Path,
+    chatbot_id: str,
+    owner_id: Optional[int] = None
+) -> Dict[str, Any]:
+    """Create a working chatbot from a snapshot: collection, metadata.json and registry row.
+
+    The owner recorded in the snapshot is kept unless `owner_id` is given
+    (cloning into another account). Returns the chatbot metadata.
+    """
+    chatbot_dir = Path(f"data/chatbots/{chatbot_id}")
+    if chatbot_dir.exists():
+        raise SnapshotError(f"chatbot {chatbot_id} already exists")
+    manifest = import_snapshot(vector_store, source, chatbot_id)
+
+    metadata = {key: value for key, value in manifest["chatbot"].items() if key != "files"}
+    metadata.setdefault("chatbot_name", manifest["collection"])
+    metadata.setdefault("chatbot_type", "general")
+    metadata.setdefault("business_name", "")
+    metadata.setdefault("business_type", "")
+    if owner_id is not None:
+        metadata["user_id"] = owner_id
+    metadata["created_at"] = datetime.now().isoformat()
+    metadata["kb_version"] = 1
+    metadata["restored_from"] = {"collection": manifest["collection"], "snapshot_created_at": manifest["created_at"]}
+
+    try:
+        chatbot_dir.mkdir(parents=True)
+        (chatbot_dir / "metadata.json").write_text(json.dumps(metadata, indent=2))
+        if metadata.get("user_id") is not None:
+            crud.create_db_chatbot(db, schemas.ChatbotCreateDB(
+                id=chatbot_id,
+                name=metadata["chatbot_name"],
+                user_id=metadata["user_id"],
+                business_name=metadata.get("business_name"),
+                business_type=metadata.get("business_type"),
+                chatbot_type=metadata.get("chatbot_type"),
+                icon_url=metadata.get("icon"),
+                created_at=datetime.fromisoformat(metadata["created_at"])
+            ))
+    except Exception:
+        shutil.rmtree(chatbot_dir, ignore_errors=True)
+        vector_store.delete_collection(chatbot_id)
+        raise
+    return metadata
@@ -0,0 +1,230 @@
+import json
+import logging
+import os
+from typing import AsyncIterator, Dict, List, Optional
+
+import httpx
+
+from .llm_scheduler import llm_scheduler, estimate_tokens, INTERACTIVE
+
+logger = logging.getLogger(__name__)
+
+# Which backend serves completions: "groq" or "openai_compatible" (any server
+# speaking the OpenAI chat completions API, including tools/mock_llm_server.py)
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "groq")
+LLM_BASE_URL = os.getenv("LLM_BASE_URL")
+LLM_API_KEY = os.getenv("LLM_API_KEY")
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+
+# Model used for each kind of call
+CHAT = "chat"            # answers in query_chatbot
+ANALYSIS = "analysis"    # conversation insights
+ASSISTANT = "assistant"  # GroqChat helper
+
+GROQ_BASE_URL = "https://api.groq.com/openai/v1"
+GROQ_DEFAULT_MODELS = {
+    CHAT: "llama3-70b-8192",
+    ANALYSIS: "llama3-70b-8192",
+    ASSISTANT: "mistral-saba-24b",
+}
+
+
+class LLMProviderError(Exception):
+    """Non-success response from the provider"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class LLMProvider:
+    """Interface for chat completion backends"""
+
+    name = "base"
+
+    def model_for(self, purpose: str) -> str:
+        raise NotImplementedError
+
+    async def complete(
+        self,
+        messages: List[Dict[str, str]],
+        purpose: str = CHAT,
+        temperature: float = 0.7,
+        max_tokens: int = 1000,
+        priority: str = INTERACTIVE,
+        tenant: str = "default",
+        **options,
+    ) -> str:
+        """Return the assistant message for `messages`"""
+        raise NotImplementedError
+
+    def stream(
+        self,
+        messages: List[Dict[str, str]],
+        purpose: str = CHAT,
+        temperature: float = 0.7,
+        max_tokens: int = 1000,
+        priority: str = INTERACTIVE,
+        tenant: str = "default",
+        **options,
+    ) -> AsyncIterator[str]:
+        """Yield the assistant message in content deltas as they are generated"""
+        raise NotImplementedError
+
+    async def aclose(self) -> None:
+        pass
+
+
+class OpenAICompatibleProvider(LLMProvider):
+    """Provider for any server implementing POST {base_url}/chat/completions"""
+
+    name = "openai_compatible"
+
+    def __init__(self, base_url: str, api_key: Optional[str], models: Dict[str, str]):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.models = models
+        # One pooled client for all calls instead of a new connection per request
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            headers = {"Content-Type": "application/json"}
+            if self.api_key:
+                headers["Authorization"] = f"Bearer {self.api_key}"
+            self._client = httpx.AsyncClient(base_url=self.base_url, headers=headers, timeout=LLM_TIMEOUT_SECONDS)
+        return self._client
+
+    def model_for(self, purpose: str) -> str:
+        return self.models.get(purpose) or self.models[CHAT]
+
+    def _payload(self, messages, purpose, temperature, max_tokens, options) -> dict:
+        return {
+            "model": self.model_for(purpose),
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            **options,
+        }
+
+    @staticmethod
+    def _error(response: httpx.Response) -> LLMProviderError:
+        detail = f"Error from LLM API (Status: {response.status_code})"
+        try:
+            detail += f": {json.dumps(response.json())}"
+        except Exception:
+            try:
+                detail += f": {response.text}"
+            except Exception:
+                detail += " (Could not read response body)"
+        return LLMProviderError(response.status_code, detail)
+
+    async def complete(
+        self,
+        messages: List[Dict[str, str]],
+        purpose: str = CHAT,
+        temperature: float = 0.7,
+        max_tokens: int = 1000,
+        priority: str = INTERACTIVE,
+        tenant: str = "default",
+        **options,
+    ) -> str:
+        payload = self._payload(messages, purpose, temperature, max_tokens, options)
+        response = await llm_scheduler.submit(
+            lambda: self.client.post("/chat/completions", json=payload),
+            estimated_tokens=estimate_tokens(messages, max_tokens),
+            priority=priority,
+            tenant=tenant
+        )
+        if response.status_code != 200:
+            raise self._error(response)
+        try:
+            return response.json()["choices"][0]["message"]["content"]
+        except (KeyError, IndexError, ValueError) as e:
+            raise LLMProviderError(502, f"Unexpected response format from LLM API: {e}")
+
+    async def stream(
+        self,
+        messages: List[Dict[str, str]],
+        purpose: str = CHAT,
+        temperature: float = 0.7,
+        max_tokens: int = 1000,
+        priority: str = INTERACTIVE,
+        tenant: str = "default",
+        **options,
+    ) -> AsyncIterator[str]:
+        payload = self._payload(messages, purpose, temperature, max_tokens, {**options, "stream": True})
+        request = self.client.build_request("POST", "/chat/completions", json=payload)
+        response = await llm_scheduler.submit(
+            lambda: self.client.send(request, stream=True),
+            estimated_tokens=estimate_tokens(messages, max_tokens),
+            priority=priority,
+            tenant=tenant
+        )
+        try:
+            if response.status_code != 200:
+                await response.aread()
+                raise self._error(response)
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                try:
+                    delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                except (KeyError, IndexError, ValueError):
+                    continue
+                if delta:
+                    yield delta
+        finally:
+            await response.aclose()
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class GroqProvider(OpenAICompatibleProvider):
+    name = "groq"
+
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None, models: Optional[Dict[str, str]] = None):
+        api_key = api_key or os.getenv("GROQ_API_KEY")
+        if not api_key:
+            raise ValueError("GROQ_API_KEY environment variable is not set")
+        super().__init__(base_url or GROQ_BASE_URL, api_key, models or GROQ_DEFAULT_MODELS)
+
+
+def _configured_models() -> Dict[str, str]:
+    """Model overrides from LLM_CHAT_MODEL / LLM_ANALYSIS_MODEL / LLM_ASSISTANT_MODEL"""
+    models = dict(GROQ_DEFAULT_MODELS)
+    for purpose in (CHAT, ANALYSIS, ASSISTANT):
+        override = os.getenv(f"LLM_{purpose.upper()}_MODEL")
+        if override:
+            models[purpose] = override
+    return models
+
+
+def create_provider() -> LLMProvider:
+    if LLM_PROVIDER == "groq":
+        return GroqProvider(base_url=LLM_BASE_URL, models=_configured_models())
+    if LLM_PROVIDER == "openai_compatible":
+        if not LLM_BASE_URL:
+            raise ValueError("LLM_BASE_URL must be set when LLM_PROVIDER=openai_compatible")
+        return OpenAICompatibleProvider(LLM_BASE_URL, LLM_API_KEY, _configured_models())
+    raise ValueError(f"Unknown LLM_PROVIDER: {LLM_PROVIDER}")
+
+
+_provider: Optional[LLMProvider] = None
+
+
+def get_llm_provider() -> LLMProvider:
+    """Process-wide provider built from the environment on first use"""
+    global _provider
+    if _provider is None:
+        _provider = create_provider()
+        logger.info("Using LLM provider %s", _provider.name)
+    return _provider
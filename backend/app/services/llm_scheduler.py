@@ -0,0 +1,395 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+import httpx
+
+from ..utils.metrics import span
+
+logger = logging.getLogger(__name__)
+
+# Provider quota. Set these to your Groq plan's limits so we throttle before the API does.
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "100"))
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "100000"))
+# Adaptive concurrency bounds and the latency above which we back off
+LLM_MIN_CONCURRENCY = int(os.getenv("LLM_MIN_CONCURRENCY", "1"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+LLM_LATENCY_TARGET_SECONDS = float(os.getenv("LLM_LATENCY_TARGET_SECONDS", "8"))
+# Retries for 429/5xx responses and connection failures
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "0.5"))
+LLM_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "20"))
+
+# Background work is shed while interactive p95 latency (queue wait included) exceeds this
+LLM_INTERACTIVE_P95_TARGET_SECONDS = float(os.getenv("LLM_INTERACTIVE_P95_TARGET_SECONDS", "6"))
+# Comma-separated tenant=weight pairs for fair queuing; tenants not listed get weight 1
+LLM_TENANT_WEIGHTS = os.getenv("LLM_TENANT_WEIGHTS", "")
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Priority classes, served strictly in this order
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+PRIORITIES = (INTERACTIVE, BACKGROUND)
+
+
+class LLMOverloadedError(Exception):
+    """Raised to shed background LLM work while interactive traffic is over its latency target"""
+
+
+def estimate_tokens(messages: List[Dict[str, str]], max_tokens: int) -> int:
+    """Rough upper bound on the tokens a completion will consume (about 4 characters per token)"""
+    prompt_chars = sum(len(message.get("content", "")) for message in messages)
+    return prompt_chars // 4 + max_tokens
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP-date)"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_tenant_weights(spec: str) -> Dict[str, float]:
+    weights = {}
+    for entry in spec.split(","):
+        if "=" not in entry:
+            continue
+        tenant, weight = entry.split("=", 1)
+        weights[tenant.strip()] = float(weight)
+    return weights
+
+
+class TokenBucket:
+    """Async token bucket refilled continuously at `per_minute` units per minute"""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        # Held while waiting so callers are served in arrival order
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self, amount: float) -> None:
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            self._refill()
+            while self.tokens < amount:
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= amount
+
+    def adjust(self, amount: float) -> None:
+        """Credit (positive) or debit (negative) after the real cost is known; may go negative"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD limit on in-flight requests: grow by ~1 per limit's worth of fast
+    responses, halve on 429s and timeouts, shrink gently when latency exceeds the target."""
+
+    def __init__(self, min_limit: int, max_limit: int, latency_target: float):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.limit = float(max(min_limit, min(max_limit, 4)))
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self) -> None:
+        async with self._condition:
+            while self.in_flight >= int(self.limit):
+                await self._condition.wait()
+            self.in_flight += 1
+
+    async def release(self) -> None:
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self, latency: float) -> None:
+        if latency > self.latency_target:
+            self._decrease(0.9)
+        else:
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+
+    def on_overload(self) -> None:
+        self._decrease(0.5)
+
+    def _decrease(self, factor: float) -> None:
+        # Responses from one overloaded window arrive together; only back off once per window
+        now = time.monotonic()
+        if now - self._last_decrease < self.latency_target:
+            return
+        self._last_decrease = now
+        self.limit = max(self.min_limit, self.limit * factor)
+
+
+class LatencyWindow:
+    """Recent latencies over a sliding time window, for percentile checks"""
+
+    def __init__(self, window_seconds: float = 60.0, max_samples: int = 500):
+        self.window_seconds = window_seconds
+        self.samples: Deque[Tuple[float, float]] = deque(maxlen=max_samples)
+
+    def add(self, latency: float) -> None:
+        self.samples.append((time.monotonic(), latency))
+
+    def percentile(self, q: float) -> Optional[float]:
+        cutoff = time.monotonic() - self.window_seconds
+        while self.samples and self.samples[0][0] < cutoff:
+            self.samples.popleft()
+        if not self.samples:
+            return None
+        values = sorted(latency for _, latency in self.samples)
+        return values[min(len(values) - 1, int(q * len(values)))]
+
+
+class _Ticket:
+    __slots__ = ("priority", "tenant", "tokens", "future")
+
+    def __init__(self, priority: str, tenant: str, tokens: int, future: asyncio.Future):
+        self.priority = priority
+        self.tenant = tenant
+        self.tokens = tokens
+        self.future = future
+
+
+class FairQueue:
+    """Strict priority between classes, start-time fair queuing between tenants within a class.
+
+    Each tenant's requests get virtual finish tags spaced by cost / weight, so a
+    tenant that floods the queue only delays its own later requests.
+    """
+
+    def __init__(self, weights: Dict[str, float]):
+        self.weights = weights
+        self._heaps: Dict[str, List[Tuple[float, int, _Ticket]]] = {priority: [] for priority in PRIORITIES}
+        self._virtual_time: Dict[str, float] = {priority: 0.0 for priority in PRIORITIES}
+        self._last_finish: Dict[Tuple[str, str], float] = {}
+        self._sequence = itertools.count()
+        self._not_empty = asyncio.Event()
+
+    def put(self, ticket: _Ticket) -> None:
+        key = (ticket.priority, ticket.tenant)
+        start = max(self._virtual_time[ticket.priority], self._last_finish.get(key, 0.0))
+        finish = start + max(1, ticket.tokens) / self.weights.get(ticket.tenant, 1.0)
+        self._last_finish[key] = finish
+        heapq.heappush(self._heaps[ticket.priority], (finish, next(self._sequence), ticket))
+        self._not_empty.set()
+
+    async def get(self) -> _Ticket:
+        while True:
+            for priority in PRIORITIES:
+                heap = self._heaps[priority]
+                if heap:
+                    finish, _, ticket = heapq.heappop(heap)
+                    self._virtual_time[priority] = finish
+                    if not heap:
+                        # Class drained: forget tenant tags so they don't grow without bound
+                        self._last_finish = {key: tag for key, tag in self._last_finish.items() if key[0] != priority}
+                    return ticket
+            self._not_empty.clear()
+            await self._not_empty.wait()
+
+    def depth(self, priority: str) -> int:
+        return len(self._heaps[priority])
+
+
+class LLMScheduler:
+    """Shared gate for every outbound LLM call: priority and per-tenant fair
+    queuing, rate limits, adaptive concurrency and retries"""
+
+    def __init__(self):
+        self.request_bucket = TokenBucket(LLM_REQUESTS_PER_MINUTE)
+        self.token_bucket = TokenBucket(LLM_TOKENS_PER_MINUTE)
+        self.limiter = AdaptiveConcurrencyLimiter(LLM_MIN_CONCURRENCY, LLM_MAX_CONCURRENCY, LLM_LATENCY_TARGET_SECONDS)
+        self.queue = FairQueue(parse_tenant_weights(LLM_TENANT_WEIGHTS))
+        self.interactive_latency = LatencyWindow()
+        self._dispatcher: Optional[asyncio.Task] = None
+
+        self.requests_total = 0
+        self.retries_total = 0
+        self.throttled_total = 0
+        self.shed_total = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(self.queue.depth(priority) for priority in PRIORITIES)
+
+    def interactive_overloaded(self) -> bool:
+        p95 = self.interactive_latency.percentile(0.95)
+        return p95 is not None and p95 > LLM_INTERACTIVE_P95_TARGET_SECONDS
+
+    async def submit(
+        self,
+        send: Callable[[], Awaitable[httpx.Response]],
+        estimated_tokens: int,
+        priority: str = INTERACTIVE,
+        tenant: str = "default",
+    ) -> httpx.Response:
+        """Run `send` once quota and a concurrency slot are available, retrying
+        retryable failures. Returns the last response, even if it is an error.
+
+        Background calls raise LLMOverloadedError instead of queueing while
+        interactive latency is over target; callers should defer the work.
+        """
+        if priority == BACKGROUND and self.interactive_overloaded():
+            self.shed_total += 1
+            raise LLMOverloadedError("Interactive LLM latency over target, deferring background work")
+
+        submitted_at = time.monotonic()
+        try:
+            return await self._submit_with_retries(send, estimated_tokens, priority, tenant)
+        finally:
+            if priority == INTERACTIVE:
+                self.interactive_latency.add(time.monotonic() - submitted_at)
+
+    async def _submit_with_retries(self, send, estimated_tokens: int, priority: str, tenant: str) -> httpx.Response:
+        attempt = 0
+        while True:
+            await self._admit(estimated_tokens, priority, tenant)
+            start = time.monotonic()
+            try:
+                response = await send()
+            except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+                # Request never reached the provider, so it is safe to retry
+                await self.limiter.release()
+                self.limiter.on_overload()
+                self.token_bucket.adjust(estimated_tokens)
+                if attempt >= LLM_MAX_RETRIES:
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning("LLM connection failed (%s), retrying in %.2fs", e, delay)
+            except httpx.TimeoutException:
+                await self.limiter.release()
+                self.limiter.on_overload()
+                raise
+            except BaseException:
+                await self.limiter.release()
+                raise
+            else:
+                latency = time.monotonic() - start
+                await self.limiter.release()
+                self._reconcile_tokens(response, estimated_tokens)
+
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    self.limiter.on_success(latency)
+                    return response
+
+                if response.status_code == 429:
+                    self.throttled_total += 1
+                    self.limiter.on_overload()
+                if attempt >= LLM_MAX_RETRIES:
+                    return response
+
+                # Release the connection of a response we're discarding (matters for streams)
+                await response.aclose()
+                retry_after = parse_retry_after(response.headers.get("retry-after"))
+                delay = self._backoff(attempt) if retry_after is None else retry_after + random.uniform(0, LLM_BACKOFF_BASE_SECONDS)
+                logger.warning("LLM returned %s, retrying in %.2fs", response.status_code, delay)
+
+            attempt += 1
+            self.retries_total += 1
+            await asyncio.sleep(delay)
+
+    async def _admit(self, estimated_tokens: int, priority: str, tenant: str) -> None:
+        """Queue for the dispatcher, which hands out quota and concurrency slots in fair order"""
+        self._ensure_dispatcher()
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put(_Ticket(priority, tenant, estimated_tokens, future))
+        with span("llm_queue"):
+            try:
+                await future
+            except asyncio.CancelledError:
+                # If the dispatcher already granted a slot, give it back
+                if future.done() and not future.cancelled() and future.exception() is None:
+                    await self.limiter.release()
+                raise
+        self.requests_total += 1
+
+    def _ensure_dispatcher(self) -> None:
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.get_running_loop().create_task(self._dispatch())
+
+    async def _dispatch(self) -> None:
+        while True:
+            ticket = await self.queue.get()
+            if ticket.future.done():
+                # Caller gave up while queued
+                continue
+            if ticket.priority == BACKGROUND and self.interactive_overloaded():
+                self.shed_total += 1
+                ticket.future.set_exception(LLMOverloadedError("Interactive LLM latency over target, deferring background work"))
+                continue
+            try:
+                await self.request_bucket.acquire(1)
+                await self.token_bucket.acquire(ticket.tokens)
+                await self.limiter.acquire()
+            except Exception as e:
+                if not ticket.future.done():
+                    ticket.future.set_exception(e)
+                continue
+            if ticket.future.done():
+                await self.limiter.release()
+            else:
+                ticket.future.set_result(None)
+
+    def _reconcile_tokens(self, response: httpx.Response, estimated_tokens: int) -> None:
+        """Refund the difference between the estimate and the usage the provider reports"""
+        if response.status_code != 200:
+            self.token_bucket.adjust(estimated_tokens)
+            return
+        try:
+            used = response.json()["usage"]["total_tokens"]
+        except Exception:
+            return
+        self.token_bucket.adjust(estimated_tokens - used)
+
+    def _backoff(self, attempt: int) -> float:
+        # Exponential backoff with full jitter
+        ceiling = min(LLM_BACKOFF_MAX_SECONDS, LLM_BACKOFF_BASE_SECONDS * (2 ** attempt))
+        return random.uniform(0, ceiling)
+
+    def stats(self) -> Dict[str, Any]:
+        p95 = self.interactive_latency.percentile(0.95)
+        return {
+            "queue_depth": self.queue_depth,
+            "queue_depth_interactive": self.queue.depth(INTERACTIVE),
+            "queue_depth_background": self.queue.depth(BACKGROUND),
+            "in_flight": self.limiter.in_flight,
+            "concurrency_limit": round(self.limiter.limit, 2),
+            "interactive_p95_seconds": round(p95, 3) if p95 is not None else None,
+            "background_shedding": self.interactive_overloaded(),
+            "requests_total": self.requests_total,
+            "retries_total": self.retries_total,
+            "throttled_total": self.throttled_total,
+            "shed_total": self.shed_total,
+        }
+
+
+llm_scheduler = LLMScheduler()
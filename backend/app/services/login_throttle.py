@@ -0,0 +1,94 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+# Sliding window over which login attempts are counted
+LOGIN_THROTTLE_WINDOW_SECONDS = float(os.getenv("LOGIN_THROTTLE_WINDOW_SECONDS", "300"))
+# Failed logins allowed per account in the window (a successful login resets the count)
+LOGIN_MAX_FAILURES_PER_ACCOUNT = int(os.getenv("LOGIN_MAX_FAILURES_PER_ACCOUNT", "10"))
+# Login and registration attempts allowed per client IP in the window
+LOGIN_MAX_ATTEMPTS_PER_IP = int(os.getenv("LOGIN_MAX_ATTEMPTS_PER_IP", "50"))
+# Tracked keys per worker; idle keys are pruned beyond this
+LOGIN_THROTTLE_MAX_KEYS = int(os.getenv("LOGIN_THROTTLE_MAX_KEYS", "100000"))
+
+
+class SlidingWindowCounter:
+    """Event timestamps per key within a sliding window"""
+
+    def __init__(self, limit: int, window_seconds: float, max_keys: int):
+        self.limit = limit
+        self.window_seconds = window_seconds
+        self.max_keys = max_keys
+        self._events: Dict[str, Deque[float]] = {}
+
+    def _trim(self, key: str, now: float) -> Optional[Deque[float]]:
+        events = self._events.get(key)
+        if events is None:
+            return None
+        while events and events[0] <= now - self.window_seconds:
+            events.popleft()
+        if not events:
+            del self._events[key]
+            return None
+        return events
+
+    def retry_after(self, key: str, now: float) -> float:
+        """Seconds until `key` may try again; 0 if it is under the limit"""
+        events = self._trim(key, now)
+        if events is None or len(events) < self.limit:
+            return 0.0
+        return events[-self.limit] + self.window_seconds - now
+
+    def add(self, key: str, now: float) -> None:
+        if key not in self._events and len(self._events) >= self.max_keys:
+            for stale in list(self._events):
+                self._trim(stale, now)
+            if len(self._events) >= self.max_keys:
+                # Still full of active keys: forget the oldest
+                del self._events[next(iter(self._events))]
+        self._events.setdefault(key, deque()).append(now)
+
+    def reset(self, key: str) -> None:
+        self._events.pop(key, None)
+
+
+class LoginThrottle:
+    """Limits password checks per account and per client IP, so guessing and
+    hashing load are refused before any bcrypt work is done"""
+
+    def __init__(self):
+        self.accounts = SlidingWindowCounter(LOGIN_MAX_FAILURES_PER_ACCOUNT, LOGIN_THROTTLE_WINDOW_SECONDS, LOGIN_THROTTLE_MAX_KEYS)
+        self.ips = SlidingWindowCounter(LOGIN_MAX_ATTEMPTS_PER_IP, LOGIN_THROTTLE_WINDOW_SECONDS, LOGIN_THROTTLE_MAX_KEYS)
+        self.throttled_total = 0
+        self._lock = threading.Lock()
+
+    def check(self, client_ip: str, account: Optional[str] = None) -> float:
+        """Seconds the caller must wait before trying; 0 to allow the attempt.
+
+        An allowed attempt is counted right away, as a failure until record()
+        says otherwise, so concurrent attempts can't all pass the same check.
+        """
+        now = time.monotonic()
+        with self._lock:
+            wait = self.ips.retry_after(client_ip, now)
+            if account is not None:
+                wait = max(wait, self.accounts.retry_after(account.lower(), now))
+            if wait > 0:
+                self.throttled_total += 1
+                return wait
+            self.ips.add(client_ip, now)
+            if account is not None:
+                self.accounts.add(account.lower(), now)
+            return 0.0
+
+    def record(self, client_ip: str, account: str, succeeded: bool) -> None:
+        """Settle an attempt allowed by check(); a successful login clears the account's failures"""
+        if not succeeded:
+            return
+        with self._lock:
+            self.accounts.reset(account.lower())
+
+
+login_throttle = LoginThrottle()
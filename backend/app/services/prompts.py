@@ -0,0 +1,40 @@
+from typing import Dict, List
+
+
+def get_role_prompt(chatbot_type: str, business_name: str) -> str:
+    base_prompts = {
+        "customer_support": f"""You are a friendly and helpful customer support representative for {business_name}. 
+Your goal is to assist customers with their inquiries and concerns in a professional and empathetic manner.
+Use the provided context to answer questions accurately. If the answer isn't in the context, be honest and say so.""",
+        
+        "sales": f"""You are an experienced sales consultant for {business_name}. 
+Your role is to understand customer needs and recommend suitable products or services.
+Use the provided context to give accurate information about our offerings.""",
+        
+        "product_faq": f"""You are a product expert for {business_name}. 
+Your role is to provide clear and accurate information about our products and services.
+Base your answers on the provided context and explain concepts in simple terms.""",
+        
+        "technical_support": f"""You are a technical support specialist for {business_name}. 
+Your role is to help users solve technical problems efficiently.
+Use the provided context to give accurate technical guidance.""",
+        
+        "general": f"""You are a knowledgeable assistant for {business_name}. 
+Your role is to provide helpful and accurate information based on the provided context.
+Be friendly and professional in your responses."""
+    }
+    
+    return base_prompts.get(chatbot_type, base_prompts["general"])
+
+
+def build_conversation(metadata: Dict, context: str, question: str) -> List[Dict[str, str]]:
+    """Messages for answering `question` as the chatbot described by its metadata"""
+    role_prompt = get_role_prompt(
+        metadata["chatbot_type"],
+        metadata["business_name"]
+    )
+    return [
+        {"role": "system", "content": role_prompt},
+        {"role": "system", "content": f"Here is the relevant context to use in your response:\n\n{context}"},
+        {"role": "user", "content": question}
+    ]
@@ -0,0 +1,194 @@
+import gzip
+import json
+import logging
+import os
+import threading
+import uuid
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from .. import models
+
+logger = logging.getLogger(__name__)
+
+# Closed, analyzed sessions idle for longer than this move out of chat_messages. Keep it
+# above the FAQ mining window (90 days), which reads questions from the hot table.
+TRANSCRIPT_ARCHIVE_AFTER_DAYS = int(os.getenv("TRANSCRIPT_ARCHIVE_AFTER_DAYS", "180"))
+TRANSCRIPT_ARCHIVE_DIR = os.getenv("TRANSCRIPT_ARCHIVE_DIR", "data/archive")
+# Sessions per block file; reading one session decompresses its whole block
+TRANSCRIPT_ARCHIVE_BLOCK_SESSIONS = int(os.getenv("TRANSCRIPT_ARCHIVE_BLOCK_SESSIONS", "500"))
+# Decompressed blocks kept per worker (exports read the sessions of a block together)
+TRANSCRIPT_ARCHIVE_CACHED_BLOCKS = int(os.getenv("TRANSCRIPT_ARCHIVE_CACHED_BLOCKS", "8"))
+
+ArchivedMessage = Dict[str, Any]  # {"id", "role", "content", "timestamp"}
+
+
+class TranscriptArchive:
+    """Immutable gzipped NDJSON blocks, one line per session with all its messages.
+
+    Blocks are grouped per chatbot and per month the sessions started in:
+    <root>/<chatbot_id>/<YYYY-MM>/<block>.ndjson.gz
+    """
+
+    def __init__(self, root: str = TRANSCRIPT_ARCHIVE_DIR, cached_blocks: int = TRANSCRIPT_ARCHIVE_CACHED_BLOCKS):
+        self.root = Path(root)
+        self.cached_blocks = cached_blocks
+        self._blocks: "OrderedDict[str, Dict[str, List[ArchivedMessage]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def write_block(self, chatbot_id: str, month: str, sessions: Iterable[Tuple[str, List[ArchivedMessage]]]) -> Tuple[str, int, int]:
+        """Write a new block; returns (relative path, uncompressed bytes, stored bytes)"""
+        relative = f"{chatbot_id}/{month}/{uuid.uuid4().hex}.ndjson.gz"
+        path = self.root / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_name(path.name + ".tmp")
+        raw_bytes = 0
+        # Cold data is written once, so spend CPU on the best ratio
+        with gzip.open(temporary, "wb", compresslevel=9) as f:
+            for session_id, messages in sessions:
+                line = json.dumps({"session_id": session_id, "messages": messages}, ensure_ascii=False).encode() + b"\n"
+                raw_bytes += len(line)
+                f.write(line)
+        with open(temporary, "rb") as f:
+            os.fsync(f.fileno())
+        os.replace(temporary, path)
+        return relative, raw_bytes, path.stat().st_size
+
+    def read_block(self, relative: str) -> Dict[str, List[ArchivedMessage]]:
+        with self._lock:
+            if relative in self._blocks:
+                self._blocks.move_to_end(relative)
+                return self._blocks[relative]
+        sessions = {}
+        with gzip.open(self.root / relative, "rt", encoding="utf-8") as f:
+            for line in f:
+                entry = json.loads(line)
+                sessions[entry["session_id"]] = entry["messages"]
+        with self._lock:
+            self._blocks[relative] = sessions
+            while len(self._blocks) > self.cached_blocks:
+                self._blocks.popitem(last=False)
+        return sessions
+
+    def delete_block(self, relative: str) -> int:
+        """Remove a block file; returns the bytes freed"""
+        with self._lock:
+            self._blocks.pop(relative, None)
+        path = self.root / relative
+        try:
+            size = path.stat().st_size
+            path.unlink()
+        except FileNotFoundError:
+            return 0
+        return size
+
+
+transcript_archive = TranscriptArchive()
+
+
+def load_archived_messages(db: Session, session_ids: List[str],
+                           archive: TranscriptArchive = transcript_archive) -> Dict[str, List[ArchivedMessage]]:
+    """Archived messages of those sessions that have any, keyed by session id"""
+    if not session_ids:
+        return {}
+    rows = db.execute(
+        select(models.ArchivedSession.session_id, models.TranscriptArchiveBlock.path).join(
+            models.TranscriptArchiveBlock, models.TranscriptArchiveBlock.id == models.ArchivedSession.block_id
+        ).where(models.ArchivedSession.session_id.in_(session_ids))
+    ).all()
+    return {row.session_id: archive.read_block(row.path).get(row.session_id, []) for row in rows}
+
+
+def _archivable_sessions(db: Session, older_than: datetime, limit: int) -> list:
+    """Closed sessions with an insight, idle since before `older_than`, not yet archived"""
+    return db.execute(
+        select(models.ChatSession.id, models.ChatSession.chatbot_id, models.ChatSession.started_at).join(
+            models.Insight, models.Insight.session_id == models.ChatSession.id
+        ).outerjoin(
+            models.ArchivedSession, models.ArchivedSession.session_id == models.ChatSession.id
+        ).where(
+            models.ChatSession.is_active == False,
+            models.ChatSession.last_activity < older_than,
+            models.ArchivedSession.session_id.is_(None)
+        ).limit(limit)
+    ).all()
+
+
+def _archive_group(db: Session, archive: TranscriptArchive, chatbot_id: str, month: str, session_ids: List[str]) -> Dict[str, int]:
+    messages: Dict[str, List[ArchivedMessage]] = defaultdict(list)
+    max_message_id = 0
+    rows = db.execute(
+        select(models.ChatMessage.id, models.ChatMessage.session_id, models.ChatMessage.role,
+               models.ChatMessage.content, models.ChatMessage.timestamp).where(
+            models.ChatMessage.session_id.in_(session_ids)
+        ).order_by(models.ChatMessage.session_id, models.ChatMessage.timestamp, models.ChatMessage.id)
+    )
+    for row in rows:
+        messages[row.session_id].append({
+            "id": row.id,
+            "role": row.role,
+            "content": row.content,
+            "timestamp": row.timestamp.isoformat() if row.timestamp else None,
+        })
+        max_message_id = max(max_message_id, row.id)
+
+    path, raw_bytes, stored_bytes = archive.write_block(chatbot_id, month, ((sid, messages[sid]) for sid in session_ids))
+    message_count = sum(len(m) for m in messages.values())
+    try:
+        # The block file exists first; the rows pointing at it and the deletes commit together
+        block = models.TranscriptArchiveBlock(
+            chatbot_id=chatbot_id, month=month, path=path, session_count=len(session_ids),
+            message_count=message_count, raw_bytes=raw_bytes, stored_bytes=stored_bytes
+        )
+        db.add(block)
+        db.flush()
+        db.add_all([
+            models.ArchivedSession(session_id=sid, block_id=block.id, message_count=len(messages[sid]))
+            for sid in session_ids
+        ])
+        # Bounded by the last archived id so a message written meanwhile stays in the hot table
+        db.execute(delete(models.ChatMessage).where(
+            models.ChatMessage.session_id.in_(session_ids), models.ChatMessage.id <= max_message_id
+        ))
+        db.commit()
+    except Exception:
+        db.rollback()
+        archive.delete_block(path)
+        raise
+    return {"messages": message_count, "raw_bytes": raw_bytes, "stored_bytes": stored_bytes}
+
+
+def archive_transcripts(
+    db: Session,
+    older_than_days: int = TRANSCRIPT_ARCHIVE_AFTER_DAYS,
+    block_sessions: int = TRANSCRIPT_ARCHIVE_BLOCK_SESSIONS,
+    max_sessions: Optional[int] = None,
+    archive: TranscriptArchive = transcript_archive
+) -> Dict[str, int]:
+    """Move the messages of old closed, analyzed sessions into archive blocks"""
+    older_than = datetime.utcnow() - timedelta(days=older_than_days)
+    report = {"sessions": 0, "messages": 0, "blocks": 0, "raw_bytes": 0, "stored_bytes": 0}
+    while max_sessions is None or report["sessions"] < max_sessions:
+        limit = block_sessions * 10 if max_sessions is None else min(block_sessions * 10, max_sessions - report["sessions"])
+        candidates = _archivable_sessions(db, older_than, limit)
+        db.rollback()  # end the read before the slow block writes
+        if not candidates:
+            break
+        groups: Dict[Tuple[str, str], List[str]] = defaultdict(list)
+        for session_id, chatbot_id, started_at in candidates:
+            groups[(chatbot_id, (started_at or older_than).strftime("%Y-%m"))].append(session_id)
+        for (chatbot_id, month), session_ids in groups.items():
+            for start in range(0, len(session_ids), block_sessions):
+                chunk = session_ids[start:start + block_sessions]
+                written = _archive_group(db, archive, chatbot_id, month, chunk)
+                report["sessions"] += len(chunk)
+                report["blocks"] += 1
+                for key in ("messages", "raw_bytes", "stored_bytes"):
+                    report[key] += written[key]
+                logger.info("Archived %d sessions of %s from %s", len(chunk), chatbot_id, month)
+    return report
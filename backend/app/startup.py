@@ -0,0 +1,67 @@
+import logging
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class StartupTracker:
+    """Records how long each startup phase took and whether the worker is warmed up"""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.current_phase: Optional[str] = None
+        self.failed_phase: Optional[str] = None
+        self.ready = False
+        self.warmed_up = False
+        self.warmup_failures = 0
+        self.error: Optional[str] = None
+
+    def record(self, name: str, seconds: float) -> None:
+        self.phases[name] = round(seconds, 4)
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time a startup phase"""
+        self.current_phase = name
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.failed_phase = name
+            raise
+        finally:
+            self.record(name, time.perf_counter() - start)
+            self.current_phase = None
+
+    def mark_ready(self, warmed_up: bool = True) -> None:
+        """Report ready; `warmed_up` is False when the first requests will pay the load cost"""
+        self.ready = True
+        self.warmed_up = warmed_up
+        if warmed_up:
+            self.failed_phase = None
+            self.error = None
+        self.record("total", time.perf_counter() - self.started_at)
+        logger.info("Worker ready (warmed up: %s), startup breakdown: %s", warmed_up, self.phases)
+
+    def mark_failed(self, error: Exception) -> None:
+        self.warmup_failures += 1
+        self.error = str(error)
+        logger.error("Startup warm-up failed during %s: %s", self.failed_phase, self.error)
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "warmed_up": self.warmed_up,
+            "warmup_failures": self.warmup_failures,
+            "current_phase": self.current_phase,
+            "failed_phase": self.failed_phase,
+            "error": self.error,
+            "phases": dict(self.phases),
+        }
+
+
+# Created when app.main starts importing, so the "import" phase covers module load
+startup_tracker = StartupTracker()
@@ -4,6 +4,9 @@ from pathlib import Path
 from fastapi import UploadFile
 import shutil
 import aiofiles
+import logging
+
+logger = logging.getLogger(__name__)
 
 async def save_uploaded_file(file: UploadFile, directory: Path) -> Path:
     """Save an uploaded file to the specified directory"""
@@ -25,7 +28,7 @@ async def save_uploaded_file(file: UploadFile, directory: Path) -> Path:
         return file_path
     
     except Exception as e:
-        print(f"Error saving file {file.filename}: {str(e)}")
+        logger.error("Error saving file %s: %s", file.filename, e)
         raise
     finally:
         await file.close()  # Ensure file is closed
@@ -0,0 +1,156 @@
+"""Ingestion throughput benchmark for VectorStore.add_documents.
+
+Generates PDF corpora over a grid of file count, pages per file and words per
+page, ingests each with every chunk size and embedding batch size given, and
+reports parse, split, embed and upsert time separately plus peak RSS:
+
+    python -m benchmarks.bench_ingest --files 1,10 --pages 5,50 --words-per-page 200,600 \
+        --chunk-sizes 500,1000 --batch-sizes 32,128 --output ingest.json
+
+Every scenario runs in a fresh process against a temporary Chroma directory,
+so peak RSS is per scenario and runs don't share caches. The embedding model
+and the PDF parser are loaded before timing starts; their load time is
+reported separately.
+"""
+import argparse
+import itertools
+import json
+import platform
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .corpus import generate_corpus
+
+STAGES = ("ingest_parse", "ingest_split", "ingest_embed", "ingest_upsert")
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_scenario(scenario: Dict[str, int]) -> Dict[str, object]:
+    """Ingest one generated corpus and return its timings; runs in a child process"""
+    from app.database.vector_store import VectorStore
+    from app.utils.metrics import collect_spans
+
+    with tempfile.TemporaryDirectory() as directory:
+        root = Path(directory)
+        paths = generate_corpus(
+            root / "corpus", scenario["files"], scenario["pages"], scenario["words_per_page"], scenario["seed"]
+        )
+        corpus_bytes = sum(path.stat().st_size for path in paths)
+
+        vector_store = VectorStore()
+        vector_store.db_path = root / "chroma"
+        started = time.perf_counter()
+        vector_store.warm_up()
+        # Import the lazily loaded parser and splitter so they aren't billed to the first file
+        vector_store.split_documents(paths[0], vector_store.load_document(str(paths[0])))
+        warmup_seconds = time.perf_counter() - started
+        rss_before_mb = _peak_rss_mb()
+
+        started = time.perf_counter()
+        with collect_spans() as spans:
+            vector_store.add_documents(
+                "benchmark",
+                [str(path) for path in paths],
+                chunk_size=scenario["chunk_size"],
+                chunk_overlap=scenario["chunk_overlap"],
+                batch_size=scenario["batch_size"],
+            )
+        total_seconds = time.perf_counter() - started
+        chunks = vector_store.get_collection("benchmark").count()
+
+    stages = {stage: 0.0 for stage in STAGES}
+    for stage, elapsed in spans:
+        if stage in stages:
+            stages[stage] += elapsed
+    return {
+        **scenario,
+        "corpus_bytes": corpus_bytes,
+        "chunks": chunks,
+        "total_seconds": round(total_seconds, 4),
+        "stage_seconds": {stage.replace("ingest_", ""): round(elapsed, 4) for stage, elapsed in stages.items()},
+        "pages_per_second": round(scenario["files"] * scenario["pages"] / total_seconds, 2),
+        "chunks_per_second": round(chunks / total_seconds, 2),
+        "warmup_seconds": round(warmup_seconds, 4),
+        "rss_before_mb": round(rss_before_mb, 1),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+    }
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+def build_scenarios(args) -> List[Dict[str, int]]:
+    scenarios = []
+    for files, pages, words, chunk_size, batch_size in itertools.product(
+        args.files, args.pages, args.words_per_page, args.chunk_sizes, args.batch_sizes
+    ):
+        for repeat in range(args.repeats):
+            scenarios.append({
+                "files": files,
+                "pages": pages,
+                "words_per_page": words,
+                "chunk_size": chunk_size,
+                "chunk_overlap": min(args.chunk_overlap, chunk_size // 2),
+                "batch_size": batch_size,
+                "seed": args.seed,
+                "repeat": repeat,
+            })
+    return scenarios
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--files", type=_int_list, default=[1, 5], help="Comma-separated file counts")
+    parser.add_argument("--pages", type=_int_list, default=[5, 20], help="Comma-separated pages per file")
+    parser.add_argument("--words-per-page", type=_int_list, default=[200, 600], help="Comma-separated text densities")
+    parser.add_argument("--chunk-sizes", type=_int_list, default=[1000], help="Comma-separated splitter chunk sizes")
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    parser.add_argument("--batch-sizes", type=_int_list, default=[64], help="Comma-separated embedding batch sizes")
+    parser.add_argument("--repeats", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON results to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    results = []
+    scenarios = build_scenarios(args)
+    for index, scenario in enumerate(scenarios, start=1):
+        # A fresh process per scenario keeps ru_maxrss and the embedding cache per scenario
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+            result = pool.submit(run_scenario, scenario).result()
+        results.append(result)
+        stages = ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in result["stage_seconds"].items())
+        print(
+            f"[{index}/{len(scenarios)}] files={result['files']} pages={result['pages']} "
+            f"words={result['words_per_page']} chunk={result['chunk_size']} batch={result['batch_size']}: "
+            f"{result['chunks']} chunks in {result['total_seconds']:.2f}s ({stages}), peak RSS {result['peak_rss_mb']:.0f} MB",
+            file=sys.stderr,
+        )
+
+    report = json.dumps({
+        "benchmark": "ingest",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "host": platform.node(),
+        "python": platform.python_version(),
+        "results": results,
+    }, indent=2)
+    if args.output:
+        Path(args.output).write_text(report)
+    else:
+        print(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
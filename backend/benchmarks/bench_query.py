@@ -0,0 +1,308 @@
+"""End-to-end load benchmark for POST /api/chatbots/{id}/query.
+
+Creates a synthetic chatbot from generated PDFs through /api/chatbots/create,
+then sends questions at a fixed concurrency and reports throughput and
+p50/p95/p99 latency per stage (from the Server-Timing header) and end to end.
+
+With --spawn the benchmark starts tools/mock_llm_server.py and the app itself
+on free ports, so LLM latency is controlled and no Groq quota is used:
+
+    python -m benchmarks.bench_query --spawn --requests 500 --concurrency 16 --save-baseline baseline.json
+    python -m benchmarks.bench_query --spawn --requests 500 --concurrency 16 --baseline baseline.json
+
+Exits with status 1 when any stage percentile regressed against the baseline
+by more than --tolerance.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+from .corpus import generate_corpus, make_questions
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def parse_server_timing(header: str) -> Dict[str, float]:
+    """{"retrieval": 12.3, ...} in milliseconds from a Server-Timing header"""
+    timings: Dict[str, float] = {}
+    for entry in header.split(","):
+        name, _, params = entry.strip().partition(";")
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "dur" and name:
+                try:
+                    timings[name] = timings.get(name, 0.0) + float(value)
+                except ValueError:
+                    pass
+    return timings
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_until_ready(url: str, process: subprocess.Popen, timeout: float = 120.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Process for {url} exited with status {process.returncode}")
+        try:
+            if httpx.get(url, timeout=2).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"{url} not ready after {timeout:.0f}s")
+
+
+@contextmanager
+def spawned_stack(args):
+    """Run the mock LLM server and the app as subprocesses for the duration of the benchmark.
+
+    The app runs in a temporary directory with its own database, so the bench
+    user, chatbot, collection and sessions never reach the real data/.
+    """
+    llm_port, app_port = _free_port(), _free_port()
+    workdir = tempfile.TemporaryDirectory(prefix="bench-")
+    env = dict(os.environ)
+    env.update({
+        "LLM_PROVIDER": "openai_compatible",
+        "LLM_BASE_URL": f"http://127.0.0.1:{llm_port}/v1",
+        "JWT_SECRET_KEY": env.get("JWT_SECRET_KEY", "benchmark-secret"),
+        "LOG_LEVEL": env.get("LOG_LEVEL", "WARNING"),
+    })
+    app_env = dict(env)
+    app_env.update({
+        "DATABASE_DIR": str(Path(workdir.name) / "data"),
+        "PYTHONPATH": os.pathsep.join(filter(None, [str(BACKEND_DIR), env.get("PYTHONPATH")])),
+    })
+    mock = subprocess.Popen(
+        [sys.executable, "-m", "tools.mock_llm_server", "--port", str(llm_port),
+         "--latency", args.llm_latency, "--median-ms", str(args.llm_median_ms),
+         "--tokens-per-second", str(args.llm_tokens_per_second)],
+        cwd=BACKEND_DIR, env=env,
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(app_port), "--log-level", "warning"],
+        cwd=workdir.name, env=app_env, stdout=subprocess.DEVNULL,
+    )
+    try:
+        _wait_until_ready(f"http://127.0.0.1:{llm_port}/admin/config", mock)
+        base_url = f"http://127.0.0.1:{app_port}"
+        _wait_until_ready(f"{base_url}/readyz", server)
+        yield base_url
+    finally:
+        for process in (server, mock):
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+        workdir.cleanup()
+
+
+async def create_benchmark_chatbot(client: httpx.AsyncClient, args) -> str:
+    """Register a throwaway user and create a chatbot from a generated corpus"""
+    email = f"bench-{uuid.uuid4().hex[:12]}@example.com"
+    password = uuid.uuid4().hex
+    response = await client.post("/api/users/register", json={"email": email, "password": password})
+    response.raise_for_status()
+    response = await client.post("/api/token", data={"username": email, "password": password})
+    response.raise_for_status()
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = generate_corpus(Path(directory), args.files, args.pages, args.words_per_page, args.seed)
+        files = [("files", (path.name, path.read_bytes(), "application/pdf")) for path in paths]
+        started = time.monotonic()
+        response = await client.post(
+            "/api/chatbots/create",
+            headers=headers,
+            data={
+                "business_name": "Benchmark Store",
+                "business_type": "retail",
+                "chatbot_name": "Benchmark Bot",
+                "chatbot_type": "customer_support",
+            },
+            files=files,
+        )
+        response.raise_for_status()
+    chatbot_id = response.json()["id"]
+
+    async with client.stream("GET", "/api/chatbots/progress", params={"id": chatbot_id}, timeout=None) as events:
+        async for line in events.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            progress = json.loads(line[len("data:"):])
+            if progress["stage"] == "error":
+                raise RuntimeError(f"Ingestion failed: {progress['message']}")
+            if progress["stage"] == "complete":
+                break
+    print(f"Created chatbot {chatbot_id} in {time.monotonic() - started:.1f}s", file=sys.stderr)
+    return chatbot_id
+
+
+async def run_load(client: httpx.AsyncClient, chatbot_id: str, questions: List[str], concurrency: int):
+    """Send every question with at most `concurrency` in flight; return samples and wall time"""
+    samples: List[Dict[str, float]] = []
+    errors: Dict[str, int] = {}
+    pending = iter(questions)
+
+    async def worker():
+        for question in pending:
+            started = time.perf_counter()
+            try:
+                response = await client.post(f"/api/chatbots/{chatbot_id}/query", json={"query": question})
+            except httpx.HTTPError as e:
+                errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+                continue
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            if response.status_code != 200:
+                errors[str(response.status_code)] = errors.get(str(response.status_code), 0) + 1
+                continue
+            sample = parse_server_timing(response.headers.get("server-timing", ""))
+            sample["client"] = elapsed_ms
+            samples.append(sample)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return samples, errors, time.perf_counter() - started
+
+
+def summarize(samples: List[Dict[str, float]]) -> Dict[str, Dict[str, float]]:
+    stages = sorted({stage for sample in samples for stage in sample})
+    summary = {}
+    for stage in stages:
+        values = [sample[stage] for sample in samples if stage in sample]
+        summary[stage] = {f"p{pct}": round(percentile(values, pct), 2) for pct in PERCENTILES}
+        summary[stage]["count"] = len(values)
+    return summary
+
+
+def compare(result: dict, baseline: dict, tolerance: float, min_delta_ms: float) -> List[str]:
+    """Regressions of any stage percentile or of throughput beyond the tolerance"""
+    regressions = []
+    for stage, current in result["stages"].items():
+        previous = baseline.get("stages", {}).get(stage)
+        if not previous:
+            continue
+        for pct in PERCENTILES:
+            key = f"p{pct}"
+            before, after = previous.get(key), current.get(key)
+            if before is None or after is None:
+                continue
+            if after > before * (1 + tolerance) and after - before > min_delta_ms:
+                regressions.append(f"{stage} {key}: {before:.1f}ms -> {after:.1f}ms (+{(after / before - 1) * 100 if before else 0:.0f}%)")
+    before, after = baseline.get("throughput_rps"), result["throughput_rps"]
+    if before and after < before * (1 - tolerance):
+        regressions.append(f"throughput: {before:.1f} -> {after:.1f} req/s")
+    return regressions
+
+
+def print_report(result: dict) -> None:
+    print(f"\n{result['requests']} requests, concurrency {result['concurrency']}: "
+          f"{result['throughput_rps']:.1f} req/s, {result['errors_total']} errors {result['errors'] or ''}")
+    print(f"{'stage':<16}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'count':>8}")
+    for stage, values in result["stages"].items():
+        print(f"{stage:<16}{values['p50']:>10.1f}{values['p95']:>10.1f}{values['p99']:>10.1f}{values['count']:>8}")
+
+
+async def benchmark(base_url: str, args) -> dict:
+    limits = httpx.Limits(max_connections=args.concurrency + 2, max_keepalive_connections=args.concurrency + 2)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+        chatbot_id = args.chatbot_id or await create_benchmark_chatbot(client, args)
+        if args.warmup:
+            await run_load(client, chatbot_id, make_questions(args.warmup, args.seed + 1), args.concurrency)
+        samples, errors, wall = await run_load(client, chatbot_id, make_questions(args.requests, args.seed), args.concurrency)
+
+    return {
+        "benchmark": "query",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "host": platform.node(),
+        "python": platform.python_version(),
+        "config": {
+            "files": args.files, "pages": args.pages, "words_per_page": args.words_per_page, "seed": args.seed,
+            "llm_latency": args.llm_latency, "llm_median_ms": args.llm_median_ms,
+        },
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "errors_total": sum(errors.values()),
+        "errors": errors,
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(len(samples) / wall, 2) if wall else 0.0,
+        "stages": summarize(samples),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--base-url", default="http://localhost:8000", help="Running app to benchmark (ignored with --spawn)")
+    parser.add_argument("--spawn", action="store_true", help="Start the mock LLM server and the app as subprocesses")
+    parser.add_argument("--chatbot-id", help="Query an existing chatbot instead of creating one")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=20, help="Unmeasured requests sent first")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--files", type=int, default=3)
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument("--words-per-page", type=int, default=400)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--llm-latency", choices=["fixed", "uniform", "lognormal"], default="lognormal")
+    parser.add_argument("--llm-median-ms", type=float, default=600.0)
+    parser.add_argument("--llm-tokens-per-second", type=float, default=250.0)
+    parser.add_argument("--output", help="Write the result JSON to this file")
+    parser.add_argument("--baseline", help="Compare against a result JSON saved earlier")
+    parser.add_argument("--save-baseline", help="Write the result JSON here to compare future runs against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative slowdown per percentile")
+    parser.add_argument("--min-delta-ms", type=float, default=5.0, help="Ignore slowdowns smaller than this")
+    args = parser.parse_args(argv)
+
+    if args.spawn:
+        with spawned_stack(args) as base_url:
+            result = asyncio.run(benchmark(base_url, args))
+    else:
+        result = asyncio.run(benchmark(args.base_url, args))
+
+    print_report(result)
+    for path in filter(None, (args.output, args.save_baseline)):
+        Path(path).write_text(json.dumps(result, indent=2))
+
+    if args.baseline:
+        regressions = compare(result, json.loads(Path(args.baseline).read_text()), args.tolerance, args.min_delta_ms)
+        if regressions:
+            print("\nRegressions against baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print("\nNo regressions against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+"""Deterministic synthetic document corpora for the benchmarks.
+
+Writes plain PDFs (Helvetica text, one content stream per page) without any
+third-party dependency, so the same seed always yields byte-identical files
+that PyPDFLoader can parse like customer uploads.
+"""
+import random
+from pathlib import Path
+from typing import List
+
+TOPICS = [
+    "shipping", "returns", "refunds", "pricing", "subscriptions", "accounts", "passwords",
+    "warranty", "installation", "support hours", "payments", "invoices", "discounts",
+    "delivery times", "order tracking", "gift cards", "privacy", "data export",
+]
+SUBJECTS = ["Customers", "Members", "Business accounts", "New users", "Premium plans", "Orders"]
+VERBS = ["can request", "are eligible for", "receive", "may change", "should contact us about", "get"]
+DETAILS = [
+    "within 30 days of purchase", "at no extra cost", "through the account settings page",
+    "by emailing the support team", "once the order has shipped", "on business days only",
+    "after verifying their identity", "for all items except clearance products",
+    "using any major credit card", "in most countries we ship to",
+]
+QUESTION_TEMPLATES = [
+    "What should I know about {topic}?",
+    "What is your policy on {topic}?",
+    "Can you tell me about {topic}?",
+    "Who do I contact about {topic}?",
+    "Is there a fee for {topic}?",
+]
+
+PAGE_WIDTH = 612
+PAGE_HEIGHT = 792
+FONT_SIZE = 10
+LEADING = 12
+MARGIN = 50
+CHARS_PER_LINE = 95
+
+
+def make_sentence(rng: random.Random) -> str:
+    topic = rng.choice(TOPICS)
+    return f"{rng.choice(SUBJECTS)} {rng.choice(VERBS)} {topic} {rng.choice(DETAILS)}."
+
+
+def make_questions(count: int, seed: int = 0) -> List[str]:
+    """Questions about the corpus topics, so retrieval finds matching chunks"""
+    rng = random.Random(seed)
+    return [rng.choice(QUESTION_TEMPLATES).format(topic=rng.choice(TOPICS)) for _ in range(count)]
+
+
+def _wrap(text: str, width: int) -> List[str]:
+    lines, current = [], ""
+    for word in text.split():
+        if current and len(current) + 1 + len(word) > width:
+            lines.append(current)
+            current = word
+        else:
+            current = f"{current} {word}" if current else word
+    if current:
+        lines.append(current)
+    return lines
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def page_lines(rng: random.Random, words_per_page: int) -> List[str]:
+    """Paragraphs of generated sentences, wrapped to fit one page"""
+    max_lines = (PAGE_HEIGHT - 2 * MARGIN) // LEADING
+    sentences, words = [], 0
+    while words < words_per_page:
+        sentence = make_sentence(rng)
+        sentences.append(sentence)
+        words += len(sentence.split())
+    lines = []
+    for start in range(0, len(sentences), 5):
+        lines.extend(_wrap(" ".join(sentences[start:start + 5]), CHARS_PER_LINE))
+        lines.append("")
+    return lines[:max_lines]
+
+
+def build_pdf(pages: List[List[str]]) -> bytes:
+    """Serialize pages of text lines into a minimal PDF document"""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once the page object numbers are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_refs = []
+    for lines in pages:
+        text = [f"BT /F1 {FONT_SIZE} Tf {LEADING} TL {MARGIN} {PAGE_HEIGHT - MARGIN} Td"]
+        text.extend(f"({_escape(line)}) Tj T*" for line in lines)
+        text.append("ET")
+        stream = "\n".join(text).encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_ref = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>"
+            % (PAGE_WIDTH, PAGE_HEIGHT, content_ref)
+        )
+        page_refs.append(len(objects))
+    kids = " ".join(f"{ref} 0 R" for ref in page_refs).encode()
+    objects[1] = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % len(page_refs)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref_offset = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+    return bytes(out)
+
+
+def generate_corpus(
+    directory: Path,
+    files: int = 3,
+    pages_per_file: int = 5,
+    words_per_page: int = 400,
+    seed: int = 0,
+) -> List[Path]:
+    """Write `files` PDFs into `directory` and return their paths"""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    paths = []
+    for index in range(files):
+        pages = [page_lines(rng, words_per_page) for _ in range(pages_per_file)]
+        path = directory / f"doc_{seed}_{index:03d}.pdf"
+        path.write_bytes(build_pdf(pages))
+        paths.append(path)
+    return paths
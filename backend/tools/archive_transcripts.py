@@ -0,0 +1,66 @@
+"""Move old chat transcripts out of chat_messages into compressed archive blocks.
+
+Messages of sessions that are closed, have an insight and have been idle for
+longer than --older-than-days are written to gzipped blocks per chatbot and per
+month under TRANSCRIPT_ARCHIVE_DIR, then deleted from chat_messages in the same
+transaction that records where they went. get_session_messages and transcript
+exports read archived sessions transparently. Run periodically (e.g. nightly)
+from the backend directory:
+
+    python -m tools.archive_transcripts
+    python -m tools.archive_transcripts --older-than-days 365 --max-sessions 10000
+
+Deleted rows leave free pages in the SQLite file; --vacuum rewrites the file to
+return them to the filesystem. VACUUM locks the database while it runs, so use
+it off-peak.
+"""
+import argparse
+import json
+import sys
+import time
+from typing import List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.db_session import SessionLocal, engine
+from app.migrations import run_migrations
+from app.services.transcript_archive import (
+    archive_transcripts, TRANSCRIPT_ARCHIVE_AFTER_DAYS, TRANSCRIPT_ARCHIVE_BLOCK_SESSIONS
+)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--older-than-days", type=int, default=TRANSCRIPT_ARCHIVE_AFTER_DAYS,
+                        help="Archive sessions idle for longer than this")
+    parser.add_argument("--block-sessions", type=int, default=TRANSCRIPT_ARCHIVE_BLOCK_SESSIONS,
+                        help="Sessions per archive block")
+    parser.add_argument("--max-sessions", type=int, help="Stop after archiving this many sessions")
+    parser.add_argument("--vacuum", action="store_true", help="Reclaim the freed space afterwards")
+    args = parser.parse_args(argv)
+
+    run_migrations()
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        report = archive_transcripts(
+            db, older_than_days=args.older_than_days, block_sessions=args.block_sessions, max_sessions=args.max_sessions
+        )
+    finally:
+        db.close()
+    print(json.dumps(report), file=sys.stderr)
+
+    if args.vacuum and report["messages"]:
+        with engine.connect() as connection:
+            connection.exec_driver_sql("VACUUM")
+
+    ratio = report["raw_bytes"] / report["stored_bytes"] if report["stored_bytes"] else 0
+    print(f"Archived {report['messages']} messages from {report['sessions']} sessions into {report['blocks']} blocks "
+          f"({report['stored_bytes']} bytes, {ratio:.1f}x compression) in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+"""Register chatbots created before the chatbots table was used.
+
+Chatbots used to be recorded only in data/chatbots/<id>/metadata.json, and
+GET /api/chatbots scanned every one of those files. Listing now reads the
+chatbots table, so run this once after upgrading, from the backend directory:
+
+    python -m tools.backfill_chatbots
+    python -m tools.backfill_chatbots --dry-run
+
+It applies pending schema migrations, then upserts a row for every metadata
+file that names an owner, and gives insights on those chatbots their owner
+so they appear in GET /api/insights. Re-running it is harmless. --dry-run
+only reports pending migrations and what would be registered; it doesn't
+change the database.
+"""
+import argparse
+import json
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy.exc import OperationalError
+
+load_dotenv()
+
+from app import models, schemas
+from app.crud import upsert_db_chatbot
+from app.crud_sessions import fill_insight_owners
+from app.db_session import SessionLocal
+from app.migrations import pending_migrations, run_migrations
+
+def chatbot_from_metadata(chatbot_id: str, metadata: dict) -> Optional[schemas.ChatbotCreateDB]:
+    if metadata.get("user_id") is None:
+        return None
+    created_at = None
+    if metadata.get("created_at"):
+        try:
+            created_at = datetime.fromisoformat(metadata["created_at"])
+        except ValueError:
+            pass
+    return schemas.ChatbotCreateDB(
+        id=chatbot_id,
+        name=metadata.get("chatbot_name") or "Unnamed Chatbot",
+        user_id=metadata["user_id"],
+        business_name=metadata.get("business_name"),
+        business_type=metadata.get("business_type"),
+        chatbot_type=metadata.get("chatbot_type"),
+        icon_url=metadata.get("icon"),
+        created_at=created_at,
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--chatbots-dir", default="data/chatbots")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would be registered")
+    args = parser.parse_args(argv)
+
+    if args.dry_run:
+        for description in pending_migrations():
+            print(f"Would apply migration: {description}", file=sys.stderr)
+    else:
+        # Adds the listing columns to a chatbots table created before them
+        run_migrations()
+
+    registered = refreshed = skipped = failed = owned_insights = 0
+    db = SessionLocal()
+    try:
+        try:
+            known = {row.id for row in db.query(models.Chatbot.id)}
+        except OperationalError:  # dry run on a database without the chatbots table yet
+            db.rollback()
+            known = set()
+        for metadata_path in sorted(Path(args.chatbots_dir).glob("*/metadata.json")):
+            chatbot_id = metadata_path.parent.name
+            try:
+                chatbot = chatbot_from_metadata(chatbot_id, json.loads(metadata_path.read_text()))
+            except (ValueError, OSError) as e:
+                print(f"{chatbot_id}: unreadable metadata ({e})", file=sys.stderr)
+                failed += 1
+                continue
+            if chatbot is None:
+                print(f"{chatbot_id}: no owner in metadata, skipped", file=sys.stderr)
+                skipped += 1
+                continue
+            if not args.dry_run:
+                upsert_db_chatbot(db, chatbot)
+            registered += 1
+            refreshed += chatbot_id in known
+        if not args.dry_run:
+            owned_insights = fill_insight_owners(db)
+    finally:
+        db.close()
+
+    print(f"{'Would register' if args.dry_run else 'Registered'} {registered} chatbots "
+          f"({refreshed} already in the table), {skipped} without an owner, {failed} unreadable; "
+          f"assigned {owned_insights} insights to their owners")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""Fail if a hot query's SQLite plan falls back to a full table scan.
+
+Runs the crud functions on the request path against a migrated database,
+captures the SQL they emit, and checks EXPLAIN QUERY PLAN for each. A plan
+step that SCANs a table (instead of SEARCHing an index) fails the check, so
+a dropped index or a query rewritten past its index shows up before it
+ships. Run from the backend directory, e.g. in CI:
+
+    python -m tools.check_query_plans            # scratch database built from the models
+    python -m tools.check_query_plans --database data/chatbotmaker.db
+"""
+import argparse
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, sessionmaker
+
+from app import crud, crud_sessions
+from app.migrations import run_migrations
+
+# (name, call) for each query on a hot path; calls take a Session. Startup and
+# batch-job queries (get_most_active_chatbots, FAQ mining) are deliberately not
+# indexed: last_activity changes on every message, so each extra index on it
+# costs a write per chat turn.
+HOT_QUERIES: List[Tuple[str, Callable[[Session], object]]] = [
+    ("get_user_by_email", lambda db: crud.get_user_by_email(db, "user@example.com")),
+    ("get_user_chatbots", lambda db: crud.get_user_chatbots(db, 1)),
+    ("get_chat_session", lambda db: crud_sessions.get_chat_session(db, "session")),
+    ("get_active_session_by_user", lambda db: crud_sessions.get_active_session_by_user(db, "chatbot", "visitor")),
+    ("touch_active_session", lambda db: crud_sessions.touch_active_session(db, "session")),
+    ("get_inactive_sessions", lambda db: crud_sessions.get_inactive_sessions(db)),
+    ("get_session_messages", lambda db: crud_sessions.get_session_messages(db, "session")),
+    ("get_user_questions", lambda db: crud_sessions.get_user_questions(db, "chatbot")),
+    ("get_faq_entries", lambda db: crud_sessions.get_faq_entries(db, "chatbot")),
+    ("get_user_chatbot", lambda db: crud.get_user_chatbot(db, 1, "chatbot")),
+    ("get_insights_page", lambda db: crud_sessions.get_insights_page(db, 1, after=(datetime.now(), 1))),
+    ("get_insights_page(chatbot)", lambda db: crud_sessions.get_insights_page(
+        db, 1, after=(datetime.now(), 1), chatbot_id="chatbot", bot_solved=False)),
+    ("get_insight_export_rows", lambda db: crud_sessions.get_insight_export_rows(db, 1, 1000, after=(datetime.now(), 1))),
+    ("get_transcript_session_keys", lambda db: crud_sessions.get_transcript_session_keys(
+        db, "chatbot", 100, after=(datetime.now(), "session"))),
+    ("get_transcript_rows", lambda db: crud_sessions.get_transcript_rows(db, ["session-1", "session-2"])),
+    ("get_insight_rollups", lambda db: crud_sessions.get_insight_rollups(db, 1, "2024-01-01", "2024-01-31")),
+    ("get_insight_rollups(chatbot)", lambda db: crud_sessions.get_insight_rollups(
+        db, 1, "2024-01-01", "2024-01-31", chatbot_id="chatbot")),
+]
+
+
+def capture_statements(engine, call: Callable[[Session], object]) -> List[Tuple[str, tuple]]:
+    statements: List[Tuple[str, tuple]] = []
+
+    def record(connection, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+            statements.append((statement, tuple(parameters or ())))
+
+    event.listen(engine, "before_cursor_execute", record)
+    db = sessionmaker(bind=engine)()
+    try:
+        call(db)
+    finally:
+        db.rollback()
+        db.close()
+        event.remove(engine, "before_cursor_execute", record)
+    return statements
+
+
+def table_scans(engine, statement: str, parameters: tuple) -> Tuple[List[str], List[str]]:
+    """(all plan steps, the steps that scan a whole table)"""
+    with engine.connect() as connection:
+        rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+    steps = [row[-1] for row in rows]
+    # "SCAN t USING COVERING INDEX ix" still reads every entry, so it counts too
+    return steps, [step for step in steps if step.startswith("SCAN ")]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--database", help="Check this SQLite file (migrated first) instead of a scratch one")
+    parser.add_argument("--verbose", action="store_true", help="Print every plan")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(args.database) if args.database else Path(directory) / "plans.db"
+        engine = create_engine(f"sqlite:///{path}")
+        version = run_migrations(engine)
+        print(f"Checking query plans on {path} (schema version {version}) at {datetime.now().isoformat(timespec='seconds')}")
+
+        failures = 0
+        for name, call in HOT_QUERIES:
+            for statement, parameters in capture_statements(engine, call):
+                steps, scans = table_scans(engine, statement, parameters)
+                status = "FAIL" if scans else "ok"
+                failures += bool(scans)
+                print(f"{status:4} {name}: {'; '.join(scans) if scans else steps[0] if steps else 'no plan'}")
+                if args.verbose or scans:
+                    print("       " + " ".join(statement.split()))
+                    for step in steps:
+                        print(f"       - {step}")
+        engine.dispose()
+
+    if failures:
+        print(f"{failures} hot queries scan a whole table", file=sys.stderr)
+        return 1
+    print("All hot queries use an index")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+"""Purge deleted chatbots and report (or remove) orphaned data.
+
+Does one pass of the collector that API workers run every GC_INTERVAL_SECONDS:
+the collections, files, archive blocks and database rows of chatbots deleted
+through DELETE /api/chatbots/{id} are removed in small batches. It also
+reports orphans: chatbot directories without metadata or registry row,
+collections and conversations of chatbots that no longer exist. Run from the
+backend directory:
+
+    python -m tools.collect_garbage                    # purge deletions, list orphans
+    python -m tools.collect_garbage --delete-orphans   # also remove the orphans
+
+Chatbots whose directory has metadata.json but no registry row are listed as
+unregistered and never removed; register them with tools.backfill_chatbots.
+"""
+import argparse
+import json
+import sys
+from typing import List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.database.vector_store import VectorStore
+from app.db_session import SessionLocal
+from app.migrations import run_migrations
+from app.services.garbage_collector import garbage_collector
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--delete-orphans", action="store_true", help="Remove the orphans found")
+    args = parser.parse_args(argv)
+
+    run_migrations()
+    db = SessionLocal()
+    try:
+        # One-shot run: orphans found now are removed now, there is no earlier sighting to age from
+        report = garbage_collector.collect(db, VectorStore(), delete_orphans=args.delete_orphans, grace_seconds=0)
+    finally:
+        db.close()
+    if report.get("skipped"):
+        print("Garbage collection is already running in another process", file=sys.stderr)
+        return 1
+    print(json.dumps(report, indent=2))
+    orphans = sum(len(names) for names in report["orphans"].values())
+    print(f"Purged {report['purged_chatbots']} deleted chatbots ({report['rows']} rows), "
+          f"reclaimed {report['reclaimed_bytes']} bytes; {orphans} orphans found, {report['orphans_removed']} removed; "
+          f"{report['database_free_bytes']} bytes free in the database file", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""Mine frequent questions from chat history and precompute their answers.
+
+For each chatbot, clusters the user questions recorded in chat_messages by
+embedding similarity, generates one answer per top cluster through the same
+retrieval + prompt + LLM path as live queries, and stores them in faq_entries.
+query_chatbot serves these answers for matching questions without calling the
+LLM. Run periodically (e.g. nightly) from the backend directory:
+
+    python -m tools.mine_faqs --all
+    python -m tools.mine_faqs <chatbot_id> --top-n 50 --min-cluster-size 3
+
+After a chatbot's knowledge base changes its stored answers stop being served;
+--refresh-only regenerates just those answers without re-clustering.
+"""
+import argparse
+import asyncio
+import json
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.database.vector_store import VectorStore
+from app.db_session import SessionLocal
+from app.migrations import run_migrations
+from app.crud_sessions import get_chatbots_with_messages
+from app.services.faq import mine_faqs, refresh_stale_answers
+from app.services.llm_providers import get_llm_provider, CHAT
+from app.services.llm_scheduler import BACKGROUND
+from app.services.prompts import build_conversation
+
+
+def answerer(vector_store: VectorStore, provider, chatbot_id: str, metadata: dict):
+    async def answer(question: str) -> str:
+        results = await asyncio.to_thread(vector_store.query_collection, chatbot_id, question)
+        context = "\n\n".join(result["text"] for result in results)
+        return await provider.complete(
+            build_conversation(metadata, context, question),
+            purpose=CHAT,
+            temperature=0.3,
+            max_tokens=1000,
+            priority=BACKGROUND,
+            tenant=chatbot_id
+        )
+    return answer
+
+
+async def run(chatbot_ids: List[str], args) -> List[dict]:
+    vector_store = VectorStore()
+    provider = get_llm_provider()
+    reports = []
+    db = SessionLocal()
+    try:
+        for chatbot_id in chatbot_ids:
+            metadata_path = Path(f"data/chatbots/{chatbot_id}/metadata.json")
+            if not metadata_path.exists():
+                print(f"Skipping {chatbot_id}: no metadata", file=sys.stderr)
+                continue
+            metadata = json.loads(metadata_path.read_text())
+            kb_version = metadata.get("kb_version", 0)
+            answer = answerer(vector_store, provider, chatbot_id, metadata)
+
+            if args.refresh_only:
+                refreshed = await refresh_stale_answers(db, chatbot_id, kb_version, answer)
+                report = {"chatbot_id": chatbot_id, "refreshed": refreshed}
+            else:
+                report = await mine_faqs(
+                    db,
+                    chatbot_id,
+                    kb_version,
+                    answer,
+                    vector_store.embedding_function,
+                    top_n=args.top_n,
+                    min_cluster_size=args.min_cluster_size,
+                    similarity=args.similarity,
+                    since_days=args.since_days,
+                )
+            reports.append(report)
+            print(json.dumps(report), file=sys.stderr)
+    finally:
+        db.close()
+        await provider.aclose()
+    return reports
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("chatbot_ids", nargs="*")
+    parser.add_argument("--all", action="store_true", help="Every chatbot with user messages in the window")
+    parser.add_argument("--top-n", type=int, default=30, help="Clusters to answer per chatbot")
+    parser.add_argument("--min-cluster-size", type=int, default=5, help="Times a question must be asked")
+    parser.add_argument("--similarity", type=float, default=0.85, help="Cosine similarity to join a cluster")
+    parser.add_argument("--since-days", type=int, default=90)
+    parser.add_argument("--refresh-only", action="store_true", help="Only regenerate answers from an older knowledge base")
+    args = parser.parse_args(argv)
+
+    run_migrations()
+    chatbot_ids = list(args.chatbot_ids)
+    if args.all:
+        db = SessionLocal()
+        try:
+            chatbot_ids.extend(get_chatbots_with_messages(db, args.since_days))
+        finally:
+            db.close()
+    if not chatbot_ids:
+        parser.error("give chatbot ids or --all")
+
+    reports = asyncio.run(run(list(dict.fromkeys(chatbot_ids)), args))
+    if not args.refresh_only:
+        questions = sum(report["questions"] for report in reports)
+        covered = sum(report["covered_questions"] for report in reports)
+        print(f"Precomputed answers cover {covered} of {questions} recorded questions "
+              f"({covered / questions:.1%})" if questions else "No recorded questions")
+        failed = sum(report["failed"] for report in reports)
+        if failed:
+            print(f"{failed} answers could not be generated; their previous entries were kept", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,238 @@
+"""Local OpenAI-compatible stand-in for the Groq API.
+
+Serves POST /v1/chat/completions (and /openai/v1/chat/completions, so it can
+replace the Groq base URL as-is) with configurable latency, streaming, error
+injection and 429 emulation, so the query and analysis paths can be load
+tested without network access.
+
+Run from the backend directory:
+
+    python -m tools.mock_llm_server --port 8001 --latency lognormal --median-ms 800
+
+and point the app at it:
+
+    LLM_PROVIDER=openai_compatible LLM_BASE_URL=http://localhost:8001/v1 uvicorn app.main:app
+
+The behaviour can be changed while it runs with POST /admin/config, e.g.
+{"error_rate": 0.2} to simulate an outage.
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+import uuid
+from typing import Any, Dict
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+DEFAULT_CONFIG: Dict[str, Any] = {
+    # Time to first token: "fixed", "uniform" (min_ms..max_ms) or "lognormal" (median_ms, sigma)
+    "latency": "lognormal",
+    "median_ms": 600.0,
+    "sigma": 0.4,
+    "min_ms": 200.0,
+    "max_ms": 1500.0,
+    # Generation speed applied to streamed and non-streamed responses
+    "tokens_per_second": 250.0,
+    # Fraction of requests that fail with a 500, or hang past the client timeout
+    "error_rate": 0.0,
+    "hang_rate": 0.0,
+    "hang_seconds": 60.0,
+    # 429 emulation: a fraction of requests at random, and/or a requests-per-minute quota
+    "rate_limit_rate": 0.0,
+    "requests_per_minute": 0,
+    "retry_after_seconds": 1.0,
+    # Words in each generated answer
+    "answer_words": 60,
+}
+
+config: Dict[str, Any] = dict(DEFAULT_CONFIG)
+stats = {"requests": 0, "errors": 0, "hangs": 0, "rate_limited": 0, "streams": 0}
+_window = {"started": time.monotonic(), "count": 0}
+
+app = FastAPI(title="Mock LLM server")
+
+WORDS = (
+    "our team can help with that the product supports this feature and you can find more "
+    "details in the documentation please let us know if you have any other questions about "
+    "orders shipping returns pricing accounts or setup"
+).split()
+
+
+def sample_latency() -> float:
+    kind = config["latency"]
+    if kind == "fixed":
+        millis = config["median_ms"]
+    elif kind == "uniform":
+        millis = random.uniform(config["min_ms"], config["max_ms"])
+    else:
+        millis = config["median_ms"] * math.exp(random.gauss(0, config["sigma"]))
+    return max(0.0, millis) / 1000.0
+
+
+def over_quota() -> bool:
+    limit = config["requests_per_minute"]
+    if not limit:
+        return False
+    now = time.monotonic()
+    if now - _window["started"] >= 60:
+        _window["started"] = now
+        _window["count"] = 0
+    _window["count"] += 1
+    return _window["count"] > limit
+
+
+def generate_answer(messages) -> str:
+    system_text = " ".join(m.get("content", "") for m in messages if m.get("role") == "system")
+    if "JSON" in system_text and "Problem Summary" in system_text:
+        # Conversation analyzer prompt
+        return json.dumps({
+            "Problem Summary": "Customer asked a question about the product",
+            "Bot Solved": random.random() < 0.7,
+            "Human Needed": random.random() < 0.2,
+            "Emotion": random.choice(["neutral", "curiosity", "gratitude", "confusion", "annoyance"]),
+        })
+    question = next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), "")
+    rng = random.Random(question)
+    words = [rng.choice(WORDS) for _ in range(int(config["answer_words"]))]
+    return f"Thanks for asking about \"{question[:80]}\". " + " ".join(words).capitalize() + "."
+
+
+def usage_for(messages, answer: str) -> Dict[str, int]:
+    prompt_tokens = sum(len(m.get("content", "")) for m in messages) // 4
+    completion_tokens = max(1, len(answer) // 4)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+
+def rate_limited_response() -> JSONResponse:
+    stats["rate_limited"] += 1
+    return JSONResponse(
+        status_code=429,
+        headers={"Retry-After": str(config["retry_after_seconds"])},
+        content={"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded"}},
+    )
+
+
+async def chat_completions(request: Request):
+    body = await request.json()
+    stats["requests"] += 1
+    messages = body.get("messages", [])
+    model = body.get("model", "mock-model")
+
+    if over_quota() or random.random() < config["rate_limit_rate"]:
+        return rate_limited_response()
+
+    await asyncio.sleep(sample_latency())
+
+    if random.random() < config["hang_rate"]:
+        stats["hangs"] += 1
+        await asyncio.sleep(config["hang_seconds"])
+    if random.random() < config["error_rate"]:
+        stats["errors"] += 1
+        return JSONResponse(status_code=500, content={"error": {"message": "Injected failure", "type": "server_error"}})
+
+    answer = generate_answer(messages)
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    seconds_per_token = 1.0 / config["tokens_per_second"] if config["tokens_per_second"] else 0.0
+
+    if body.get("stream"):
+        stats["streams"] += 1
+
+        async def event_stream():
+            tokens = answer.split(" ")
+            for index, token in enumerate(tokens):
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": token if index == 0 else " " + token}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+                if seconds_per_token:
+                    await asyncio.sleep(seconds_per_token)
+            final = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            }
+            yield f"data: {json.dumps(final)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+    usage = usage_for(messages, answer)
+    await asyncio.sleep(usage["completion_tokens"] * seconds_per_token)
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": answer}, "finish_reason": "stop"}],
+        "usage": usage,
+    }
+
+
+app.add_api_route("/v1/chat/completions", chat_completions, methods=["POST"])
+app.add_api_route("/openai/v1/chat/completions", chat_completions, methods=["POST"])
+
+
+@app.get("/admin/config")
+async def get_config():
+    return {"config": config, "stats": stats}
+
+
+@app.post("/admin/config")
+async def update_config(changes: Dict[str, Any]):
+    unknown = set(changes) - set(DEFAULT_CONFIG)
+    if unknown:
+        return JSONResponse(status_code=400, content={"detail": f"Unknown settings: {sorted(unknown)}"})
+    config.update(changes)
+    return {"config": config}
+
+
+@app.post("/admin/reset")
+async def reset():
+    config.clear()
+    config.update(DEFAULT_CONFIG)
+    for key in stats:
+        stats[key] = 0
+    return {"config": config}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", choices=["fixed", "uniform", "lognormal"], default=DEFAULT_CONFIG["latency"])
+    parser.add_argument("--median-ms", type=float, default=DEFAULT_CONFIG["median_ms"])
+    parser.add_argument("--sigma", type=float, default=DEFAULT_CONFIG["sigma"])
+    parser.add_argument("--min-ms", type=float, default=DEFAULT_CONFIG["min_ms"])
+    parser.add_argument("--max-ms", type=float, default=DEFAULT_CONFIG["max_ms"])
+    parser.add_argument("--tokens-per-second", type=float, default=DEFAULT_CONFIG["tokens_per_second"])
+    parser.add_argument("--error-rate", type=float, default=DEFAULT_CONFIG["error_rate"])
+    parser.add_argument("--hang-rate", type=float, default=DEFAULT_CONFIG["hang_rate"])
+    parser.add_argument("--rate-limit-rate", type=float, default=DEFAULT_CONFIG["rate_limit_rate"])
+    parser.add_argument("--requests-per-minute", type=int, default=DEFAULT_CONFIG["requests_per_minute"])
+    parser.add_argument("--retry-after-seconds", type=float, default=DEFAULT_CONFIG["retry_after_seconds"])
+    args = parser.parse_args()
+
+    for key in DEFAULT_CONFIG:
+        if hasattr(args, key):
+            config[key] = getattr(args, key)
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
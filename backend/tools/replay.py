@@ -0,0 +1,304 @@
+"""Replay recorded chat traffic against a candidate retrieval/answer configuration.
+
+Reads historical user turns from chat_messages and re-issues them, at their
+original pacing or faster, through two pipelines side by side:
+
+- baseline: the live collection with the production settings (n_results=5)
+- candidate: the settings given on the command line. A different chunking or
+  embedding model re-ingests the chatbot's files into a scratch store first.
+
+It reports retrieval (and, with --answer, LLM) latency distributions for both,
+the candidate's retrieval cache hit rate, and how much the candidate's
+retrieved chunks overlap the baseline's:
+
+    python -m tools.replay <chatbot_id> --speed 10 --n-results 3 --cache-size 256
+    python -m tools.replay <chatbot_id> --chunk-size 500 --chunk-overlap 100 --speed 0 --output replay.json
+
+--speed 1 keeps the recorded gaps between questions, 10 replays ten times
+faster, 0 sends them back to back (bounded by --concurrency).
+"""
+import argparse
+import asyncio
+import json
+import re
+import statistics
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.database.vector_store import VectorStore, CHUNK_SIZE, CHUNK_OVERLAP
+from app.services.prompts import build_conversation
+
+BASELINE_N_RESULTS = 5
+PERCENTILES = (50, 95, 99)
+
+
+def recorded_turns(chatbot_id: str, since: Optional[str], limit: int) -> List[Tuple[float, str]]:
+    """(unix timestamp, question) for a chatbot's user messages, oldest first"""
+    from datetime import datetime
+    from app.db_session import SessionLocal
+    from app import models
+
+    db = SessionLocal()
+    try:
+        query = (
+            db.query(models.ChatMessage.timestamp, models.ChatMessage.content)
+            .join(models.ChatSession, models.ChatSession.id == models.ChatMessage.session_id)
+            .filter(models.ChatSession.chatbot_id == chatbot_id, models.ChatMessage.role == "user")
+        )
+        if since:
+            query = query.filter(models.ChatMessage.timestamp >= datetime.fromisoformat(since))
+        rows = query.order_by(models.ChatMessage.timestamp, models.ChatMessage.id).limit(limit).all()
+    finally:
+        db.close()
+    return [(row.timestamp.timestamp() if row.timestamp else 0.0, row.content) for row in rows]
+
+
+def schedule(turns: List[Tuple[float, str]], speed: float, max_gap: float) -> List[Tuple[float, str]]:
+    """Offsets in seconds from the start of the replay, with idle gaps capped"""
+    offsets, elapsed, previous = [], 0.0, None
+    for timestamp, question in turns:
+        if previous is not None and speed > 0:
+            elapsed += min(max(0.0, timestamp - previous), max_gap) / speed
+        previous = timestamp
+        offsets.append((elapsed, question))
+    return offsets
+
+
+class RetrievalCache:
+    """LRU of retrieval results keyed by normalized question text"""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.entries: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(question: str) -> str:
+        return " ".join(re.findall(r"[a-z0-9]+", question.lower()))
+
+    def get(self, question: str) -> Optional[List[Dict[str, Any]]]:
+        key = self.key(question)
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, question: str, results: List[Dict[str, Any]]) -> None:
+        if self.size <= 0:
+            return
+        self.entries[self.key(question)] = results
+        self.entries.move_to_end(self.key(question))
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+
+class Pipeline:
+    """Retrieval plus optional LLM answer under one configuration"""
+
+    def __init__(self, name: str, vector_store: VectorStore, collection_name: str, metadata: Dict[str, Any],
+                 n_results: int, cache: Optional[RetrievalCache] = None):
+        self.name = name
+        self.vector_store = vector_store
+        self.collection_name = collection_name
+        self.metadata = metadata
+        self.n_results = n_results
+        self.cache = cache
+        self.retrieval_ms: List[float] = []
+        self.answer_ms: List[float] = []
+        self.errors = 0
+
+    def retrieve(self, question: str) -> List[Dict[str, Any]]:
+        started = time.perf_counter()
+        results = self.cache.get(question) if self.cache else None
+        if results is None:
+            results = self.vector_store.query_collection(self.collection_name, question, n_results=self.n_results)
+            if self.cache:
+                self.cache.put(question, results)
+        self.retrieval_ms.append((time.perf_counter() - started) * 1000)
+        return results
+
+    async def answer(self, provider, question: str, results: List[Dict[str, Any]]) -> None:
+        from app.services.llm_providers import CHAT
+
+        # Same prompt and sampling settings as complete_answer in app.main
+        context = "\n\n".join(result["text"] for result in results)
+        conversation = build_conversation(self.metadata, context, question)
+        started = time.perf_counter()
+        await provider.complete(conversation, purpose=CHAT, temperature=0.7, max_tokens=1000, tenant=self.collection_name)
+        self.answer_ms.append((time.perf_counter() - started) * 1000)
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    ordered = sorted(values)
+    summary = {f"p{pct}": round(ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))], 2) for pct in PERCENTILES}
+    summary["mean"] = round(statistics.fmean(ordered), 2)
+    summary["count"] = len(ordered)
+    return summary
+
+
+def _result_keys(results: List[Dict[str, Any]], by_location: bool) -> set:
+    """Chunk identity; (file, page) when the candidate re-chunked so ids don't line up"""
+    if by_location:
+        return {(Path(r["metadata"].get("source", "")).name, r["metadata"].get("page")) for r in results}
+    return {r["id"] for r in results}
+
+
+def build_candidate_store(chatbot_id: str, metadata: Dict[str, Any], args, directory: Path) -> VectorStore:
+    """Scratch store holding the chatbot's files ingested with the candidate chunking/embedding"""
+    file_paths = [entry["path"] for entry in metadata.get("files", [])]
+    if not file_paths:
+        raise SystemExit(f"No source files recorded for {chatbot_id}; cannot re-ingest")
+
+    vector_store = VectorStore()
+    vector_store.db_path = directory / "chroma"
+    vector_store.hnsw_params_path = directory / "hnsw_params.json"
+    if args.embedding_model:
+        from chromadb.utils import embedding_functions
+        vector_store._embedding_function = embedding_functions.SentenceTransformerEmbeddingFunction(
+            model_name=args.embedding_model
+        )
+    started = time.perf_counter()
+    vector_store.add_documents(
+        chatbot_id, file_paths,
+        chunk_size=args.chunk_size or CHUNK_SIZE,
+        chunk_overlap=args.chunk_overlap if args.chunk_overlap is not None else CHUNK_OVERLAP,
+    )
+    print(f"Re-ingested {len(file_paths)} files for the candidate in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    return vector_store
+
+
+async def replay(turns, baseline: Pipeline, candidate: Pipeline, args) -> List[float]:
+    provider = None
+    if args.answer:
+        from app.services.llm_providers import get_llm_provider
+        provider = get_llm_provider()
+
+    overlaps: List[float] = []
+    semaphore = asyncio.Semaphore(args.concurrency)
+    by_location = candidate.vector_store is not baseline.vector_store
+    started = time.monotonic()
+
+    async def issue(offset: float, question: str):
+        delay = offset - (time.monotonic() - started)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        async with semaphore:
+            try:
+                baseline_results = await asyncio.to_thread(baseline.retrieve, question)
+            except Exception:
+                baseline.errors += 1
+                baseline_results = None
+            try:
+                candidate_results = await asyncio.to_thread(candidate.retrieve, question)
+            except Exception:
+                candidate.errors += 1
+                candidate_results = None
+            if baseline_results and candidate_results is not None:
+                expected = _result_keys(baseline_results, by_location)
+                found = _result_keys(candidate_results, by_location)
+                # Relative to the smaller set, so a smaller n_results isn't counted as a miss
+                overlaps.append(len(expected & found) / max(1, min(len(expected), len(found))))
+            if provider is not None:
+                for pipeline, results in ((baseline, baseline_results), (candidate, candidate_results)):
+                    if results is None:
+                        continue
+                    try:
+                        await pipeline.answer(provider, question, results)
+                    except Exception:
+                        pipeline.errors += 1
+
+    await asyncio.gather(*(issue(offset, question) for offset, question in turns))
+    if provider is not None:
+        await provider.aclose()
+    return overlaps
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("chatbot_id")
+    parser.add_argument("--since", help="Only replay turns at or after this ISO timestamp")
+    parser.add_argument("--limit", type=int, default=1000)
+    parser.add_argument("--speed", type=float, default=1.0, help="Pacing multiplier; 0 = no pacing")
+    parser.add_argument("--max-gap", type=float, default=60.0, help="Cap on any recorded gap between turns, in seconds")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--n-results", type=int, default=BASELINE_N_RESULTS, help="Candidate chunks per query")
+    parser.add_argument("--chunk-size", type=int, help="Candidate splitter chunk size (re-ingests)")
+    parser.add_argument("--chunk-overlap", type=int, help="Candidate splitter overlap (re-ingests)")
+    parser.add_argument("--embedding-model", help="Candidate sentence-transformers model (re-ingests)")
+    parser.add_argument("--cache-size", type=int, default=0, help="Candidate retrieval cache entries; 0 disables")
+    parser.add_argument("--answer", action="store_true", help="Also time LLM answers via the configured provider")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    turns = schedule(recorded_turns(args.chatbot_id, args.since, args.limit), args.speed, args.max_gap)
+    if not turns:
+        print(f"No recorded user turns for {args.chatbot_id}", file=sys.stderr)
+        return 1
+    print(f"Replaying {len(turns)} turns over {turns[-1][0]:.1f}s", file=sys.stderr)
+
+    metadata_path = Path(f"data/chatbots/{args.chatbot_id}/metadata.json")
+    if not metadata_path.exists():
+        print(f"No metadata for {args.chatbot_id}", file=sys.stderr)
+        return 1
+    metadata = json.loads(metadata_path.read_text())
+
+    live_store = VectorStore()
+    baseline = Pipeline("baseline", live_store, args.chatbot_id, metadata, BASELINE_N_RESULTS)
+    reingest = args.chunk_size is not None or args.chunk_overlap is not None or args.embedding_model
+    cache = RetrievalCache(args.cache_size) if args.cache_size else None
+
+    with tempfile.TemporaryDirectory() as directory:
+        candidate_store = build_candidate_store(args.chatbot_id, metadata, args, Path(directory)) if reingest else live_store
+        candidate = Pipeline("candidate", candidate_store, args.chatbot_id, metadata, args.n_results, cache)
+        wall_started = time.monotonic()
+        overlaps = asyncio.run(replay(turns, baseline, candidate, args))
+        wall_seconds = time.monotonic() - wall_started
+
+    report = {
+        "chatbot_id": args.chatbot_id,
+        "turns": len(turns),
+        "wall_seconds": round(wall_seconds, 2),
+        "candidate_config": {
+            "n_results": args.n_results,
+            "chunk_size": args.chunk_size,
+            "chunk_overlap": args.chunk_overlap,
+            "embedding_model": args.embedding_model,
+            "cache_size": args.cache_size,
+            "speed": args.speed,
+        },
+        "retrieval_overlap": {
+            "mean": round(statistics.fmean(overlaps), 4) if overlaps else None,
+            "min": round(min(overlaps), 4) if overlaps else None,
+            "compared_by": "file_and_page" if reingest else "chunk_id",
+        },
+        "cache": {
+            "hits": cache.hits,
+            "misses": cache.misses,
+            "hit_rate": round(cache.hits / max(1, cache.hits + cache.misses), 4),
+        } if cache else None,
+    }
+    for pipeline in (baseline, candidate):
+        report[pipeline.name] = {
+            "retrieval_ms": _percentiles(pipeline.retrieval_ms),
+            "answer_ms": _percentiles(pipeline.answer_ms),
+            "errors": pipeline.errors,
+        }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text)
+    print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""Export a chatbot's knowledge base to a snapshot file, or restore one.
+
+A snapshot holds the collection's chunk ids, texts, metadata and embeddings
+(float16 by default) plus the chatbot's metadata, so a chatbot can be moved to
+another node or cloned without re-uploading its documents or re-embedding
+anything. Run from the backend directory:
+
+    python -m tools.snapshot_chatbot export <chatbot_id> kb.snapshot
+    python -m tools.snapshot_chatbot import kb.snapshot                      # same id and owner
+    python -m tools.snapshot_chatbot import kb.snapshot --as <new_id> --owner 7
+"""
+import argparse
+import json
+import sys
+import time
+import uuid
+import zipfile
+from pathlib import Path
+from typing import List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.database.vector_store import VectorStore
+from app.db_session import SessionLocal
+from app.migrations import run_migrations
+from app.services.kb_snapshots import export_snapshot, read_manifest, restore_chatbot, SnapshotError, SNAPSHOT_DTYPE
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export", help="Write a snapshot of a chatbot")
+    export_parser.add_argument("chatbot_id")
+    export_parser.add_argument("destination", type=Path)
+    export_parser.add_argument("--dtype", choices=["float16", "float32"], default=SNAPSHOT_DTYPE)
+    import_parser = commands.add_parser("import", help="Create a chatbot from a snapshot")
+    import_parser.add_argument("source", type=Path)
+    import_parser.add_argument("--as", dest="chatbot_id", help="Chatbot id to create (default: the snapshot's; 'new' for a fresh one)")
+    import_parser.add_argument("--owner", type=int, help="User id to own the chatbot (default: the snapshot's owner)")
+    args = parser.parse_args(argv)
+
+    run_migrations()
+    vector_store = VectorStore()
+    started = time.perf_counter()
+    try:
+        if args.command == "export":
+            metadata_path = Path(f"data/chatbots/{args.chatbot_id}/metadata.json")
+            metadata = json.loads(metadata_path.read_text()) if metadata_path.exists() else None
+            manifest = export_snapshot(vector_store, args.chatbot_id, args.destination, metadata, dtype=args.dtype)
+            print(f"Exported {manifest['count']} chunks ({manifest['dimension']}-dim {manifest['dtype']}) to "
+                  f"{args.destination} ({args.destination.stat().st_size} bytes) in {time.perf_counter() - started:.1f}s")
+        else:
+            chatbot_id = args.chatbot_id
+            if chatbot_id == "new":
+                chatbot_id = str(uuid.uuid4())
+            elif chatbot_id is None:
+                with zipfile.ZipFile(args.source) as archive:
+                    chatbot_id = read_manifest(archive)["collection"]
+            db = SessionLocal()
+            try:
+                metadata = restore_chatbot(db, vector_store, args.source, chatbot_id, owner_id=args.owner)
+            finally:
+                db.close()
+            print(f"Restored {metadata['chatbot_name']!r} as {chatbot_id} in {time.perf_counter() - started:.1f}s")
+    except (SnapshotError, FileNotFoundError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,278 @@
+"""Retrieval recall/latency evaluation and HNSW parameter tuning for one collection.
+
+Builds exact top-k ground truth by brute force over the collection's stored
+embeddings, rebuilds the vectors in a scratch collection for every
+(M, construction_ef, search_ef) combination, and measures recall@k
+and per-query latency. The fastest setting that meets --target-recall is
+recorded for the collection and applied the next time its index is built.
+
+Run from the backend directory:
+
+    python -m tools.tune_hnsw <chatbot_id> --k 5 --target-recall 0.95 --plot
+    python -m tools.tune_hnsw <chatbot_id> --apply   # also rebuild the live index now
+
+Queries are the chatbot's recorded user questions from chat_messages; when it
+has too few, text sampled from its own chunks is used instead. Results are
+written to data/hnsw_tuning/<chatbot_id>/ as CSV and JSON (and a PNG recall vs
+latency plot with --plot, if matplotlib is installed).
+"""
+import argparse
+import csv
+import json
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.database.vector_store import VectorStore
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+def load_vectors(vector_store: VectorStore, collection_name: str, batch_size: int = 1000):
+    """All ids, documents and L2-normalized embeddings of a collection"""
+    collection = vector_store.client.get_collection(name=collection_name, embedding_function=vector_store.embedding_function)
+    ids, documents, embeddings = [], [], []
+    for offset in range(0, collection.count(), batch_size):
+        page = collection.get(include=["embeddings", "documents"], limit=batch_size, offset=offset)
+        ids.extend(page["ids"])
+        documents.extend(page["documents"])
+        embeddings.extend(page["embeddings"])
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+    return ids, documents, matrix
+
+
+def recorded_questions(chatbot_id: str, limit: int) -> List[str]:
+    """Most recent distinct user questions asked to a chatbot"""
+    from sqlalchemy.exc import SQLAlchemyError
+    from app.db_session import SessionLocal
+    from app import models
+
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(models.ChatMessage.content)
+            .join(models.ChatSession, models.ChatSession.id == models.ChatMessage.session_id)
+            .filter(models.ChatSession.chatbot_id == chatbot_id, models.ChatMessage.role == "user")
+            .order_by(models.ChatMessage.id.desc())
+            .limit(limit * 5)
+            .all()
+        )
+    except SQLAlchemyError as e:
+        print(f"Could not read recorded questions: {e.__class__.__name__}", file=sys.stderr)
+        return []
+    finally:
+        db.close()
+    return list(dict.fromkeys(row.content for row in rows))[:limit]
+
+
+def sample_chunk_queries(documents: List[str], count: int, seed: int) -> List[str]:
+    """Stand-in queries: a sentence-sized slice from random chunks"""
+    rng = random.Random(seed)
+    queries = []
+    for document in rng.sample(documents, min(count, len(documents))):
+        words = (document or "").split()
+        if not words:
+            continue
+        start = rng.randrange(max(1, len(words) - 12))
+        queries.append(" ".join(words[start:start + 12]))
+    return queries
+
+
+def exact_neighbors(matrix: np.ndarray, queries: np.ndarray, k: int) -> List[set]:
+    """Brute-force top-k by cosine similarity"""
+    truth = []
+    for start in range(0, len(queries), 256):
+        scores = queries[start:start + 256] @ matrix.T
+        top = np.argpartition(-scores, min(k, matrix.shape[0] - 1), axis=1)[:, :k]
+        truth.extend(set(row) for row in top)
+    return truth
+
+
+def _build_collection(client: Any, name: str, hnsw_params: Dict[str, Any], ids: List[str], matrix: np.ndarray) -> Any:
+    """A scratch collection holding the vectors, built with these HNSW parameters"""
+    collection = client.create_collection(name=name, metadata=VectorStore.collection_metadata(hnsw_params))
+    for start in range(0, len(ids), 1000):
+        collection.add(ids=ids[start:start + 1000], embeddings=matrix[start:start + 1000].tolist())
+    return collection
+
+
+def _configured_search_ef(collection: Any) -> Optional[int]:
+    """search_ef the collection was created with, from its configuration or (older Chroma) metadata"""
+    hnsw = (getattr(collection, "configuration", None) or {}).get("hnsw") or {}
+    return hnsw.get("ef_search", (collection.metadata or {}).get("hnsw:search_ef"))
+
+
+def measure(collection: Any, queries: np.ndarray, truth: List[set], ids: List[str], k: int) -> Dict[str, float]:
+    index_of = {record_id: index for index, record_id in enumerate(ids)}
+    latencies, recalls = [], []
+    for query, expected in zip(queries, truth):
+        started = time.perf_counter()
+        result = collection.query(query_embeddings=[query.tolist()], n_results=k, include=["distances"])
+        latencies.append((time.perf_counter() - started) * 1000)
+        found = {index_of[record_id] for record_id in result["ids"][0]}
+        recalls.append(len(found & expected) / len(expected))
+    latencies.sort()
+    return {
+        "recall": round(statistics.fmean(recalls), 4),
+        "p50_ms": round(latencies[len(latencies) // 2], 3),
+        "p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3),
+    }
+
+
+def sweep(ids, matrix, queries, truth, args) -> List[Dict[str, Any]]:
+    """Measure every (M, construction_ef, search_ef) combination in scratch collections.
+
+    Each combination gets its own collection: Chroma only applies search_ef
+    when an index is loaded, so changing it on a loaded collection (modify)
+    updates the stored configuration while queries keep the old value.
+    """
+    import chromadb
+    from chromadb.config import Settings
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        client = chromadb.PersistentClient(path=directory, settings=Settings(anonymized_telemetry=False))
+        for m in args.m:
+            for construction_ef in args.construction_ef:
+                for search_ef in args.search_ef:
+                    name = f"tune_m{m}_ef{construction_ef}_s{search_ef}"
+                    build_started = time.perf_counter()
+                    collection = _build_collection(
+                        client, name, {"M": m, "construction_ef": construction_ef, "search_ef": search_ef}, ids, matrix
+                    )
+                    build_seconds = time.perf_counter() - build_started
+                    configured = _configured_search_ef(collection)
+                    if configured != search_ef:
+                        print(f"Skipping M={m} construction_ef={construction_ef} search_ef={search_ef}: "
+                              f"collection reports search_ef={configured}", file=sys.stderr)
+                        client.delete_collection(name)
+                        continue
+                    # One untimed pass so the index is loaded before measuring
+                    collection.query(query_embeddings=[queries[0].tolist()], n_results=args.k)
+                    point = {
+                        "M": m,
+                        "construction_ef": construction_ef,
+                        "search_ef": search_ef,
+                        "build_seconds": round(build_seconds, 3),
+                        **measure(collection, queries, truth, ids, args.k),
+                    }
+                    results.append(point)
+                    print(
+                        f"M={m:<3} construction_ef={construction_ef:<4} search_ef={search_ef:<4} "
+                        f"recall@{args.k}={point['recall']:.3f} p50={point['p50_ms']:.2f}ms p95={point['p95_ms']:.2f}ms",
+                        file=sys.stderr,
+                    )
+                    client.delete_collection(name)
+    if not results:
+        raise SystemExit("No sweep point could be measured")
+    return results
+
+
+def choose(results: List[Dict[str, Any]], target_recall: float) -> Dict[str, Any]:
+    """Lowest p95 latency meeting the recall target, else the highest recall"""
+    eligible = [point for point in results if point["recall"] >= target_recall]
+    if eligible:
+        return min(eligible, key=lambda point: (point["p95_ms"], point["M"], point["construction_ef"]))
+    return max(results, key=lambda point: (point["recall"], -point["p95_ms"]))
+
+
+def write_reports(output_dir: Path, results: List[Dict[str, Any]], chosen: Dict[str, Any], args) -> None:
+    output_dir.mkdir(parents=True, exist_ok=True)
+    with open(output_dir / "sweep.csv", "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(results[0]))
+        writer.writeheader()
+        writer.writerows(results)
+    (output_dir / "sweep.json").write_text(json.dumps({"k": args.k, "chosen": chosen, "results": results}, indent=2))
+
+    if not args.plot:
+        return
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print("matplotlib is not installed; skipping the plot (see sweep.csv)", file=sys.stderr)
+        return
+    fig, ax = plt.subplots(figsize=(8, 5))
+    for m in sorted({point["M"] for point in results}):
+        for construction_ef in sorted({point["construction_ef"] for point in results}):
+            series = [p for p in results if p["M"] == m and p["construction_ef"] == construction_ef]
+            ax.plot([p["p95_ms"] for p in series], [p["recall"] for p in series], marker="o",
+                    label=f"M={m}, construction_ef={construction_ef}")
+    ax.scatter([chosen["p95_ms"]], [chosen["recall"]], s=150, facecolors="none", edgecolors="black", label="chosen")
+    ax.axhline(args.target_recall, linestyle="--", color="grey")
+    ax.set_xlabel("p95 query latency (ms)")
+    ax.set_ylabel(f"recall@{args.k}")
+    ax.legend(fontsize="small")
+    fig.tight_layout()
+    fig.savefig(output_dir / "recall_latency.png", dpi=120)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("collection", help="Chatbot id / collection name")
+    parser.add_argument("--k", type=int, default=5, help="Results per query (query_collection uses 5)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--target-recall", type=float, default=0.95)
+    parser.add_argument("--m", type=_int_list, default=[8, 16, 32, 48])
+    parser.add_argument("--construction-ef", type=_int_list, default=[64, 100, 200, 400])
+    parser.add_argument("--search-ef", type=_int_list, default=[10, 20, 40, 80, 160])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--plot", action="store_true", help="Also write recall_latency.png (needs matplotlib)")
+    parser.add_argument("--output-dir", help="Defaults to data/hnsw_tuning/<collection>")
+    parser.add_argument("--dry-run", action="store_true", help="Report only; don't record the chosen parameters")
+    parser.add_argument("--apply", action="store_true", help="Rebuild the live index with the chosen parameters now")
+    args = parser.parse_args(argv)
+
+    vector_store = VectorStore()
+    ids, documents, matrix = load_vectors(vector_store, args.collection)
+    if len(ids) <= args.k:
+        print(f"{args.collection} has only {len(ids)} records; nothing to tune", file=sys.stderr)
+        return 1
+
+    questions = recorded_questions(args.collection, args.queries)
+    source = "recorded questions"
+    if len(questions) < min(args.queries, 20):
+        questions = sample_chunk_queries(documents, args.queries, args.seed)
+        source = "sampled chunk text"
+    queries = np.asarray(vector_store.embedding_function(questions), dtype=np.float32)
+    queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+    truth = exact_neighbors(matrix, queries, args.k)
+    print(f"{args.collection}: {len(ids)} records, {len(questions)} queries from {source}", file=sys.stderr)
+
+    results = sweep(ids, matrix, queries, truth, args)
+    chosen = choose(results, args.target_recall)
+    write_reports(Path(args.output_dir or f"data/hnsw_tuning/{args.collection}"), results, chosen, args)
+    print(f"Chosen: {json.dumps(chosen)}")
+
+    if args.dry_run:
+        return 0
+    vector_store.record_tuned_params(args.collection, {
+        "M": chosen["M"],
+        "construction_ef": chosen["construction_ef"],
+        "search_ef": chosen["search_ef"],
+        "k": args.k,
+        "recall": chosen["recall"],
+        "records": len(ids),
+        "tuned_at": datetime.now().isoformat(),
+    })
+    if args.apply:
+        vector_store.rebuild_collection(args.collection)
+        print(f"Rebuilt {args.collection} with the tuned parameters", file=sys.stderr)
+    else:
+        print("Recorded; the parameters apply the next time the index is built (or rerun with --apply)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())